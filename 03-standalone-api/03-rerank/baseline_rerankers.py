@@ -0,0 +1,202 @@
+"""
+CPU baseline rerankers with the reranker_func(query, candidate_docs, candidate_ids) interface.
+
+- BM25Reranker scores a query's candidates with Okapi BM25. The candidates' counts of
+  the query terms form one sparse matrix, and all candidates are scored with a single
+  sparse matrix-vector product.
+- CrossEncoderReranker runs a small Hugging Face cross-encoder (torch, CPU by default).
+  Concurrent queries are merged into shared forward passes (dynamic batching), and
+  pairs are sorted by token length before batching so little compute goes to padding.
+
+Both plug into rerank_benchmark.py (--reranker bm25 cross_encoder) or the notebook's
+evaluate_reranker_robust(), so their quality and latency can be compared with the
+Contextual AI rerank models on the same data and hardware.
+
+Example Usage:
+    bm25 = BM25Reranker()
+    scores = bm25(query, candidate_docs, candidate_ids)
+
+    cross_encoder = CrossEncoderReranker("cross-encoder/ms-marco-MiniLM-L-6-v2")
+    scores = await cross_encoder(query, candidate_docs, candidate_ids)
+"""
+import asyncio
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+DEFAULT_CROSS_ENCODER = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Reranker:
+    """Okapi BM25 over each query's candidate documents, which form the corpus for IDF."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        """
+        Initialize the reranker.
+
+        Args:
+            k1: Term frequency saturation
+            b: Document length normalization
+        """
+        self.k1 = k1
+        self.b = b
+
+    def __call__(self, query: str, candidate_docs: List[str], candidate_ids: List[str]) -> List[float]:
+        if not candidate_docs:
+            return []
+        # Only query terms contribute to the score, so the term-frequency matrix needs a
+        # column per distinct query term; every token still counts toward document length.
+        query_terms = Counter(tokenize(query))
+        columns = {term: j for j, term in enumerate(query_terms)}
+        doc_lengths = np.empty(len(candidate_docs))
+        rows, cols = [], []
+        for i, doc in enumerate(candidate_docs):
+            tokens = tokenize(doc)
+            doc_lengths[i] = len(tokens)
+            matched = [columns[token] for token in tokens if token in columns]
+            cols.extend(matched)
+            rows.extend([i] * len(matched))
+        num_docs = len(candidate_docs)
+        term_freqs = csr_matrix((np.ones(len(cols)), (rows, cols)), shape=(num_docs, len(columns)))
+        term_freqs.sum_duplicates()
+
+        doc_freqs = np.bincount(term_freqs.indices, minlength=len(columns))
+        idf = np.log1p((num_docs - doc_freqs + 0.5) / (doc_freqs + 0.5))
+        length_norm = self.k1 * (1 - self.b + self.b * doc_lengths / max(doc_lengths.mean(), 1e-9))
+        doc_of_entry = np.repeat(np.arange(num_docs), np.diff(term_freqs.indptr))
+        term_freqs.data = term_freqs.data * (self.k1 + 1) / (term_freqs.data + length_norm[doc_of_entry])
+        # Terms absent from every candidate have no entries, so they add nothing
+        weights = idf * np.fromiter(query_terms.values(), dtype=np.float64, count=len(query_terms))
+        return (term_freqs @ weights).tolist()
+
+
+class CrossEncoderReranker:
+    """
+    Cross-encoder reranker with dynamic batching across concurrent queries.
+
+    Calls queue their (query, document) pairs; a batcher collects pairs from all
+    pending calls for up to max_wait seconds (or until max_pairs are waiting), sorts
+    them by token length, and runs forward passes of at most batch_tokens padded
+    tokens on a single worker thread.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_CROSS_ENCODER, max_length: int = 512, batch_tokens: int = 16384,
+                 max_batch_size: int = 64, max_pairs: int = 512, max_wait: float = 0.005, device: str = "cpu",
+                 num_threads: Optional[int] = None):
+        """
+        Load the model.
+
+        Args:
+            model_name: Hugging Face model name or local path of a sequence classification cross-encoder
+            max_length: Maximum tokens per (query, document) pair; longer pairs are truncated
+            batch_tokens: Maximum padded tokens per forward pass
+            max_batch_size: Maximum pairs per forward pass
+            max_pairs: Pairs to collect before running without waiting for max_wait
+            max_wait: Seconds to wait for other queries' pairs before running
+            device: Torch device
+            num_threads: Torch intra-op threads (default: torch's choice)
+        """
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self.torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_name).to(device).eval()
+        self.device = device
+        self.max_length = max_length
+        self.batch_tokens = batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_pairs = max_pairs
+        self.max_wait = max_wait
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.queue: Optional[asyncio.Queue] = None
+        self.batcher: Optional[asyncio.Task] = None
+
+    def score_pairs(self, pairs: Sequence[Tuple[str, str]]) -> np.ndarray:
+        """Score (query, document) pairs synchronously, in length-bucketed batches."""
+        if not pairs:
+            return np.zeros(0)
+        features = self.tokenizer([q for q, _ in pairs], [d for _, d in pairs], truncation=True,
+                                  max_length=self.max_length)
+        lengths = np.array([len(ids) for ids in features["input_ids"]])
+        order = np.argsort(lengths, kind="stable")
+        scores = np.empty(len(pairs))
+        start = 0
+        with self.torch.inference_mode():
+            while start < len(order):
+                # Sorted by length, so the last pair of a batch sets its padded length
+                end = start + 1
+                while (end < len(order) and end - start < self.max_batch_size
+                       and lengths[order[end]] * (end + 1 - start) <= self.batch_tokens):
+                    end += 1
+                batch = order[start:end]
+                inputs = self.tokenizer.pad({key: [features[key][i] for i in batch] for key in features},
+                                            return_tensors="pt")
+                logits = self.model(**{key: value.to(self.device) for key, value in inputs.items()}).logits
+                # One logit is a relevance score; two are (irrelevant, relevant) classes
+                batch_scores = logits[:, 0] if logits.shape[-1] == 1 else logits.softmax(-1)[:, -1]
+                scores[batch] = batch_scores.float().cpu().numpy()
+                start = end
+        return scores
+
+    async def _run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self.queue.get()]
+            num_pairs = len(pending[0][0])
+            deadline = loop.time() + self.max_wait
+            while num_pairs < self.max_pairs:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    request = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(request)
+                num_pairs += len(request[0])
+            pairs = [pair for request_pairs, _ in pending for pair in request_pairs]
+            try:
+                scores = await loop.run_in_executor(self.executor, self.score_pairs, pairs)
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            offset = 0
+            for request_pairs, future in pending:
+                if not future.done():
+                    future.set_result(scores[offset:offset + len(request_pairs)].tolist())
+                offset += len(request_pairs)
+
+    async def __call__(self, query: str, candidate_docs: List[str], candidate_ids: List[str]) -> List[float]:
+        if self.batcher is None or self.batcher.done():
+            self.queue = asyncio.Queue()
+            self.batcher = asyncio.create_task(self._run_batches())
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put(([(query, doc) for doc in candidate_docs], future))
+        return await future
+
+    async def close(self):
+        """Stop the batcher task and the worker thread."""
+        if self.batcher is not None:
+            self.batcher.cancel()
+            try:
+                await self.batcher
+            except asyncio.CancelledError:
+                pass
+            self.batcher = None
+        self.executor.shutdown(wait=False)
+
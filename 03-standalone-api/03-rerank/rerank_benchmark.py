@@ -0,0 +1,450 @@
+"""
+Concurrent reranker benchmark harness for the datasets used in reranker_benchmarking.ipynb.
+
+The notebook's evaluate_reranker_robust() calls the reranker one query at a time, so a
+run over msmarco or hotpotqa is almost all network wait. This harness:
+- keeps up to --concurrency queries in flight, over pooled connections with retries
+- optionally splits long candidate lists into --batch_size documents per rerank call and
+  sends the batches concurrently
+- caches scores on disk per (endpoint, model, instruction, query, candidate document set), so
+  re-runs only call the API for queries it has not scored
+- evaluates completed queries with pytrec_eval in batches while later queries are still
+  in flight, and reports nDCG@10/MAP/recall@10 next to throughput (queries/s, docs/s)
+  and per-query latency percentiles
+
+The stub reranker (lexical overlap with simulated latency) and the synthetic dataset let
+it run fully offline. The BM25 and cross-encoder baselines in baseline_rerankers.py run
+locally on CPU, for comparing quality per millisecond with the API models.
+
+Example Usage:
+    python rerank_benchmark.py --dataset msmarco --reranker contextual --concurrency 16 --limit 200
+    python rerank_benchmark.py --dataset synthetic --reranker stub --concurrency 32
+    python rerank_benchmark.py --dataset fiqa2018 --reranker bm25 cross_encoder contextual --limit 200
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+import pytrec_eval
+
+from baseline_rerankers import DEFAULT_CROSS_ENCODER, BM25Reranker, CrossEncoderReranker
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from contextual_client import DEFAULT_BASE_URL, ContextualClient  # noqa: E402
+from response_cache import ResponseCache  # noqa: E402
+
+# Available datasets for evaluation
+AVAILABLE_DATASETS = {
+    "touche2020": "ContextualAI/touche2020",
+    "msmarco": "ContextualAI/msmarco",
+    "treccovid": "ContextualAI/treccovid",
+    "nq": "ContextualAI/nq",
+    "hotpotqa": "ContextualAI/hotpotqa",
+    "fiqa2018": "ContextualAI/fiqa2018"
+}
+RERANKERS = ("baseline", "bm25", "cross_encoder", "contextual", "stub")
+RERANK_MODELS = (
+    "ctxl-rerank-v2-instruct-multilingual",
+    "ctxl-rerank-v2-instruct-multilingual-mini",
+    "ctxl-rerank-v1-instruct",
+)
+DEFAULT_EVAL_STRINGS = ("ndcg_cut.10", "map", "recall_10")
+DEFAULT_CONCURRENCY = 16
+DEFAULT_EVAL_BATCH_SIZE = 256
+DEFAULT_CACHE_PATH = "rerank_cache.sqlite"
+LATENCY_PERCENTILES = (50, 90, 99)
+
+# reranker_func(query, candidate_docs, candidate_ids) -> scores, plain or async
+RerankerFunc = Callable[[str, List[str], List[str]], Union[List[float], Awaitable[List[float]]]]
+
+
+def document_set_hash(candidate_docs: Sequence[str]) -> str:
+    """SHA-256 of an ordered candidate list, used in the score cache key."""
+    return hashlib.sha256(json.dumps(list(candidate_docs), ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def score_cache_payload(model: str, instruction: str, query: str, candidate_docs: Sequence[str]) -> Dict[str, str]:
+    """The fields cached rerank scores are keyed on."""
+    return {"model": model, "instruction": instruction, "query": query,
+            "documents_sha256": document_set_hash(candidate_docs)}
+
+
+class ContextualReranker:
+    """reranker_func that scores candidates with the Contextual AI rerank API."""
+
+    def __init__(self, client: ContextualClient, model: str = RERANK_MODELS[0], instruction: str = "",
+                 batch_size: Optional[int] = None, url: Optional[str] = None):
+        """
+        Initialize the reranker.
+
+        Args:
+            client: Started ContextualClient the requests are sent through
+            model: Rerank model name
+            instruction: Optional instruction for the reranker
+            batch_size: Documents per rerank call; longer candidate lists are split and the
+                batches sent concurrently (None: one call per query)
+            url: Absolute rerank URL to call instead of the client's, e.g. a mock server
+        """
+        self.client = client
+        self.model = model
+        self.instruction = instruction
+        self.batch_size = batch_size
+        self.url = url
+        # Part of the score cache key, so scores from a mock server never answer real-API runs
+        self.endpoint = url or client.endpoint_url("rerank")
+
+    async def __call__(self, query: str, candidate_docs: List[str], candidate_ids: List[str]) -> List[float]:
+        size = self.batch_size or len(candidate_docs) or 1
+        offsets = range(0, len(candidate_docs), size)
+        # Rerank scores are per (query, document), so batches can be scored independently
+        responses = await asyncio.gather(*(
+            self.client.rerank(query, candidate_docs[start:start + size], self.model, instruction=self.instruction,
+                               url=self.url)
+            for start in offsets
+        ))
+        scores = [0.0] * len(candidate_docs)
+        for start, response in zip(offsets, responses):
+            batch_length = len(candidate_docs[start:start + size])
+            for result in response.get("results", []):
+                # A missing index must not silently overwrite another document's score
+                index = result.get("index")
+                if not isinstance(index, int) or not 0 <= index < batch_length:
+                    raise ValueError(f"Rerank result has no valid index for a batch of {batch_length}: {result}")
+                scores[start + index] = result.get("relevance_score", 0.0)
+        return scores
+
+
+class StubReranker:
+    """Offline stand-in for the rerank API: query term overlap scores after a simulated delay."""
+
+    def __init__(self, latency: float = 0.05, per_doc_latency: float = 0.0005, seed: int = 0):
+        """
+        Initialize the stub.
+
+        Args:
+            latency: Seconds of simulated network round trip per call
+            per_doc_latency: Extra seconds per candidate document
+            seed: Seed for the latency jitter
+        """
+        self.latency = latency
+        self.per_doc_latency = per_doc_latency
+        self.rng = random.Random(seed)
+
+    async def __call__(self, query: str, candidate_docs: List[str], candidate_ids: List[str]) -> List[float]:
+        delay = (self.latency + self.per_doc_latency * len(candidate_docs)) * self.rng.uniform(0.5, 1.5)
+        await asyncio.sleep(delay)
+        query_terms = set(re.findall(r"\w+", query.lower()))
+        scores = []
+        for doc in candidate_docs:
+            doc_terms = set(re.findall(r"\w+", doc.lower()))
+            scores.append(len(query_terms & doc_terms) / len(query_terms) if query_terms else 0.0)
+        return scores
+
+
+def simple_baseline_reranker_with_scores(query: str, candidate_docs: List[str], candidate_ids: List[str]) -> List[float]:
+    """Simple baseline reranker that returns uniform scores (no reranking)"""
+    return [1.0] * len(candidate_ids)
+
+
+def synthetic_dataset(num_queries: int = 200, num_candidates: int = 100, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Generate samples with the benchmark datasets' fields for offline runs.
+
+    Each query has a few relevant candidates that share most of its terms, and
+    distractors that share a few.
+    """
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(5000)]
+    samples = []
+    for q in range(num_queries):
+        query_terms = rng.sample(vocabulary, 6)
+        candidate_ids, candidate_docs, gt_ids, gt_qrels = [], [], [], []
+        num_relevant = rng.randint(1, 5)
+        for c in range(num_candidates):
+            overlap = rng.randint(3, 6) if c < num_relevant else rng.randint(0, 3)
+            words = rng.sample(query_terms, overlap) + rng.sample(vocabulary, rng.randint(40, 120))
+            rng.shuffle(words)
+            candidate_ids.append(f"q{q}-d{c}")
+            candidate_docs.append(" ".join(words))
+            if c < num_relevant:
+                gt_ids.append(f"q{q}-d{c}")
+                gt_qrels.append(rng.randint(1, 2))
+        order = list(range(num_candidates))
+        rng.shuffle(order)
+        samples.append({
+            "_id": f"q{q}",
+            "query": " ".join(query_terms),
+            "candidate_ids": [candidate_ids[i] for i in order],
+            "candidate_docs": [candidate_docs[i] for i in order],
+            "gt_ids": gt_ids,
+            "gt_qrels": gt_qrels,
+        })
+    return samples
+
+
+def load_samples(name: str, limit: Optional[int] = None, hf_token: Optional[str] = None) -> Sequence[Dict[str, Any]]:
+    """Load the test split of a benchmark dataset, or generate the synthetic one."""
+    if name == "synthetic":
+        return synthetic_dataset(limit or 200)
+    from datasets import load_dataset
+
+    dataset = load_dataset(AVAILABLE_DATASETS[name], token=hf_token)["test"]
+    if limit:
+        dataset = dataset.select(range(min(limit, len(dataset))))
+    return dataset
+
+
+class BatchedEvaluator:
+    """Evaluates completed queries with pytrec_eval every eval_batch_size queries.
+
+    pytrec_eval measures are per query, so evaluating in batches gives the same
+    numbers as one evaluation at the end, while the work overlaps with requests
+    that are still in flight.
+    """
+
+    def __init__(self, eval_strings: Iterable[str] = DEFAULT_EVAL_STRINGS,
+                 eval_batch_size: int = DEFAULT_EVAL_BATCH_SIZE):
+        self.eval_strings = set(eval_strings)
+        self.eval_batch_size = eval_batch_size
+        self.qrels: Dict[str, Dict[str, int]] = {}
+        self.results: Dict[str, Dict[str, float]] = {}
+        self.scores: Dict[str, Dict[str, float]] = {}
+
+    def add(self, qid: str, qrels: Dict[str, int], results: Dict[str, float]):
+        # Ensure non-empty qrels for pytrec_eval
+        self.qrels[qid] = qrels or {"dummy_id_for_pytrec_eval": 1}
+        self.results[qid] = results
+        if len(self.qrels) >= self.eval_batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.qrels:
+            evaluator = pytrec_eval.RelevanceEvaluator(self.qrels, self.eval_strings)
+            self.scores.update(evaluator.evaluate(self.results))
+            self.qrels, self.results = {}, {}
+
+    def averages(self) -> Dict[str, float]:
+        """Mean of each metric over queries, named avg_<metric> as in the notebook."""
+        self.flush()
+        if not self.scores:
+            return {}
+        metrics = list(next(iter(self.scores.values())).keys())
+        return {f"avg_{metric}": float(np.mean([s[metric] for s in self.scores.values()])) for metric in metrics}
+
+
+async def run_benchmark(
+    samples: Iterable[Dict[str, Any]],
+    reranker_func: RerankerFunc,
+    name: str,
+    *,
+    instruction: str = "",
+    concurrency: int = DEFAULT_CONCURRENCY,
+    cache: Optional[ResponseCache] = None,
+    cache_endpoint: Optional[str] = None,
+    eval_strings: Iterable[str] = DEFAULT_EVAL_STRINGS,
+    eval_batch_size: int = DEFAULT_EVAL_BATCH_SIZE,
+) -> Dict[str, Any]:
+    """
+    Score every sample with a reranker, concurrently, and evaluate the rankings.
+
+    Args:
+        samples: Dataset rows with _id, query, candidate_docs, candidate_ids, gt_ids and gt_qrels
+        reranker_func: reranker_func(query, candidate_docs, candidate_ids) -> scores. Plain
+            functions run in a thread pool of `concurrency` threads, coroutines on the event loop
+        name: Reranker name (e.g. the model) reported and used in the cache key
+        instruction: Instruction the reranker uses, part of the cache key
+        concurrency: Maximum number of queries in flight
+        cache: Score cache; cached queries are not sent to the reranker
+        cache_endpoint: Endpoint URL scores are cached under (default: the reranker's
+            `endpoint` attribute, e.g. ContextualReranker's resolved rerank URL, else name)
+        eval_strings: pytrec_eval measures
+        eval_batch_size: Completed queries evaluated per pytrec_eval call
+
+    Returns:
+        Report with the averaged metrics, throughput, latency percentiles and counters
+    """
+    evaluator = BatchedEvaluator(eval_strings, eval_batch_size)
+    latencies: List[float] = []
+    counts = {"queries": 0, "documents": 0, "cached": 0, "errors": 0}
+    is_async = asyncio.iscoroutinefunction(reranker_func) or asyncio.iscoroutinefunction(
+        getattr(reranker_func, "__call__", None))
+    executor = None if is_async else ThreadPoolExecutor(max_workers=concurrency)
+    loop = asyncio.get_running_loop()
+    remaining = iter(samples)
+    cache_endpoint = cache_endpoint or getattr(reranker_func, "endpoint", None) or name
+
+    async def score(query: str, candidate_docs: List[str], candidate_ids: List[str]) -> List[float]:
+        if is_async:
+            return await reranker_func(query, candidate_docs, candidate_ids)
+        return await loop.run_in_executor(executor, reranker_func, query, candidate_docs, candidate_ids)
+
+    async def worker():
+        for sample in remaining:
+            query, candidate_docs, candidate_ids = sample["query"], list(sample["candidate_docs"]), \
+                list(sample["candidate_ids"])
+            cache_payload = score_cache_payload(name, instruction, query, candidate_docs)
+            cached = cache.get(cache_endpoint, cache_payload) if cache is not None else None
+            if cached is not None:
+                candidate_scores = cached["scores"]
+                counts["cached"] += 1
+            else:
+                start = time.perf_counter()
+                try:
+                    candidate_scores = await score(query, candidate_docs, candidate_ids)
+                except Exception as e:
+                    # As in the notebook, a failed call scores the candidates uniformly
+                    print(f"Error reranking query {sample['_id']}: {e}")
+                    counts["errors"] += 1
+                    candidate_scores = [1.0] * len(candidate_docs)
+                else:
+                    latencies.append(time.perf_counter() - start)
+                    if cache is not None:
+                        cache.set(cache_endpoint, cache_payload, {"scores": list(map(float, candidate_scores))})
+            counts["queries"] += 1
+            counts["documents"] += len(candidate_docs)
+            evaluator.add(
+                str(sample["_id"]),
+                {str(t_id): int(_qrel) for t_id, _qrel in zip(sample["gt_ids"], sample["gt_qrels"])},
+                {str(cid): float(s) for cid, s in zip(candidate_ids, candidate_scores)},
+            )
+
+    start_time = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        if executor:
+            executor.shutdown(wait=False)
+    metrics = evaluator.averages()
+    elapsed = time.perf_counter() - start_time
+
+    report = {"reranker": name, **metrics, **counts, "seconds": elapsed,
+              "queries_per_second": counts["queries"] / elapsed if elapsed else 0.0,
+              "docs_per_second": counts["documents"] / elapsed if elapsed else 0.0}
+    if latencies:
+        for p, value in zip(LATENCY_PERCENTILES, np.percentile(latencies, LATENCY_PERCENTILES)):
+            report[f"latency_p{p}_ms"] = float(value) * 1000
+        report["latency_mean_ms"] = float(np.mean(latencies)) * 1000
+    return report
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n{report['reranker']} Results:")
+    for key, value in report.items():
+        if key.startswith("avg_"):
+            print(f"  {key}: {value:.4f}")
+    print(f"  {report['queries']} queries ({report['cached']} cached, {report['errors']} errors), "
+          f"{report['documents']} documents in {report['seconds']:.1f}s")
+    print(f"  Throughput: {report['queries_per_second']:.2f} queries/s, {report['docs_per_second']:.1f} docs/s")
+    if "latency_mean_ms" in report:
+        percentiles = ", ".join(f"p{p} {report[f'latency_p{p}_ms']:.0f}" for p in LATENCY_PERCENTILES)
+        print(f"  Latency (ms): {percentiles}, mean {report['latency_mean_ms']:.0f}")
+
+
+def print_comparison(reports: List[Dict[str, Any]], metric: str = "avg_ndcg_cut_10"):
+    """Quality against cost for each reranker: the metric, mean latency and wall time per query."""
+    print(f"\n{'reranker':<45} {metric:>16} {'latency ms':>11} {'wall ms/query':>14}")
+    for report in reports:
+        wall_ms = report["seconds"] * 1000 / report["queries"] if report["queries"] else 0.0
+        print(f"{report['reranker']:<45} {report.get(metric, float('nan')):>16.4f} "
+              f"{report.get('latency_mean_ms', float('nan')):>11.1f} {wall_ms:>14.2f}")
+
+
+async def benchmark(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    samples = load_samples(args.dataset, args.limit, args.hf_token)
+    print(f"Loaded {len(samples)} samples from {args.dataset}")
+    cache = ResponseCache(args.cache_path) if args.cache_path and not args.no_cache else None
+    reports = []
+    try:
+        for reranker_name in args.reranker:
+            if reranker_name == "contextual":
+                if not args.api_key:
+                    raise ValueError("Set CONTEXTUAL_API_KEY or pass --api_key to use the contextual reranker")
+                async with ContextualClient(args.api_key, base_url=args.base_url,
+                                            max_connections=args.concurrency) as client:
+                    reranker = ContextualReranker(client, args.model, args.instruction, args.batch_size)
+                    report = await run_benchmark(samples, reranker, args.model, instruction=args.instruction,
+                                                 concurrency=args.concurrency, cache=cache,
+                                                 eval_batch_size=args.eval_batch_size)
+                    report["client"] = client.get_stats()
+                    if args.metrics_path:
+                        client.metrics.write(args.metrics_path)
+            elif reranker_name == "stub":
+                report = await run_benchmark(samples, StubReranker(args.stub_latency), "stub",
+                                             concurrency=args.concurrency, eval_batch_size=args.eval_batch_size)
+            elif reranker_name == "bm25":
+                # CPU-bound in Python; more threads would only contend for the GIL
+                report = await run_benchmark(samples, BM25Reranker(args.bm25_k1, args.bm25_b), "bm25",
+                                             concurrency=1, eval_batch_size=args.eval_batch_size)
+            elif reranker_name == "cross_encoder":
+                # Concurrent queries feed the dynamic batcher; forward passes run one at a time
+                reranker = CrossEncoderReranker(args.cross_encoder_model, batch_tokens=args.cross_encoder_batch_tokens,
+                                                num_threads=args.cross_encoder_threads)
+                try:
+                    report = await run_benchmark(samples, reranker, args.cross_encoder_model,
+                                                 concurrency=args.concurrency, eval_batch_size=args.eval_batch_size)
+                finally:
+                    await reranker.close()
+            else:
+                report = await run_benchmark(samples, simple_baseline_reranker_with_scores, "baseline",
+                                             concurrency=args.concurrency, eval_batch_size=args.eval_batch_size)
+            print_report(report)
+            reports.append(report)
+        if len(reports) > 1:
+            print_comparison(reports)
+    finally:
+        if cache is not None:
+            print(f"Cache: {cache.stats}")
+            cache.close()
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rerankers with concurrent requests")
+    parser.add_argument("--dataset", type=str, default="touche2020", choices=[*AVAILABLE_DATASETS, "synthetic"],
+                        help="Benchmark dataset, or 'synthetic' to run offline")
+    parser.add_argument("--limit", type=int, default=None, help="Only use the first N test samples")
+    parser.add_argument("--reranker", type=str, nargs="+", default=["baseline", "contextual"],
+                        choices=RERANKERS, help="Rerankers to benchmark, in order")
+    parser.add_argument("--model", type=str, default=RERANK_MODELS[0], help="Contextual AI rerank model")
+    parser.add_argument("--instruction", type=str, default="", help="Instruction for the Contextual AI reranker")
+    parser.add_argument("--batch_size", type=int, default=None,
+                        help="Documents per rerank call; longer candidate lists are split (default: all)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Queries in flight")
+    parser.add_argument("--eval_batch_size", type=int, default=DEFAULT_EVAL_BATCH_SIZE,
+                        help="Completed queries evaluated per pytrec_eval call")
+    parser.add_argument("--cache_path", type=str, default=DEFAULT_CACHE_PATH, help="SQLite score cache")
+    parser.add_argument("--no_cache", action="store_true", help="Disable the score cache")
+    parser.add_argument("--bm25_k1", type=float, default=1.2, help="BM25 term frequency saturation")
+    parser.add_argument("--bm25_b", type=float, default=0.75, help="BM25 document length normalization")
+    parser.add_argument("--cross_encoder_model", type=str, default=DEFAULT_CROSS_ENCODER,
+                        help="Hugging Face cross-encoder for the cross_encoder reranker")
+    parser.add_argument("--cross_encoder_batch_tokens", type=int, default=16384,
+                        help="Maximum padded tokens per cross-encoder forward pass")
+    parser.add_argument("--cross_encoder_threads", type=int, default=None, help="Torch CPU threads")
+    parser.add_argument("--stub_latency", type=float, default=0.05, help="Simulated seconds per stub call")
+    parser.add_argument("--api_key", type=str, default=os.getenv("CONTEXTUAL_API_KEY"), help="Contextual AI API key")
+    parser.add_argument("--base_url", type=str, default=DEFAULT_BASE_URL, help="Contextual AI API root")
+    parser.add_argument("--hf_token", type=str, default=os.getenv("HF_TOKEN"), help="Hugging Face token")
+    parser.add_argument("--metrics_path", type=str, default=None,
+                        help="Write client metrics here (.prom for Prometheus text, otherwise JSON)")
+    parser.add_argument("--output", type=str, default=None, help="Write the reports to this JSON file")
+    args = parser.parse_args()
+
+    reports = asyncio.run(benchmark(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(reports, f, indent=2)
+        print(f"Saved reports to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Synthetic RewardBench-2 data shared by the benchmarks in this directory.
+
+make_synthetic_dataset() builds a rerolled dataset with the columns main() of
+rewardbench_lmunit.py produces after reroll_and_score_dataset: one row per prompt,
+with its completion scores, the number of correct completions and the per-row result.
+"""
+import numpy as np
+
+# Approximate number of prompts per subset in allenai/reward-bench-2
+SUBSET_SIZES = {"Factuality": 475, "Focus": 495, "Math": 183, "Precise IF": 160, "Safety": 450, "Ties": 102}
+
+
+def make_synthetic_dataset(subset_sizes=None, seed: int = 0):
+    """
+    Create a rerolled dataset with the columns main() produces after reroll_and_score_dataset.
+
+    Args:
+        subset_sizes: Prompts per subset; defaults to SUBSET_SIZES
+        seed: Seed of the score generator
+
+    Returns:
+        A datasets.Dataset with subset, id, scores, num_correct and results columns
+    """
+    from datasets import Dataset
+
+    rng = np.random.default_rng(seed)
+    rows = {"subset": [], "id": [], "scores": [], "num_correct": [], "results": []}
+    for subset, size in (subset_sizes or SUBSET_SIZES).items():
+        for i in range(size):
+            if subset == "Ties":
+                # Ties prompts come in "ref"/"tied" pairs with several correct answers
+                sample_type = "ref" if i % 2 == 0 else "tied"
+                row_id, num_completions, num_correct = f"{sample_type}:{i // 2}", int(rng.integers(4, 12)), int(rng.integers(1, 4))
+            else:
+                row_id, num_completions, num_correct = str(len(rows["id"])), 4, 1
+            # Round scores so ties between completions actually occur
+            scores = np.round(rng.uniform(1, 5, num_completions), 1)
+            max_val = np.max(scores)
+            rows["subset"].append(subset)
+            rows["id"].append(row_id)
+            rows["scores"].append(scores.tolist())
+            rows["num_correct"].append(num_correct)
+            rows["results"].append(float(1 / np.sum(scores == max_val)) if scores[0] == max_val else 0.0)
+    return Dataset.from_dict(rows)
@@ -0,0 +1,106 @@
+"""
+Import-time and startup benchmark for rewardbench_lmunit.py.
+
+Runs the script in fresh interpreters with `python -X importtime` and fails if:
+- importing rewardbench_lmunit takes longer than --budget_ms (best of --repeats runs)
+- importing it, or rescoring a saved out_dataset with --out-dataset-path, loads any of
+  HEAVY_MODULES (torch, transformers, datasets, rewardbench, huggingface_hub)
+
+The rescoring check writes a synthetic rerolled dataset with Dataset.save_to_disk, runs
+the script on it and compares results_grouped with score_subsets() on the loaded Dataset.
+
+Example Usage:
+    python bench_import_time.py --budget_ms 1000 --repeats 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from bench_datasets import SUBSET_SIZES, make_synthetic_dataset
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(HERE, "rewardbench_lmunit.py")
+HEAVY_MODULES = ("torch", "transformers", "datasets", "rewardbench", "huggingface_hub")
+
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    """Map each module in `-X importtime` output to its cumulative import time in microseconds."""
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        cumulative.setdefault(name.strip(), int(cumulative_us))
+    return cumulative
+
+
+def heavy_modules(modules: Dict[str, int]) -> List[str]:
+    """Heavy top-level packages among the imported modules."""
+    return sorted({name.split(".")[0] for name in modules if name.split(".")[0] in HEAVY_MODULES})
+
+
+def run_importtime(args: List[str], cwd: str) -> Tuple[Dict[str, int], float, str]:
+    """Run python -X importtime with args; return per-module times, wall time and stdout."""
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=cwd, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed:\n{proc.stderr[-2000:]}")
+    return parse_importtime(proc.stderr), wall, proc.stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Guard the startup time of rewardbench_lmunit.py")
+    parser.add_argument("--budget_ms", type=float, default=1000, help="Maximum import time of rewardbench_lmunit")
+    parser.add_argument("--repeats", type=int, default=5, help="Fresh interpreters to take the best import time of")
+    parser.add_argument("--top", type=int, default=8, help="Slowest imported modules to print")
+    args = parser.parse_args()
+    failures = []
+
+    best, modules = None, {}
+    for _ in range(args.repeats):
+        modules, _, _ = run_importtime(["-c", "import rewardbench_lmunit"], cwd=HERE)
+        best = modules["rewardbench_lmunit"] if best is None else min(best, modules["rewardbench_lmunit"])
+    print(f"import rewardbench_lmunit: {best / 1000:.0f} ms (best of {args.repeats}, budget {args.budget_ms:.0f} ms)")
+    top_level = sorted(((us, name) for name, us in modules.items() if "." not in name and name != "rewardbench_lmunit"),
+                       reverse=True)[:args.top]
+    print("  slowest packages: " + ", ".join(f"{name} {us / 1000:.0f} ms" for us, name in top_level))
+    if best / 1000 > args.budget_ms:
+        failures.append(f"import took {best / 1000:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+    if heavy_modules(modules):
+        failures.append(f"import loads {', '.join(heavy_modules(modules))}")
+
+    with tempfile.TemporaryDirectory(prefix="rewardbench_import_") as tmp:
+        dataset_path = os.path.join(tmp, "out_dataset")
+        make_synthetic_dataset({subset: 200 for subset in SUBSET_SIZES}).save_to_disk(dataset_path)
+        modules, wall, _ = run_importtime([SCRIPT, "--model", "bench", "--out-dataset-path", dataset_path], cwd=tmp)
+        with open(os.path.join(tmp, "results_grouped_bench.json")) as f:
+            results = json.load(f)
+
+        sys.path.insert(0, HERE)
+        from datasets import Dataset
+        from rewardbench_lmunit import score_subsets
+
+        out_dataset = Dataset.load_from_disk(dataset_path)
+        expected = score_subsets(out_dataset, np.unique(out_dataset["subset"]))
+    print(f"--out-dataset-path rescoring: {wall * 1000:.0f} ms wall")
+    if heavy_modules(modules):
+        failures.append(f"--out-dataset-path rescoring loads {', '.join(heavy_modules(modules))}")
+    if any(abs(results[subset] - score) > 1e-12 for subset, score in expected.items()):
+        failures.append(f"rescoring results differ: {results} vs {expected}")
+
+    if failures:
+        print("FAILED: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Microbenchmark for the per-subset scoring stage of rewardbench_lmunit.py.
+
+Builds a synthetic rerolled dataset sized like RewardBench-2 (one row per prompt,
+with a list of completion scores) and times the original Dataset.filter based
+loop against score_subsets(). The two must produce the same results_grouped.
+
+Example Usage:
+    python bench_scoring.py --repeats 5
+"""
+import argparse
+import time
+
+import numpy as np
+from datasets import Dataset
+from rewardbench import process_single_model
+
+from bench_datasets import make_synthetic_dataset
+from rewardbench_lmunit import score_subsets
+
+def score_subsets_reference(out_dataset: Dataset, present_subsets) -> dict:
+    """The scoring loop main() used before score_subsets(), kept for comparison."""
+    scores_grouped = {}
+    for subset in present_subsets:
+        subset_dataset = out_dataset.filter(lambda example: example["subset"] == subset)
+        subset_dataset.filter(lambda example: example["subset"] == "Precise IF")
+        if subset.lower() == "ties":
+            ties_subset_with_results, overall_score = process_single_model(subset_dataset)
+            ties_indices = [i for i, s in enumerate(out_dataset["subset"]) if s == "ties"]
+            out_dataset_df = out_dataset.to_pandas()
+            for i, ties_idx in enumerate(ties_indices):
+                out_dataset_df.at[ties_idx, "results"] = ties_subset_with_results["results"][i]
+            out_dataset = Dataset.from_pandas(out_dataset_df)
+            scores_grouped[subset] = overall_score
+        else:
+            num_correct = sum(subset_dataset["results"])
+            num_total = len(subset_dataset["results"])
+            scores_grouped[subset] = num_correct / num_total
+    return scores_grouped
+
+
+def time_call(fn, repeats: int):
+    """Return the best wall time over repeats and the last result."""
+    best, result = float("inf"), None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeats", type=int, default=3, help="Number of timed repeats per implementation")
+    args = parser.parse_args()
+
+    out_dataset = make_synthetic_dataset()
+    present_subsets = np.unique(out_dataset["subset"])
+    reference_time, expected = time_call(lambda: score_subsets_reference(out_dataset, present_subsets), args.repeats)
+    vectorized_time, actual = time_call(lambda: score_subsets(out_dataset, present_subsets), args.repeats)
+
+    max_diff = max(abs(expected[k] - actual[k]) for k in expected)
+    assert expected.keys() == actual.keys() and max_diff < 1e-12, f"Results differ: {expected} vs {actual}"
+    print(f"Rows: {len(out_dataset)}  subsets: {len(present_subsets)}  max abs diff: {max_diff:.3g}")
+    print(f"Dataset.filter loop: {reference_time * 1000:.1f} ms")
+    print(f"score_subsets:       {vectorized_time * 1000:.1f} ms  ({reference_time / vectorized_time:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Tests for ContextualAPIClient.submit_stream against a local LMUnit stub, and for the
+AdaptiveRateLimiter it uses by default.
+
+The stub answers each distinct request with 429 and a Retry-After header the first time
+it sees it, then with a score derived from the query after a variable delay, so responses
+complete out of order.
+
+Example Usage:
+    python -m pytest test_contextual_api_client.py -q
+"""
+import asyncio
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from rewardbench_lmunit import ContextualAPIClient  # noqa: E402
+from contextual_client import AdaptiveRateLimiter  # noqa: E402
+
+RETRY_AFTER_SECONDS = 0.05
+
+
+class LMUnitStub:
+    """LMUnit endpoint that throttles the first attempt of every request, and every attempt of always_throttle."""
+
+    def __init__(self, always_throttle=()):
+        self.always_throttle = set(always_throttle)
+        self.attempts = Counter()
+        self.attempt_times = defaultdict(list)
+        self.base_url = None
+        self._runner = None
+
+    async def lmunit(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        index = int(payload["query"].split()[-1])
+        self.attempts[index] += 1
+        self.attempt_times[index].append(time.monotonic())
+        if self.attempts[index] == 1 or index in self.always_throttle:
+            return web.json_response({"detail": "rate limited"}, status=429,
+                                     headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+        # Later indices answer sooner, so completion order differs from submission order
+        await asyncio.sleep(0.001 * (20 - index % 20))
+        return web.json_response({"score": index / 10})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/v1/lmunit", self.lmunit)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}/v1"
+
+    async def close(self):
+        await self._runner.cleanup()
+
+
+async def score_with_stub(num_requests: int, max_in_flight: int, max_retries: int = 3, always_throttle=()):
+    stub = LMUnitStub(always_throttle)
+    await stub.start()
+    # Without the AIMD limiter each retry waits only for its own Retry-After, which keeps the test fast
+    client = ContextualAPIClient("test-key", rate_limit=None, max_retries=max_retries,
+                                 base_delay=0.01, max_in_flight=max_in_flight, base_url=stub.base_url)
+    requests = [{"query": f"query {i}", "response": "response", "unit_test": "Is it helpful?"}
+                for i in range(num_requests)]
+    completed = []
+    try:
+        await client.start()
+        results = await client.submit_batch(requests, max_in_flight=max_in_flight,
+                                            on_result=lambda i, result: completed.append(i))
+        stats = client.get_stats()
+    finally:
+        await client.close()
+        await stub.close()
+    return results, completed, stats, stub
+
+
+def test_submit_stream_retries_429_and_preserves_order():
+    results, completed, stats, stub = asyncio.run(score_with_stub(num_requests=40, max_in_flight=8))
+
+    # Every result lands at its request's position, although they completed out of order
+    assert [result["score"] for result in results] == [i / 10 for i in range(40)]
+    assert completed != sorted(completed)
+    assert sorted(completed) == list(range(40))
+    # Each request was throttled once and retried once after Retry-After
+    assert all(stub.attempts[i] == 2 for i in range(40))
+    assert all(times[1] - times[0] >= RETRY_AFTER_SECONDS for times in stub.attempt_times.values())
+    assert stats["retries"] == 40
+    assert stats["throttled"] == 40
+    assert stats["succeeded"] == 40
+
+
+def test_submit_stream_reports_exhausted_retries_as_exceptions():
+    results, _, stats, stub = asyncio.run(
+        score_with_stub(num_requests=10, max_in_flight=4, max_retries=2, always_throttle=range(5)))
+
+    # A request still throttled after max_retries attempts is returned as its exception
+    assert all(isinstance(result, Exception) for result in results[:5])
+    assert all(stub.attempts[i] == 2 for i in range(5))
+    assert [result["score"] for result in results[5:]] == [i / 10 for i in range(5, 10)]
+    assert stats["succeeded"] == 5
+
+
+async def acquire_times(limiter: AdaptiveRateLimiter, workers: int, acquires_per_worker: int, during=None):
+    """Times (relative to the start) at which workers were granted slots; during(limiter) runs alongside."""
+    start = time.monotonic()
+    granted = []
+
+    async def worker():
+        for _ in range(acquires_per_worker):
+            await limiter.acquire()
+            granted.append(time.monotonic() - start)
+
+    await asyncio.gather(*(worker() for _ in range(workers)), *([during(limiter)] if during else []))
+    return sorted(granted)
+
+
+def test_rate_limiter_retry_after_pauses_waiting_callers():
+    async def backoff(limiter):
+        await asyncio.sleep(0.12)
+        limiter.on_backoff(retry_after=0.5)
+
+    limiter = AdaptiveRateLimiter(initial_rate=10, max_rate=10)
+    granted = asyncio.run(acquire_times(limiter, workers=8, acquires_per_worker=2, during=backoff))
+
+    # Callers already queued when the Retry-After arrived wait for it too
+    assert not [t for t in granted if 0.13 < t < 0.6]
+    assert len([t for t in granted if t <= 0.13]) == 2
+    # Slots stay at least 1/rate apart, at 10/s before the backoff and 5/s after it
+    assert all(b - a >= 0.1 - 0.01 for a, b in zip(granted, granted[1:]))
+    assert all(b - a >= 0.2 - 0.01 for a, b in zip(granted[2:], granted[3:]))
+
+
+def test_rate_limiter_applies_rate_increase_to_queued_callers():
+    async def speed_up(limiter):
+        await asyncio.sleep(0.05)
+        limiter.on_success()
+
+    # One success lifts the rate from 2/s to the 100/s cap
+    limiter = AdaptiveRateLimiter(initial_rate=2, max_rate=100, increase=1000)
+    granted = asyncio.run(acquire_times(limiter, workers=16, acquires_per_worker=4, during=speed_up))
+
+    # At the old rate 64 slots would take 32 s; only the slot already being waited for uses it
+    assert limiter.rate == 100
+    assert granted[-1] < 0.5 + 64 / 100 + 0.3
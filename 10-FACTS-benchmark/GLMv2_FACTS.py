@@ -1,24 +1,73 @@
 """
 Script to call the GLMv2 endpoint and generate outputs for the FACTS dataset.
 
+Rows are generated concurrently over the shared, pooled ContextualClient, with retries and
+per-row error capture. Rows that still fail are logged and left empty in the output.
+Each generation is appended to a sidecar checkpoint as it completes, keyed by a hash
+of the prompt and PARAMETERS_CONFIG, so a restarted run skips finished prompts and
+identical prompts in the dataset are generated once.
+With --chunk_size the dataset is instead streamed in chunks (CSV, Parquet or JSONL)
+and rows are written to the output as they complete, keeping memory bounded. That mode
+resumes from the same checkpoint, so only prompts that succeeded are skipped.
+
 Usage:
 API_KEY=key-yQS
-python GLMv2_endpoint_call.py \
+python GLMv2_FACTS.py \
 --api_token $API_KEY \
 --dataset_path examples.csv \
---output_path output.csv
+--output_path output.csv \
+--concurrency 8
 """
+import asyncio
+import hashlib
+import json
 import logging
+import os
+import sys
+import time
 import requests
 from argparse import ArgumentParser
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import aiohttp
 import pandas as pd
 from tqdm import tqdm
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from contextual_client import ContextualClient  # noqa: E402
+from streaming_io import DEFAULT_CHUNK_SIZE, ChunkWriter, bounded_map, read_rows  # noqa: E402
+
+GENERATE_URL = "https://api.contextual.ai/v1/generate"
+DEFAULT_CONCURRENCY = 8
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_TIMEOUT_SECONDS = 300
+BASE_DELAY = 1.0
+# Per-row columns added to the output CSV in --stream mode
+STREAM_METRIC_COLUMNS = ["ttft_s", "latency_s", "output_chars", "output_deltas", "deltas_per_s"]
+
 def parse_args():
     parser = ArgumentParser()
     parser.add_argument("--api_token", type=str, required=True)
     parser.add_argument("--dataset_path", type=str, required=True)
     parser.add_argument("--output_path", type=str, required=True)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Maximum number of concurrent generate requests (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--max_retries", type=int, default=DEFAULT_MAX_RETRIES,
+                        help=f"Attempts per row before giving up (default: {DEFAULT_MAX_RETRIES})")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT_SECONDS,
+                        help=f"Per-request timeout in seconds (default: {DEFAULT_TIMEOUT_SECONDS})")
+    parser.add_argument("--url", type=str, default=GENERATE_URL,
+                        help="Generate endpoint, e.g. a local mock server for benchmarking")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream responses over SSE and record per-row latency metrics in the output")
+    parser.add_argument("--checkpoint_path", type=str, default=None,
+                        help="Sidecar JSONL of completed generations (default: <output_path>.checkpoint.jsonl)")
+    parser.add_argument("--metrics_path", type=str, default=None,
+                        help="Write per-endpoint latency histograms and error counters here "
+                             "(.prom/.txt: Prometheus text, otherwise JSON)")
+    parser.add_argument("--chunk_size", type=int, default=None,
+                        help="Stream the dataset in chunks of this many rows instead of loading it into memory; "
+                             f"the dataset and output may be .csv, .parquet or .jsonl (e.g. {DEFAULT_CHUNK_SIZE})")
     return parser.parse_args()
 
 logger = logging.getLogger(__name__)
@@ -57,10 +106,31 @@ def generate_contextual_ai(
     Returns:
         requests.Response object containing the API response
     """
-    url = "https://api.contextual.ai/v1/generate"
+    url = GENERATE_URL
+    payload = build_payload(prompt, system_prompt, avoid_commentary, temperature, top_p, max_new_tokens)
+    
+    # Set headers
+    headers = {
+        "Authorization": f"Bearer {api_token}",
+        "Content-Type": "application/json"
+    }
+    
+    # Make the request
+    response = requests.post(url, json=payload, headers=headers)
     
-    # Build payload
-    payload = {
+    return response
+
+
+def build_payload(
+    prompt: str,
+    system_prompt: str,
+    avoid_commentary: bool = True,
+    temperature: float = 0.0,
+    top_p: float = 0.9,
+    max_new_tokens: int = 2048
+) -> dict:
+    """Build the /v1/generate request body for a single user prompt."""
+    return {
               "avoid_commentary": avoid_commentary,
               "temperature": temperature,
               "top_p": top_p,
@@ -75,32 +145,475 @@ def generate_contextual_ai(
                     }
                 ]
             }
+
+
+async def generate_contextual_ai_async(
+    client: ContextualClient,
+    prompt: str,
+    system_prompt: str = "",
+    url: str = GENERATE_URL,
+    **generation_kwargs
+) -> str:
+    """
+    Generate a response over the shared client, which retries throttled and transient failures.
     
-    # Set headers
-    headers = {
-        "Authorization": f"Bearer {api_token}",
-        "Content-Type": "application/json"
+    Args:
+        client: Started ContextualClient whose connection pool is reused across rows
+        prompt: The user prompt
+        system_prompt: Optional system prompt to guide the model
+        url: Generate endpoint URL
+        **generation_kwargs: avoid_commentary, temperature, top_p, max_new_tokens
+    
+    Returns:
+        The generated text
+    """
+    payload = build_payload(prompt, system_prompt, **generation_kwargs)
+    body = await client.post("generate", payload, url=url)
+    if "response" not in body:
+        raise ValueError(f"Response missing 'response' field: {str(body)[:200]}")
+    return body["response"]
+
+
+def _sse_delta(data: str) -> Optional[str]:
+    """Return the text carried by one server-sent event's data field, if any."""
+    try:
+        event = json.loads(data)
+    except json.JSONDecodeError:
+        return data
+    if isinstance(event, dict):
+        for key in ("delta", "response", "text", "content"):
+            if isinstance(event.get(key), str):
+                return event[key]
+        if isinstance(event.get("data"), dict):
+            return _sse_delta(json.dumps(event["data"]))
+    return None
+
+
+async def generate_contextual_ai_stream(
+    client: ContextualClient,
+    prompt: str,
+    system_prompt: str = "",
+    url: str = GENERATE_URL,
+    **generation_kwargs
+) -> Tuple[str, Dict[str, float]]:
+    """
+    Generate a response with `stream: true`, consuming the server-sent events incrementally.
+    
+    Arguments match generate_contextual_ai_async. Each `data:` event contributes one
+    text delta; a `[DONE]` event or the end of the body ends the stream. Timings are
+    measured from sending the attempt that succeeded, so retries are not included.
+    A server that ignores `stream: true` and answers with plain JSON is read as a single
+    delta; an event stream without any `data:` line raises ValueError.
+    
+    Returns:
+        The generated text and a dict with ttft_s (time to first token), latency_s,
+        output_chars, output_deltas (number of streamed text deltas, which the server may
+        emit per token or per several tokens) and deltas_per_s (delta rate after the first)
+    """
+    payload = build_payload(prompt, system_prompt, **generation_kwargs)
+    payload["stream"] = True
+
+    async def read_stream(response: aiohttp.ClientResponse, start: float) -> Tuple[str, Dict[str, float]]:
+        if response.content_type != "text/event-stream":
+            return await read_json(response, start)
+        chunks, data_lines, first_token_at = [], [], None
+        saw_data = False
+
+        def flush_event() -> bool:
+            nonlocal first_token_at
+            data = "\n".join(data_lines)
+            data_lines.clear()
+            if data.strip() == "[DONE]":
+                return True
+            delta = _sse_delta(data) if data else None
+            if delta:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                chunks.append(delta)
+            return False
+
+        done = False
+        async for raw_line in response.content:
+            line = raw_line.decode("utf-8").rstrip("\r\n")
+            if line.startswith("data:"):
+                saw_data = True
+                # Per the SSE spec, only a single leading space is stripped from the value
+                value = line[5:]
+                data_lines.append(value[1:] if value.startswith(" ") else value)
+            elif not line and data_lines and flush_event():
+                done = True
+                break
+        if not done and data_lines:
+            flush_event()
+        if not saw_data:
+            raise ValueError("Generate stream ended without any data: events")
+        end = time.perf_counter()
+        return "".join(chunks), stream_metrics(chunks, start, first_token_at, end)
+
+    async def read_json(response: aiohttp.ClientResponse, start: float) -> Tuple[str, Dict[str, float]]:
+        body = await response.json(content_type=None)
+        if not isinstance(body, dict) or "response" not in body:
+            raise ValueError(f"Response missing 'response' field: {str(body)[:200]}")
+        end = time.perf_counter()
+        return body["response"], stream_metrics([body["response"]], start, end, end)
+
+    return await client.post("generate", payload, handle_response=read_stream, url=url,
+                             headers={"Accept": "text/event-stream"})
+
+
+def stream_metrics(chunks: List[str], start: float, first_token_at: Optional[float], end: float) -> Dict[str, float]:
+    """Per-row timings of a generation received as text deltas."""
+    ttft = (first_token_at or end) - start
+    latency = end - start
+    return {
+        "ttft_s": ttft,
+        "latency_s": latency,
+        "output_chars": sum(len(chunk) for chunk in chunks),
+        "output_deltas": len(chunks),
+        "deltas_per_s": len(chunks) / (latency - ttft) if latency > ttft else float("nan"),
     }
+
+
+def make_client(api_token: str, concurrency: int, max_retries: int, timeout: float) -> ContextualClient:
+    """Create a client whose keep-alive connection pool matches the concurrency."""
+    return ContextualClient(api_token, max_retries=max_retries, base_delay=BASE_DELAY, timeout=timeout,
+                            max_connections=concurrency)
+
+
+async def generate_record(
+    client: ContextualClient,
+    prompt: str,
+    url: str = GENERATE_URL,
+    stream: bool = False,
+) -> Dict:
+    """Generate one prompt with PARAMETERS_CONFIG and return its output record."""
+    generate = generate_contextual_ai_stream if stream else generate_contextual_ai_async
+    result = await generate(
+        client, prompt, system_prompt="", url=url,
+        avoid_commentary=PARAMETERS_CONFIG["avoid_commentary"],
+        temperature=PARAMETERS_CONFIG["temperature"],
+        top_p=PARAMETERS_CONFIG["top_p"],
+        max_new_tokens=PARAMETERS_CONFIG["max_new_tokens"],
+    )
+    if stream:
+        text, metrics = result
+        return {"generated_output": text, **metrics}
+    return {"generated_output": result}
+
+
+async def generate_all(
+    prompts: List[str],
+    api_token: str,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    url: str = GENERATE_URL,
+    on_result: Optional[Callable[[int, Dict], None]] = None,
+    stream: bool = False,
+    metrics_path: Optional[str] = None,
+    labels: Optional[List[str]] = None,
+) -> List[Optional[Dict]]:
+    """
+    Generate outputs for all prompts with at most `concurrency` requests in flight.
     
-    # Make the request
-    response = requests.post(url, json=payload, headers=headers)
+    `on_result(index, record)` is called as each prompt succeeds. If metrics_path is
+    given, the client's latency histogram and error counters are written there.
+    Failures are logged with labels[index] when labels are given (e.g. the dataset rows
+    a deduplicated prompt stands for), otherwise with the prompt's index.
     
-    return response
+    Returns:
+        One record per prompt, in the same order as prompts, holding
+        "generated_output" and, when streaming, the per-row latency metrics.
+        A row that failed after all retries is None and its error is logged;
+        it does not abort the run.
+    """
+    outputs: List[Optional[Dict]] = [None] * len(prompts)
+    errors = {}
+    pending = iter(enumerate(prompts))
+    progress = tqdm(total=len(prompts))
+    async with make_client(api_token, concurrency, max_retries, timeout) as client:
+
+        async def worker():
+            for i, prompt in pending:
+                try:
+                    outputs[i] = await generate_record(client, prompt, url, stream)
+                    if on_result is not None:
+                        on_result(i, outputs[i])
+                except Exception as e:
+                    errors[i] = e
+                    logger.error(f"{labels[i] if labels else f'Prompt {i}'} failed: {e!r}")
+                progress.update(1)
+
+        await asyncio.gather(*(worker() for _ in range(max(1, min(concurrency, len(prompts))))))
+    progress.close()
+    if metrics_path:
+        client.metrics.write(metrics_path)
+    if errors:
+        failed = [labels[i] for i in sorted(errors)] if labels else sorted(errors)
+        logger.error(f"{len(errors)} of {len(prompts)} prompts failed: {failed}")
+    return outputs
+
+
+async def generate_streaming(
+    dataset_path: str,
+    output_path: str,
+    api_token: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    url: str = GENERATE_URL,
+    stream: bool = False,
+    metrics_path: Optional[str] = None,
+    checkpoint_path: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Bounded-memory variant of the generation loop for datasets too large to load at once.
+    
+    Rows are read chunk_size at a time from CSV, Parquet or JSONL, fed to the workers
+    through a bounded window and written to output_path in input order as they
+    complete. Memory therefore depends on chunk_size and concurrency, not on the
+    dataset size. Client metrics go to metrics_path as in generate_all.
+    
+    Each successful generation is flushed to the GenerationCheckpoint at checkpoint_path
+    (default: <output_path>.checkpoint.jsonl) as soon as it arrives, so a crash loses
+    no finished rows. A rerun rewrites the output, reading prompts already in the
+    checkpoint back from it and sending requests only for prompts that are missing
+    or failed. Identical prompts share one request. With stream, checkpointed records
+    without latency metrics (from a run without stream) are generated again.
+    
+    Returns:
+        The streaming latency metrics of the requests sent in this run, one row per
+        generated prompt (empty unless stream). Rows read back from the checkpoint and
+        rows sharing another row's request are not included.
+    """
+    # Only the byte offset of each record is kept in memory; records are read back on demand
+    checkpoint = GenerationCheckpoint(checkpoint_path or f"{output_path}.checkpoint.jsonl", in_memory=False)
+    if len(checkpoint):
+        logger.info(f"Resuming with {len(checkpoint)} generations already in {checkpoint.path}")
+    in_flight: Dict[str, asyncio.Future] = {}
+    metrics = []
+    errors = 0
+    reused = 0
+
+    async def generate_and_checkpoint(client: ContextualClient, key: str, prompt: str) -> Dict:
+        record = await generate_record(client, prompt, url, stream)
+        checkpoint.write(key, record)
+        if stream:
+            metrics.append({column: record.get(column) for column in STREAM_METRIC_COLUMNS})
+        return record
+
+    try:
+        async with make_client(api_token, concurrency, max_retries, timeout) as client:
+
+            async def generate_row(row: Dict) -> Dict:
+                nonlocal reused
+                key = prompt_key(row["full_prompt"], url=url)
+                if key in checkpoint:
+                    record = checkpoint.get(key)
+                    if is_reusable(record, stream):
+                        reused += 1
+                        return record
+                if key not in in_flight:
+                    in_flight[key] = asyncio.ensure_future(generate_and_checkpoint(client, key, row["full_prompt"]))
+                    in_flight[key].add_done_callback(lambda _: in_flight.pop(key, None))
+                return await asyncio.shield(in_flight[key])
+
+            rows = read_rows(dataset_path, chunk_size=chunk_size)
+            with ChunkWriter(output_path, chunk_size=chunk_size) as writer:
+                row_number = 0
+                progress = tqdm()
+                async for row, record in bounded_map(rows, generate_row, concurrency):
+                    if isinstance(record, Exception):
+                        errors += 1
+                        logger.error(f"Row {row_number} failed: {record!r}")
+                        record = {}
+                    row["generated_output"] = record.get("generated_output")
+                    if stream:
+                        for column in STREAM_METRIC_COLUMNS:
+                            row[column] = record.get(column)
+                    writer.write(row)
+                    row_number += 1
+                    progress.update(1)
+                progress.close()
+    finally:
+        checkpoint.close()
+    if metrics_path:
+        client.metrics.write(metrics_path)
+    if reused:
+        logger.info(f"{reused} rows were read from {checkpoint.path} instead of being generated")
+    if errors:
+        logger.error(f"{errors} rows failed and were written with an empty generated_output; "
+                     "rerun the same command to retry only those")
+    return pd.DataFrame(metrics, columns=STREAM_METRIC_COLUMNS)
+
+
+def print_latency_summary(dataset: pd.DataFrame):
+    """Print p50/p95/p99 of time to first token, total latency and streamed delta rate.
+
+    dataset should hold one row per request sent in this run, not per output row, so that
+    reused and fanned-out rows do not skew the percentiles.
+    """
+    print("Latency summary")
+    if dataset.empty:
+        print("  no requests were sent in this run")
+    for column in ["ttft_s", "latency_s", "deltas_per_s"]:
+        values = dataset[column].dropna()
+        if values.empty:
+            continue
+        p50, p95, p99 = values.quantile([0.5, 0.95, 0.99])
+        print(f"  {column:<14} p50={p50:.3f}  p95={p95:.3f}  p99={p99:.3f}  (n={len(values)})")
+
+
+def prompt_key(prompt: str, system_prompt: str = "", url: str = GENERATE_URL) -> str:
+    """Hash identifying a generation: the endpoint, the prompt and every generation parameter.
+
+    Keying on the endpoint keeps outputs of a mock server or another deployment from
+    being reused for the real API when they share a checkpoint file.
+    """
+    blob = json.dumps({"url": url, "prompt": prompt, "system_prompt": system_prompt, "parameters": PARAMETERS_CONFIG},
+                      sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def is_reusable(record: Dict, stream: bool) -> bool:
+    """Whether a checkpointed record can stand in for a new generation (with --stream it needs its metrics)."""
+    return not stream or record.get("latency_s") is not None
+
+
+class GenerationCheckpoint:
+    """Append-only JSONL sidecar of completed generations keyed by prompt_key().
+    
+    Each record holds "generated_output" and, for streamed rows, the latency metrics.
+    Only successful generations are written, so a failed prompt is retried on resume.
+    With in_memory=False only the byte offset of each record is kept and get() reads
+    the record back from the file, so memory does not grow with the generated text.
+    """
+
+    def __init__(self, path: str, in_memory: bool = True):
+        self.path = path
+        self.in_memory = in_memory
+        self.completed: Dict[str, Dict] = {}
+        self.offsets: Dict[str, int] = {}
+        if os.path.exists(path):
+            for offset, key, record in self._scan(path):
+                self.offsets[key] = offset
+                if in_memory:
+                    self.completed[key] = record
+        self._fh = open(path, "ab")
+        if self._fh.tell() > 0:
+            # Terminate a line left half-written by a crash so new records start cleanly
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self._fh.write(b"\n")
+        self._reader = None
+
+    @staticmethod
+    def _scan(path: str) -> Iterator[Tuple[int, str, Dict]]:
+        """Yield (byte offset, key, record) for each complete line, ignoring a truncated last line."""
+        offset = 0
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    record = None
+                if isinstance(record, dict) and "key" in record:
+                    yield offset, record.pop("key"), record
+                offset += len(line)
+
+    @staticmethod
+    def load(path: str) -> Dict[str, Dict]:
+        """Read completed generation records, ignoring a truncated last line."""
+        return {key: record for _, key, record in GenerationCheckpoint._scan(path)}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def get(self, key: str) -> Dict:
+        """The completed record for key."""
+        if self.in_memory:
+            return self.completed[key]
+        if self._reader is None:
+            self._reader = open(self.path, "rb")
+        self._reader.seek(self.offsets[key])
+        record = json.loads(self._reader.readline())
+        record.pop("key")
+        return record
+
+    def write(self, key: str, record: Dict):
+        """Append one generation record and flush it to disk."""
+        self.offsets[key] = self._fh.tell()
+        self._fh.write((json.dumps({"key": key, **record}, ensure_ascii=False) + "\n").encode("utf-8"))
+        self._fh.flush()
+        if self.in_memory:
+            self.completed[key] = record
+
+    def close(self):
+        self._fh.close()
+        if self._reader is not None:
+            self._reader.close()
+
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
     args = parse_args()
-    dataset = pd.read_csv(args.dataset_path)
-    results = []
-    for _, row in tqdm(dataset.iterrows(), total=len(dataset)):
-        response = generate_contextual_ai(
+    if args.chunk_size:
+        metrics = asyncio.run(generate_streaming(
+            args.dataset_path,
+            args.output_path,
             api_token=args.api_token,
-            prompt=row["full_prompt"],
-            system_prompt="",
-            avoid_commentary=PARAMETERS_CONFIG["avoid_commentary"],
-            temperature=PARAMETERS_CONFIG["temperature"],
-            top_p=PARAMETERS_CONFIG["top_p"],
-            max_new_tokens=PARAMETERS_CONFIG["max_new_tokens"]
-        )
-        results.append(response.json()["response"])
-    dataset["generated_output"] = results
-    dataset.to_csv(args.output_path, index=False)
\ No newline at end of file
+            chunk_size=args.chunk_size,
+            concurrency=args.concurrency,
+            max_retries=args.max_retries,
+            timeout=args.timeout,
+            url=args.url,
+            stream=args.stream,
+            metrics_path=args.metrics_path,
+            checkpoint_path=args.checkpoint_path,
+        ))
+        if args.stream:
+            print_latency_summary(metrics)
+    else:
+        dataset = pd.read_csv(args.dataset_path)
+        checkpoint = GenerationCheckpoint(args.checkpoint_path or f"{args.output_path}.checkpoint.jsonl")
+        keys = [prompt_key(prompt, url=args.url) for prompt in dataset["full_prompt"]]
+        # Identical prompts are generated once and fanned out to every row that uses them
+        unique_prompts = dict(zip(keys, dataset["full_prompt"]))
+        rows_by_key: Dict[str, List[int]] = {}
+        for row, key in enumerate(keys):
+            rows_by_key.setdefault(key, []).append(row)
+        pending_keys = [key for key in unique_prompts
+                        if key not in checkpoint.completed or not is_reusable(checkpoint.completed[key], args.stream)]
+        logger.info(f"{len(dataset)} rows, {len(unique_prompts)} unique prompts, "
+                    f"{len(unique_prompts) - len(pending_keys)} already in {checkpoint.path}")
+        try:
+            generated = asyncio.run(generate_all(
+                [unique_prompts[key] for key in pending_keys],
+                api_token=args.api_token,
+                concurrency=args.concurrency,
+                max_retries=args.max_retries,
+                timeout=args.timeout,
+                url=args.url,
+                on_result=lambda i, record: checkpoint.write(pending_keys[i], record),
+                stream=args.stream,
+                metrics_path=args.metrics_path,
+                labels=[f"Prompt {key[:12]} (dataset rows {rows_by_key[key]})" for key in pending_keys],
+            ))
+        finally:
+            checkpoint.close()
+        completed = GenerationCheckpoint.load(checkpoint.path)
+        records = [completed.get(key, {}) for key in keys]
+        dataset["generated_output"] = [record.get("generated_output") for record in records]
+        if args.stream:
+            for column in STREAM_METRIC_COLUMNS:
+                dataset[column] = [record.get(column) for record in records]
+        dataset.to_csv(args.output_path, index=False)
+        if args.stream:
+            # Only the requests of this run, once per unique prompt
+            print_latency_summary(pd.DataFrame([record for record in generated if record is not None],
+                                               columns=STREAM_METRIC_COLUMNS))
@@ -0,0 +1,142 @@
+"""
+Benchmark for evidence_matching.match_all against the notebook's thefuzz loop.
+
+Builds synthetic questions with TOP_RETRIEVED_DOCS chunks each (prose mixed with
+table-like numbers) and evidence strings that are exact substrings, perturbed
+copies or unrelated text. Both implementations must return the same chunk for
+every evidence string under each threshold/alpha/preprocessing setting.
+
+Example Usage:
+    python bench_matching.py --questions 50 --workers 4
+"""
+import argparse
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from thefuzz import fuzz
+
+from evidence_matching import _extract_numbers, _preprocess_text, match_all
+
+TOP_RETRIEVED_DOCS = 150
+COMMON_WORDS = ("revenue income margin quarter fiscal growth total operating expenses net cash flow segment "
+                "automotive energy storage deliveries vehicles production capacity gross profit share the of and "
+                "in to for was were by").split()
+
+
+def matcher_reference(evidence_str: str, retrieved_chunks: List[Dict[str, Any]], threshold: float = 0.85, *,
+                      alpha: float = 1.0, preprocess_text: bool = False) -> Optional[Dict[str, Any]]:
+    """matcher_with_metadata as written in Retrieval_Matching.ipynb, kept for comparison."""
+    if not evidence_str or not retrieved_chunks:
+        return None
+
+    norm_evidence = _preprocess_text(evidence_str) if preprocess_text else evidence_str
+    evidence_nums = _extract_numbers(norm_evidence)
+
+    best_chunk = None
+    best_score = -1.0
+
+    for chunk in retrieved_chunks:
+        chunk_text = chunk["content_text"]
+        norm_chunk = _preprocess_text(chunk_text) if preprocess_text else chunk_text
+
+        if norm_evidence in norm_chunk:
+            return chunk
+
+        fuzzy_score = fuzz.token_set_ratio(norm_evidence, norm_chunk) / 100.0
+        chunk_nums = _extract_numbers(norm_chunk)
+        numeric_matches = sum(1 for n in evidence_nums if n in chunk_nums)
+        numeric_score = numeric_matches / len(evidence_nums) if evidence_nums else 0.0
+
+        final_score = alpha * fuzzy_score + (1 - alpha) * numeric_score if evidence_nums else fuzzy_score
+
+        if final_score > best_score:
+            best_score = final_score
+            best_chunk = chunk
+
+    return best_chunk if best_score >= threshold else None
+
+
+def make_vocabulary(rng: random.Random, size: int = 3000) -> List[str]:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return COMMON_WORDS + ["".join(rng.choice(letters) for _ in range(rng.randint(3, 10))) for _ in range(size)]
+
+
+def make_text(rng: random.Random, num_words: int, vocabulary: List[str]) -> str:
+    tokens = []
+    for _ in range(num_words):
+        roll = rng.random()
+        if roll < 0.1:
+            tokens.append(f"${rng.randint(1, 999)},{rng.randint(0, 999):03d}")
+        elif roll < 0.15:
+            tokens.append(f"{rng.randint(1, 99)}.{rng.randint(0, 9)}%")
+        elif roll < 0.18:
+            tokens.append("|")
+        else:
+            tokens.append(rng.choice(COMMON_WORDS) if rng.random() < 0.4 else rng.choice(vocabulary))
+    return " ".join(tokens)
+
+
+def make_evidence(rng: random.Random, chunks: List[Dict[str, Any]], vocabulary: List[str]) -> str:
+    words = rng.choice(chunks)["content_text"].split()
+    start = rng.randrange(max(1, len(words) - 20))
+    span = words[start:start + rng.randint(8, 20)]
+    kind = rng.random()
+    if kind < 0.3:
+        return " ".join(span)
+    if kind < 0.8:
+        # Perturb: drop and swap a few words, as an LLM paraphrase would
+        span = [w for w in span if rng.random() > 0.15]
+        if len(span) > 2:
+            i = rng.randrange(len(span) - 1)
+            span[i], span[i + 1] = span[i + 1], span[i]
+        return " ".join(span)
+    return make_text(rng, len(span), vocabulary)
+
+
+def make_dataset(num_questions: int, evidence_per_question: int, seed: int = 0):
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(rng)
+    evidence_strs, chunk_lists = [], []
+    for q in range(num_questions):
+        chunks = [{"content_id": f"{q}-{c}", "content_text": make_text(rng, rng.randint(80, 250), vocabulary)}
+                  for c in range(TOP_RETRIEVED_DOCS)]
+        for _ in range(evidence_per_question):
+            evidence_strs.append(make_evidence(rng, chunks, vocabulary))
+            chunk_lists.append(chunks)
+    return evidence_strs, chunk_lists
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=30, help="Number of synthetic questions")
+    parser.add_argument("--evidence_per_question", type=int, default=3, help="Evidence strings per question")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for match_all (default: CPU count)")
+    args = parser.parse_args()
+
+    evidence_strs, chunk_lists = make_dataset(args.questions, args.evidence_per_question)
+    settings = [
+        {"threshold": 0.85, "alpha": 1.0, "preprocess_text": False},
+        {"threshold": 0.85, "alpha": 0.8, "preprocess_text": True},
+        {"threshold": 0.6, "alpha": 0.8, "preprocess_text": False},
+    ]
+    for setting in settings:
+        start = time.perf_counter()
+        expected = [matcher_reference(e, chunks, **setting) for e, chunks in zip(evidence_strs, chunk_lists)]
+        reference_time = time.perf_counter() - start
+        start = time.perf_counter()
+        serial = match_all(evidence_strs, chunk_lists, workers=1, **setting)
+        serial_time = time.perf_counter() - start
+        start = time.perf_counter()
+        parallel = match_all(evidence_strs, chunk_lists, workers=args.workers, **setting)
+        parallel_time = time.perf_counter() - start
+
+        assert serial == expected and parallel == expected, f"Matches differ for {setting}"
+        print(f"{setting}: {sum(m is not None for m in expected)}/{len(expected)} matched, identical")
+        print(f"  thefuzz loop:           {reference_time * 1000:8.1f} ms")
+        print(f"  match_all (1 process):  {serial_time * 1000:8.1f} ms  ({reference_time / serial_time:.1f}x faster)")
+        print(f"  match_all (pool):       {parallel_time * 1000:8.1f} ms  ({reference_time / parallel_time:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark for retrieval_metrics.compute_metrics against the notebook's per-question functions.
+
+First checks that the vectorized metrics reproduce every per-question column saved
+in eval_results_final.csv (including the ragas scores). Then times the notebook's
+functions and, if ragas is installed, its per-sample metrics against one
+compute_metrics call on the results replicated to a larger question set. The
+notebook functions are timed for one k only, while compute_metrics covers all k.
+
+Example Usage:
+    python bench_metrics.py --replicate 100
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from retrieval_metrics import NOTEBOOK_COLUMNS, QUESTION_METRICS, compute_metrics, load_eval_results, metrics_at
+
+
+def recall_at_k(retrieved_ids, ground_truth_ids, k):
+    retrieved_top_k = set(retrieved_ids[:k])
+    return len(retrieved_top_k & ground_truth_ids) / len(ground_truth_ids) if ground_truth_ids else 0.0
+
+
+def precision_at_k(retrieved_ids, ground_truth_ids, k):
+    retrieved_top_k = retrieved_ids[:k]
+    return sum(1 for cid in retrieved_top_k if cid in ground_truth_ids) / k if k else 0.0
+
+
+def ndcg_at_k(retrieved_ids, ground_truth_ids, k=10):
+    top_k = retrieved_ids[:k]
+    relevances = [1 if cid in ground_truth_ids else 0 for cid in top_k]
+    dcg = sum((2**rel - 1) / np.log2(idx + 2) for idx, rel in enumerate(relevances))
+    ideal_relevances = sorted([1]*min(len(ground_truth_ids), k) + [0]*(k - min(len(ground_truth_ids), k)), reverse=True)
+    idcg = sum((2**rel - 1) / np.log2(idx + 2) for idx, rel in enumerate(ideal_relevances))
+    return dcg / idcg if idcg > 0 else 0.0
+
+
+def precision_at_r(retrieved_ids, ground_truth_ids):
+    r = len(ground_truth_ids)
+    retrieved_top_r = retrieved_ids[:r]
+    return sum(1 for cid in retrieved_top_r if cid in ground_truth_ids) / r if r else 0.0
+
+
+def hit_rate_at_k(retrieved_ids, ground_truth_ids, k):
+    return int(any(cid in ground_truth_ids for cid in retrieved_ids[:k]))
+
+
+def reciprocal_rank_at_k(retrieved_ids, ground_truth_ids, k):
+    for idx, cid in enumerate(retrieved_ids[:k]):
+        if cid in ground_truth_ids:
+            return 1.0 / (idx + 1)
+    return 0.0
+
+
+def notebook_metrics(retrieved, ground_truth, k):
+    """The per-question loop of evaluate_single_query, without the API call and ragas."""
+    rows = []
+    for retrieved_ids, truth in zip(retrieved, ground_truth):
+        truth = set(truth)
+        rows.append((recall_at_k(retrieved_ids, truth, k), precision_at_k(retrieved_ids, truth, k),
+                     ndcg_at_k(retrieved_ids, truth, k), precision_at_r(retrieved_ids, truth),
+                     hit_rate_at_k(retrieved_ids, truth, k), reciprocal_rank_at_k(retrieved_ids, truth, k)))
+    return rows
+
+
+def ragas_metrics(retrieved, ground_truth):
+    """ragas NonLLMContextRecall / NonLLMContextPrecisionWithReference, one sample at a time."""
+    from ragas.dataset_schema import SingleTurnSample
+    from ragas.metrics import NonLLMContextPrecisionWithReference, NonLLMContextRecall
+
+    async def run():
+        context_recall = NonLLMContextRecall()
+        context_precision = NonLLMContextPrecisionWithReference()
+        scores = []
+        for retrieved_ids, truth in zip(retrieved, ground_truth):
+            sample = SingleTurnSample(user_input="", reference_contexts=list(truth), retrieved_contexts=retrieved_ids)
+            scores.append((await context_recall.single_turn_ascore(sample),
+                           await context_precision.single_turn_ascore(sample)))
+        return scores
+
+    return asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--eval_results", type=str, default="eval_results_final.csv", help="Saved evaluation results")
+    parser.add_argument("--replicate", type=int, default=100, help="Copies of the questions to time on")
+    args = parser.parse_args()
+
+    results, retrieved, ground_truth = load_eval_results(args.eval_results)
+    k = int(results["k"].iloc[0])
+    vectorized = metrics_at(compute_metrics(retrieved, ground_truth), k)
+    for column in list(NOTEBOOK_COLUMNS.values()) + list(QUESTION_METRICS):
+        assert np.allclose(vectorized[column], results[column], rtol=0, atol=1e-9), f"{column} differs"
+    print(f"All per-question metrics at k={k} match {args.eval_results} ({len(results)} questions)")
+
+    retrieved, ground_truth = retrieved * args.replicate, ground_truth * args.replicate
+    start = time.perf_counter()
+    notebook_metrics(retrieved, ground_truth, k)
+    loop_time = time.perf_counter() - start
+    start = time.perf_counter()
+    metrics = compute_metrics(retrieved, ground_truth)
+    vectorized_time = time.perf_counter() - start
+    print(f"{len(retrieved)} questions")
+    print(f"  notebook functions (k={k} only):      {loop_time * 1000:8.1f} ms")
+    print(f"  compute_metrics (k=1..{metrics['recall'].shape[1]}, + ragas):  {vectorized_time * 1000:8.1f} ms  "
+          f"({loop_time / vectorized_time:.1f}x faster)")
+    try:
+        start = time.perf_counter()
+        ragas_metrics(retrieved, ground_truth)
+        print(f"  ragas per sample:                    {(time.perf_counter() - start) * 1000:8.1f} ms")
+    except ImportError:
+        print("  ragas not installed, skipping its timing")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""Fuzzy matching of gold evidence strings to retrieved chunks.
+
+This is the matcher from ``Retrieval_Matching.ipynb`` made importable and batched.
+It returns the same matches as the notebook's thefuzz loop, but:
+
+• Each chunk is normalized once per question instead of once per evidence
+  string, and only chunks that can still reach the threshold are scanned for
+  numbers
+• For questions with many evidence strings, the substring short-circuit only
+  checks chunks that contain every whole token of the evidence string, found
+  through a token index over the chunks
+• Fuzzy scores for all evidence strings of a question are computed in one
+  rapidfuzz ``cdist`` call, with a score cutoff that skips the detailed
+  comparison for chunks that cannot reach the threshold
+• Questions are spread over a process pool
+
+Example
+-------
+>>> from evidence_matching import match_all
+>>> matches = match_all(df["Evidence"].tolist(), [retrievals[q] for q in df["Question"]])
+>>> df["Match"] = [m is not None for m in matches]
+>>> df["Content_Id"] = [m["content_id"] if m else None for m in matches]
+"""
+import os
+import re
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
+
+# Evidence strings per question from which the substring check uses a token index
+_TOKEN_INDEX_MIN_EVIDENCE = 16
+# thefuzz drops characters 128-255 before scoring (force_ascii=True); do the same
+_ASCII_TABLE = {i: None for i in range(128, 256)}
+
+
+def _thefuzz_process(text: str) -> str:
+    """The normalization ``thefuzz.fuzz.token_set_ratio`` applies to its inputs."""
+    return default_process(str(text).translate(_ASCII_TABLE))
+
+
+def _preprocess_text(text: str) -> str:
+    """Lightweight text normalization to improve fuzzy matching robustness.
+
+    Steps:
+    1. Lower‐case everything.
+    2. Strip table/markdown characters (``|``), repeated dashes and newlines.
+    3. Remove formatting punctuation such as ``$``, ``%``, ``(``, ``)`` and ``+``.
+    4. Remove commas that only serve as thousands separators inside numbers (e.g. ``2,000`` → ``2000``).
+    5. Replace any remaining non‐alphanumeric characters with a single space and collapse runs of whitespace.
+    """
+    text = text.lower()
+    text = text.replace("|", " ")
+    text = re.sub(r"-+", " ", text)
+    text = re.sub(r"\n+", " ", text)
+    text = re.sub(r"[\(\)\$\%\+]", "", text)
+    # Remove commas between digits (e.g. 1,234 -> 1234)
+    text = re.sub(r"(\d),(\d)", r"\1\2", text)
+    # Remove any other non alphanum / period characters
+    text = re.sub(r"[^a-z0-9\. ]", " ", text)
+    # Collapse redundant whitespace
+    text = re.sub(r"\s+", " ", text).strip()
+    return text
+
+
+# Regex for capturing numbers that appear in evidence / chunks.
+_NUMBER_PATTERN = re.compile(
+    r"[-+]?\$?\s*(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?%?|"  # standard numbers / currency / percentages
+    r"\([^)]*\d+[^)]*\)"  # numbers enclosed in parentheses
+)
+
+
+def _extract_numbers(text: str) -> List[str]:
+    """Return a list of the numeric substrings found in *text*."""
+    return [m.strip() for m in _NUMBER_PATTERN.findall(text)]
+
+
+def _substring_candidates(evidence: str, chunk_tokens: Dict[str, set], num_chunks: int) -> List[int]:
+    """Indices of chunks that may contain *evidence* as a substring, in order.
+
+    A token of the evidence that is delimited by whitespace on both sides (every
+    token except the first and last, which may be cut mid-word) must also appear
+    as a whole token of any chunk containing the evidence, so only chunks holding
+    all of them are worth checking.
+    """
+    interior = evidence.split()[1:-1]
+    if not interior:
+        return list(range(num_chunks))
+    candidates = None
+    for token in sorted(set(interior), key=lambda t: len(chunk_tokens.get(t, ()))):
+        postings = chunk_tokens.get(token)
+        if not postings:
+            return []
+        candidates = set(postings) if candidates is None else candidates & postings
+        if not candidates:
+            return []
+    return sorted(candidates)
+
+
+def match_evidence_batch(
+    evidence_strs: Sequence[str],
+    retrieved_chunks: List[Dict[str, Any]],
+    threshold: float = 0.85,
+    *,
+    alpha: float = 1.0,
+    preprocess_text: bool = False,
+) -> List[Optional[int]]:
+    """Match several evidence strings against one question's retrieved chunks.
+
+    Scoring is that of :func:`matcher_with_metadata`; see there for parameters.
+
+    Returns
+    -------
+    List[Optional[int]]
+        For each evidence string, the index in retrieved_chunks of its match, or
+        None if no chunk meets the threshold.
+    """
+    if not retrieved_chunks:
+        return [None] * len(evidence_strs)
+    chunk_texts = [chunk["content_text"] for chunk in retrieved_chunks]
+    norm_chunks = [_preprocess_text(text) for text in chunk_texts] if preprocess_text else chunk_texts
+    # The token index only pays for itself when many evidence strings share the chunks
+    chunk_tokens: Optional[Dict[str, set]] = None
+    if len(evidence_strs) >= _TOKEN_INDEX_MIN_EVIDENCE:
+        chunk_tokens = defaultdict(set)
+        for i, text in enumerate(norm_chunks):
+            for token in text.split():
+                chunk_tokens[token].add(i)
+    chunk_nums: Dict[int, List[str]] = {}
+
+    matches: List[Optional[int]] = [None] * len(evidence_strs)
+    to_score, score_cutoffs, evidence_nums = [], [], {}
+    for e, evidence_str in enumerate(evidence_strs):
+        if not evidence_str:
+            continue
+        norm_evidence = _preprocess_text(evidence_str) if preprocess_text else evidence_str
+        # Short-circuit on the first chunk containing the entire evidence string
+        candidates = (range(len(norm_chunks)) if chunk_tokens is None
+                      else _substring_candidates(norm_evidence, chunk_tokens, len(norm_chunks)))
+        substring_match = next((i for i in candidates if norm_evidence in norm_chunks[i]), None)
+        if substring_match is not None:
+            matches[e] = substring_match
+            continue
+        nums = _extract_numbers(norm_evidence)
+        evidence_nums[e] = nums
+        # Lowest fuzzy score (0-1) that can still reach the threshold, given numeric_score <= 1
+        if not nums:
+            min_fuzzy = threshold
+        elif alpha > 0:
+            min_fuzzy = (threshold - (1 - alpha)) / alpha
+        else:
+            min_fuzzy = 0.0
+        to_score.append((e, norm_evidence))
+        score_cutoffs.append(min_fuzzy)
+    if not to_score:
+        return matches
+
+    # thefuzz rounds token_set_ratio to an integer percentage. A raw score more than a
+    # point below the lowest useful cutoff cannot reach the threshold and is left at 0;
+    # such chunks can never be the returned match.
+    cutoff = max(0.0, min(score_cutoffs) * 100 - 1)
+    raw_scores = process.cdist([evidence for _, evidence in to_score], norm_chunks, scorer=fuzz.token_set_ratio,
+                               processor=_thefuzz_process, score_cutoff=cutoff, dtype=np.float64, workers=1)
+    fuzzy_scores = np.round(raw_scores) / 100.0
+
+    for row, (e, _) in enumerate(to_score):
+        fuzzy = fuzzy_scores[row]
+        nums = evidence_nums[e]
+        if nums and alpha != 1:
+            # Only chunks that passed the cutoff can reach the threshold, so only
+            # they need their numbers extracted; the rest are ruled out.
+            final = np.full(len(norm_chunks), -1.0)
+            for i in np.flatnonzero(raw_scores[row] >= cutoff):
+                if i not in chunk_nums:
+                    chunk_nums[i] = _extract_numbers(norm_chunks[i])
+                numeric = sum(1 for n in nums if n in chunk_nums[i]) / len(nums)
+                final[i] = alpha * fuzzy[i] + (1 - alpha) * numeric
+        else:
+            # With alpha == 1 the numeric term is multiplied by zero
+            final = fuzzy
+        best = int(np.argmax(final))
+        if final[best] >= threshold:
+            matches[e] = best
+    return matches
+
+
+def matcher_with_metadata(
+    evidence_str: str,
+    retrieved_chunks: List[Dict[str, Any]],
+    threshold: float = 0.85,
+    *,
+    alpha: float = 1.0,
+    preprocess_text: bool = False,
+) -> Optional[Dict[str, Any]]:
+    """Return the retrieved chunk (with metadata) that best matches evidence_str.
+
+    This function finds the best matching chunk from a list of chunks containing
+    both content text and metadata. The scoring mirrors the non-LLM portion of
+    ``EvidenceMatchFuzzyLLM``:
+
+    • The *fuzzy* component uses `token_set_ratio` between preprocessed strings
+    • The *numeric* component measures overlap of extracted numeric tokens
+    • The final score is ``alpha * fuzzy + (1-alpha) * numeric`` when evidence
+      contains numbers, otherwise just the fuzzy score
+
+    Parameters
+    ----------
+    evidence_str : str
+        The target evidence string to match against.
+    retrieved_chunks : List[Dict[str, Any]]
+        List of chunk dictionaries, each containing a "content_text" key with
+        the text content to match against, plus any additional metadata.
+    threshold : float, default 0.85
+        Minimum score required to return a match. Chunks scoring below this
+        threshold will result in None being returned.
+    alpha : float, default 1.0
+        Weight assigned to the fuzzy score when both fuzzy and numeric scores
+        are available. For chunks heavy with financial tables, alpha = 0.8
+        is recommended to give more weight to numeric matching.
+    preprocess_text : bool, default False
+        Whether to run light normalization before matching. Preprocessing is
+        helpful for chunks where numbers matter significantly, such as
+        financial tables.
+
+    Returns
+    -------
+    Optional[Dict[str, Any]]
+        The complete chunk dictionary from retrieved_chunks with the highest
+        score, or None if no chunk meets the threshold or if input is empty.
+    """
+    if not evidence_str or not retrieved_chunks:
+        return None
+    index = match_evidence_batch([evidence_str], retrieved_chunks, threshold,
+                                 alpha=alpha, preprocess_text=preprocess_text)[0]
+    return retrieved_chunks[index] if index is not None else None
+
+
+def _match_group(args) -> List[Optional[int]]:
+    evidence_strs, retrieved_chunks, threshold, alpha, preprocess_text = args
+    return match_evidence_batch(evidence_strs, retrieved_chunks, threshold, alpha=alpha,
+                                preprocess_text=preprocess_text)
+
+
+def match_all(
+    evidence_strs: Sequence[str],
+    chunk_lists: Sequence[List[Dict[str, Any]]],
+    threshold: float = 0.85,
+    *,
+    alpha: float = 1.0,
+    preprocess_text: bool = False,
+    workers: Optional[int] = None,
+) -> List[Optional[Dict[str, Any]]]:
+    """Match every evidence string against the chunks retrieved for its row.
+
+    Rows that share a chunk list (the same question) are scored together in one
+    batch, and batches run in a process pool.
+
+    Parameters
+    ----------
+    evidence_strs : Sequence[str]
+        One evidence string per row.
+    chunk_lists : Sequence[List[Dict[str, Any]]]
+        The retrieved chunks for each row. Rows of the same question should pass
+        the same list object so they are batched together.
+    threshold, alpha, preprocess_text
+        As in :func:`matcher_with_metadata`.
+    workers : int, optional
+        Number of worker processes (default: CPU count). 1 matches in-process.
+
+    Returns
+    -------
+    List[Optional[Dict[str, Any]]]
+        For each row, the matched chunk dictionary or None.
+    """
+    groups: Dict[int, List[int]] = defaultdict(list)
+    for row, chunks in enumerate(chunk_lists):
+        groups[id(chunks)].append(row)
+    jobs = [([evidence_strs[row] for row in rows], chunk_lists[rows[0]], threshold, alpha, preprocess_text)
+            for rows in groups.values()]
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        results = [_match_group(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_match_group, jobs, chunksize=max(1, len(jobs) // (4 * workers))))
+
+    matches: List[Optional[Dict[str, Any]]] = [None] * len(evidence_strs)
+    for rows, indices in zip(groups.values(), results):
+        for row, index in zip(rows, indices):
+            if index is not None:
+                matches[row] = chunk_lists[row][index]
+    return matches
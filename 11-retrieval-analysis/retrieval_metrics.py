@@ -0,0 +1,282 @@
+"""Vectorized retrieval metrics for every cutoff k, with bootstrap confidence intervals.
+
+``Retrieval_Evaluation.ipynb`` scores one question at a time in Python and calls
+ragas once per sample, for a single k. This module turns a whole evaluation into a
+binary relevance matrix (questions x ranks) and computes recall@k, precision@k,
+hit rate@k, MRR@k and nDCG@k for all k at once with cumulative sums. It also
+computes precision@R and the ragas ``NonLLMContextRecall`` /
+``NonLLMContextPrecisionWithReference`` scores. The numbers are the same as the
+notebook's per-question columns; ``bench_metrics.py`` checks this against
+``eval_results_final.csv``.
+
+The ragas metrics compare ids by string similarity above a threshold. Distinct
+chunk ids (UUIDs) are never that similar, so here they reduce to exact id matching.
+
+Example Usage:
+    python retrieval_metrics.py --eval_results eval_results_final.csv --ks 1 5 10 --n_boot 1000
+"""
+import argparse
+import ast
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Metrics computed for every cutoff k, shape (questions, max_k)
+RANKED_METRICS = ("recall", "precision", "hit_rate", "mrr", "ndcg", "idcg")
+# Metrics with one value per question, shape (questions,)
+QUESTION_METRICS = ("precision@R", "ragas_context_recall", "ragas_context_precision")
+# Column names the notebook uses in eval_results_final.csv
+NOTEBOOK_COLUMNS = {"recall": "recall@k", "precision": "precision@k", "hit_rate": "hit_rate@k", "mrr": "mrr@k",
+                    "ndcg": "nDCG@k", "idcg": "iDCG@k"}
+
+
+def load_ground_truth(matched_path: str) -> Dict[int, List[str]]:
+    """Ground-truth chunk ids per QA_ID from the matching output (``matched_retrievals.csv``).
+
+    Rows whose evidence was not matched (no Content_Id) are left out, as in the
+    notebook's pivot to ``evidence_*`` columns.
+    """
+    matched = pd.read_csv(matched_path)
+    matched = matched[matched["Content_Id"].notna()]
+    return {int(qa_id): list(dict.fromkeys(ids)) for qa_id, ids in matched.groupby("QA_ID", sort=False)["Content_Id"]}
+
+
+def load_eval_results(path: str) -> Tuple[pd.DataFrame, List[List[str]], List[List[str]]]:
+    """Read a saved evaluation (``eval_results_final.csv``).
+
+    Returns
+    -------
+    Tuple[pd.DataFrame, List[List[str]], List[List[str]]]
+        The results table, the retrieved ids per question and the ground-truth
+        ids per question (parsed from their list literals).
+    """
+    results = pd.read_csv(path)
+    retrieved = [ast.literal_eval(ids) for ids in results["retriever_ids"]]
+    ground_truth = [ast.literal_eval(ids) for ids in results["ground_truth_ids"]]
+    return results, retrieved, ground_truth
+
+
+def relevance_matrix(
+    retrieved: Sequence[Sequence[str]],
+    ground_truth: Sequence[Iterable[str]],
+    depth: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Mark which retrieved ids are relevant.
+
+    Parameters
+    ----------
+    retrieved : Sequence[Sequence[str]]
+        Retrieved ids per question, in rank order.
+    ground_truth : Sequence[Iterable[str]]
+        Relevant ids per question.
+    depth : int, optional
+        Number of ranks to keep (default: the longest retrieved list). Shorter
+        lists are padded with non-relevant ranks.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+        ``rel`` (questions x depth, 1 where the id at that rank is relevant),
+        ``first_rel`` (as ``rel`` but only at the first occurrence of each id,
+        for set-based recall), the number of relevant ids per question and the
+        number of retrieved ids per question.
+    """
+    if depth is None:
+        depth = max((len(ids) for ids in retrieved), default=0)
+    rel = np.zeros((len(retrieved), depth), dtype=np.int8)
+    first_rel = np.zeros_like(rel)
+    num_relevant = np.zeros(len(retrieved), dtype=np.int64)
+    num_retrieved = np.array([len(ids) for ids in retrieved], dtype=np.int64)
+    for q, (ids, truth) in enumerate(zip(retrieved, ground_truth)):
+        truth = set(truth)
+        num_relevant[q] = len(truth)
+        seen = set()
+        for rank, cid in enumerate(ids[:depth]):
+            if cid in truth:
+                rel[q, rank] = 1
+                if cid not in seen:
+                    first_rel[q, rank] = 1
+                    seen.add(cid)
+    return rel, first_rel, num_relevant, num_retrieved
+
+
+def compute_metrics(
+    retrieved: Sequence[Sequence[str]],
+    ground_truth: Sequence[Iterable[str]],
+    max_k: Optional[int] = None,
+) -> Dict[str, np.ndarray]:
+    """Per-question retrieval metrics for every cutoff k = 1..max_k.
+
+    The definitions follow ``Retrieval_Evaluation.ipynb``: precision@k divides by
+    k even when fewer than k chunks were retrieved; recall@k counts distinct
+    relevant ids; nDCG@k uses binary gains; questions without ground truth score 0.
+
+    Parameters
+    ----------
+    retrieved : Sequence[Sequence[str]]
+        Retrieved ids per question, in rank order.
+    ground_truth : Sequence[Iterable[str]]
+        Relevant ids per question.
+    max_k : int, optional
+        Largest cutoff (default: the longest retrieved list).
+
+    Returns
+    -------
+    Dict[str, np.ndarray]
+        ``RANKED_METRICS`` as (questions x max_k) arrays, column k-1 holding the
+        value at cutoff k, and ``QUESTION_METRICS`` as (questions,) arrays.
+    """
+    longest = max((len(ids) for ids in retrieved), default=0)
+    if max_k is None:
+        max_k = longest
+    ground_truth = [set(truth) for truth in ground_truth]
+    # precision@R looks R = |ground truth| ranks deep and the ragas scores use every
+    # retrieved id, so the matrix may need to be deeper than max_k
+    depth = max([max_k, longest] + [len(truth) for truth in ground_truth])
+    rel, first_rel, num_relevant, _ = relevance_matrix(retrieved, ground_truth, depth)
+    ks = np.arange(1, max_k + 1)
+    has_truth = num_relevant > 0
+    safe_relevant = np.maximum(num_relevant, 1)
+
+    hits = np.cumsum(rel, axis=1, dtype=np.float64)
+    distinct_hits = np.cumsum(first_rel, axis=1, dtype=np.float64)
+    recall = np.where(has_truth[:, None], distinct_hits[:, :max_k] / safe_relevant[:, None], 0.0)
+    precision = hits[:, :max_k] / ks
+
+    hit_rate = (hits[:, :max_k] > 0).astype(np.int64)
+    first_hit = np.where(rel.any(axis=1), rel.argmax(axis=1), depth)
+    mrr = np.where(first_hit[:, None] < ks, 1.0 / (first_hit[:, None] + 1), 0.0)
+
+    discounts = 1.0 / np.log2(np.arange(depth) + 2)
+    dcg = np.cumsum(rel[:, :max_k] * discounts[:max_k], axis=1)
+    ideal_discounts = np.concatenate([[0.0], np.cumsum(discounts)])
+    idcg = ideal_discounts[np.minimum(num_relevant[:, None], ks)]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ndcg = np.where(idcg > 0, dcg / idcg, 0.0)
+
+    precision_r = np.where(has_truth, hits[np.arange(len(retrieved)), safe_relevant - 1] / safe_relevant, 0.0)
+
+    # The ragas scores use every retrieved id, not a top-k cutoff
+    ragas_recall = np.where(has_truth, first_rel.sum(axis=1) / safe_relevant, np.nan)
+    # Average precision; the 1e-10 keeps ragas' value when nothing is relevant
+    ragas_precision = (hits / np.arange(1, depth + 1) * rel).sum(axis=1) / (rel.sum(axis=1) + 1e-10)
+
+    return {
+        "recall": recall,
+        "precision": precision,
+        "hit_rate": hit_rate,
+        "mrr": mrr,
+        "ndcg": ndcg,
+        "idcg": idcg,
+        "precision@R": precision_r,
+        "ragas_context_recall": ragas_recall,
+        "ragas_context_precision": ragas_precision,
+    }
+
+
+def metrics_at(metrics: Dict[str, np.ndarray], k: int) -> pd.DataFrame:
+    """Per-question metrics at one cutoff, with the notebook's column names."""
+    table = {NOTEBOOK_COLUMNS[name]: metrics[name][:, k - 1] for name in RANKED_METRICS}
+    table.update({name: metrics[name] for name in QUESTION_METRICS})
+    return pd.DataFrame(table)
+
+
+def bootstrap_ci(
+    values: np.ndarray,
+    n_boot: int = 1000,
+    confidence: float = 0.95,
+    seed: Optional[int] = 0,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Mean and percentile bootstrap confidence interval over questions.
+
+    All resamples are drawn at once as multinomial counts per question, so the
+    resampled means for every column are a single matrix product.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Per-question values, shape (questions,) or (questions, columns). NaN
+        entries (e.g. ragas scores without ground truth) are left out.
+    n_boot : int, default 1000
+        Number of bootstrap resamples.
+    confidence : float, default 0.95
+        Coverage of the interval.
+    seed : int, optional
+        Seed for the resampling.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray, np.ndarray]
+        The mean, lower and upper bound for each column.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    squeeze = values.ndim == 1
+    if squeeze:
+        values = values[:, None]
+    num_questions = values.shape[0]
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    rng = np.random.default_rng(seed)
+    counts = rng.multinomial(num_questions, np.full(num_questions, 1.0 / num_questions), size=n_boot).astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = filled.sum(axis=0) / valid.sum(axis=0)
+        boot_means = (counts @ filled) / (counts @ valid)
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.nanpercentile(boot_means, [tail, 100 - tail], axis=0)
+    if squeeze:
+        return means[0], low[0], high[0]
+    return means, low, high
+
+
+def summarize(
+    metrics: Dict[str, np.ndarray],
+    ks: Sequence[int],
+    n_boot: int = 1000,
+    confidence: float = 0.95,
+    seed: Optional[int] = 0,
+) -> pd.DataFrame:
+    """Mean and bootstrap CI of every metric, one row per (metric, k).
+
+    ``QUESTION_METRICS`` do not depend on k and get one row each with k empty.
+    """
+    rows = []
+    for name in RANKED_METRICS:
+        columns = np.asarray(ks) - 1
+        mean, low, high = bootstrap_ci(metrics[name][:, columns], n_boot, confidence, seed)
+        rows.extend({"metric": name, "k": k, "mean": m, "ci_low": lo, "ci_high": hi}
+                    for k, m, lo, hi in zip(ks, mean, low, high))
+    for name in QUESTION_METRICS:
+        mean, low, high = bootstrap_ci(metrics[name], n_boot, confidence, seed)
+        rows.append({"metric": name, "k": None, "mean": mean, "ci_low": low, "ci_high": high})
+    return pd.DataFrame(rows).astype({"k": "Int64"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval metrics for all k with bootstrap confidence intervals")
+    parser.add_argument("--eval_results", type=str, default="eval_results_final.csv",
+                        help="Evaluation results with retriever_ids and ground_truth_ids columns")
+    parser.add_argument("--matched", type=str, default=None,
+                        help="Take ground truth from this matching output (matched_retrievals.csv) by QA_ID instead")
+    parser.add_argument("--ks", type=int, nargs="+", default=[1, 3, 5, 10], help="Cutoffs to report")
+    parser.add_argument("--n_boot", type=int, default=1000, help="Bootstrap resamples")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence interval coverage")
+    parser.add_argument("--seed", type=int, default=0, help="Bootstrap seed")
+    parser.add_argument("--output", type=str, default=None, help="Write the summary table to this CSV")
+    args = parser.parse_args()
+
+    results, retrieved, ground_truth = load_eval_results(args.eval_results)
+    if args.matched:
+        truth_by_id = load_ground_truth(args.matched)
+        ground_truth = [truth_by_id.get(int(qa_id), []) for qa_id in results["index"]]
+    metrics = compute_metrics(retrieved, ground_truth, max_k=max(args.ks))
+    summary = summarize(metrics, args.ks, args.n_boot, args.confidence, args.seed)
+    print(f"{len(retrieved)} questions, {args.n_boot} bootstrap resamples, {args.confidence:.0%} CI")
+    print(summary.to_string(index=False, float_format=lambda x: f"{x:.4f}"))
+    if args.output:
+        summary.to_csv(args.output, index=False)
+        print(f"Saved summary to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Concurrent, cached retrieval for the retrieval analysis notebooks.
+
+The QA spreadsheet is forward-filled, so the same question (and source document)
+appears on several evidence rows. ``retrieve_all`` retrieves each distinct
+(question, filename) pair once, runs the requests with bounded concurrency on the
+shared ``ContextualClient`` (pooled connections, retries with backoff), and caches
+the results on disk. The cache key is (endpoint, agent, question, filename filter),
+so re-running the matching with different thresholds makes no API calls. A pair
+whose request fails after all retries is logged and left out of the results, so one
+failure does not discard the others.
+
+Example
+-------
+>>> retrievals = await retrieve_all(zip(df["Question"], df["Source_Document"]), AGENT_ID, API_KEY)
+>>> failed = [key not in retrievals for key in zip(df["Question"], df["Source_Document"])]
+"""
+import asyncio
+import logging
+import os
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from contextual_client import ContextualClient  # noqa: E402
+from response_cache import ResponseCache  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_URL = "https://api.app.contextual.ai/v1/applications/{agent_id}/query?retrievals_only=true"
+DEFAULT_CACHE_PATH = "retrieval_cache.sqlite"
+DEFAULT_CONCURRENCY = 8
+
+RetrievalKey = Tuple[str, Optional[str]]
+
+
+def build_payload(question: str, source_document: Optional[str] = None) -> Dict[str, Any]:
+    """Build the retrievals-only query body, filtered to one source document if given.
+
+    The agent's own retrieval settings apply: the API does not honour an
+    override_retrieval_config on this endpoint yet (see the notebook), so alpha and
+    top_k are neither sent nor part of the cache key.
+    """
+    payload: Dict[str, Any] = {
+        "stream": False,
+        "messages": [{"role": "user", "content": question}],
+    }
+    if source_document:
+        payload["documents_filters"] = {
+            "operator": "AND",
+            "filters": [
+                {"field": "Filename", "operator": "equals", "value": source_document}
+            ]
+        }
+    return payload
+
+
+def cache_key(agent_id: str, question: str, source_document: Optional[str]) -> Dict[str, Any]:
+    """The fields a cached retrieval is keyed on."""
+    return {"agent_id": agent_id, "question": question, "filename": source_document}
+
+
+async def retrieve_all(
+    queries: Iterable[RetrievalKey],
+    agent_id: str,
+    api_key: str,
+    *,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    cache_path: Optional[str] = DEFAULT_CACHE_PATH,
+    max_retries: int = 3,
+    timeout: float = 30,
+    url: str = RETRIEVAL_URL,
+) -> Dict[RetrievalKey, List[Dict[str, Any]]]:
+    """Retrieve chunks for every distinct (question, source document) pair.
+
+    Parameters
+    ----------
+    queries : Iterable[Tuple[str, Optional[str]]]
+        (question, source document) per row; duplicates are retrieved once. An
+        empty source document retrieves without a filename filter.
+    agent_id, api_key : str
+        Agent to query and the Contextual AI API key.
+    concurrency : int
+        Maximum number of requests in flight.
+    cache_path : str, optional
+        SQLite file retrievals are cached in; None disables the cache.
+    max_retries, timeout
+        Attempts per request and per-attempt timeout in seconds.
+    url : str
+        Query endpoint, formatted with agent_id.
+
+    Returns
+    -------
+    Dict[Tuple[str, Optional[str]], List[Dict[str, Any]]]
+        The "retrieval_contents" for each distinct pair. Rows with the same pair
+        share one list, so ``evidence_matching.match_all`` batches them together.
+        Pairs whose request failed are logged and missing from the dict; they are
+        not cached, so the next call retries them.
+    """
+    unique = list(dict.fromkeys((question, source) for question, source in queries))
+    endpoint_url = url.format(agent_id=agent_id)
+    cache = ResponseCache(cache_path) if cache_path else None
+    results: Dict[RetrievalKey, List[Dict[str, Any]]] = {}
+    errors: Dict[RetrievalKey, Exception] = {}
+    pending = []
+    for key in unique:
+        cached = cache.get(endpoint_url, cache_key(agent_id, *key)) if cache is not None else None
+        if cached is not None:
+            results[key] = cached["retrieval_contents"]
+        else:
+            pending.append(key)
+    logger.info(f"{len(unique)} distinct retrievals, {len(unique) - len(pending)} cached, {len(pending)} to fetch")
+
+    try:
+        async with ContextualClient(api_key, max_retries=max_retries, timeout=timeout,
+                                    max_connections=concurrency) as client:
+            remaining = iter(pending)
+
+            async def worker():
+                for question, source_document in remaining:
+                    try:
+                        body = await client.post("query", build_payload(question, source_document), url=endpoint_url)
+                    except Exception as e:
+                        logger.warning(f"Retrieval failed for {question!r} ({source_document}): {e}")
+                        errors[(question, source_document)] = e
+                        continue
+                    chunks = body.get("retrieval_contents", [])
+                    results[(question, source_document)] = chunks
+                    if cache is not None:
+                        cache.set(endpoint_url, cache_key(agent_id, question, source_document),
+                                  {"retrieval_contents": chunks})
+
+            if pending:
+                await asyncio.gather(*(worker() for _ in range(min(concurrency, len(pending)))))
+        logger.info(f"Retrieval client stats: {client.get_stats()}")
+        if errors:
+            logger.warning(f"{len(errors)} of {len(pending)} retrievals failed and are missing from the results")
+    finally:
+        if cache is not None:
+            logger.info(f"Retrieval cache stats: {cache.stats}")
+            cache.close()
+    return results
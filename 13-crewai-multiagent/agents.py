@@ -3,12 +3,13 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from crewai import Agent
-from crewai_tools.tools.arxiv_paper_tool.arxiv_paper_tool import ArxivPaperTool
-from crewai_tools import ContextualAICreateAgentTool, ContextualAIQueryTool
+from crewai_tools import ContextualAIQueryTool
+from research_tools import CachedContextualAICreateAgentTool, ParallelArxivPaperTool
 
-# Initialize tools
-arxiv_tool = ArxivPaperTool(download_pdfs=True, save_dir="./arxiv_pdfs", use_title_as_filename=False)
-create_agent_tool = ContextualAICreateAgentTool(api_key=os.getenv("CONTEXTUAL_API_KEY")) # , set_env_vars=False
+# Initialize tools. PDFs already in ./arxiv_pdfs are not downloaded again, and a PDF set that was
+# ingested before reuses its datastore and agent from contextual_registry.json
+arxiv_tool = ParallelArxivPaperTool(download_pdfs=True, save_dir="./arxiv_pdfs", use_title_as_filename=False)
+create_agent_tool = CachedContextualAICreateAgentTool(api_key=os.getenv("CONTEXTUAL_API_KEY"), registry_path="./contextual_registry.json") # , set_env_vars=False
 query_tool = ContextualAIQueryTool(api_key=os.getenv("CONTEXTUAL_API_KEY")) # , use_env_vars=False
 
 # Define agents
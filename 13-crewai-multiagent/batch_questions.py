@@ -0,0 +1,126 @@
+"""
+Batch question answering against the Contextual AI agent built by the research crew.
+
+The crew searches and ingests the papers once. Every question is then sent straight to
+ContextualAIQueryTool from a bounded thread pool, without a crew run per question. Each
+answer is written to a JSONL file as soon as it arrives, with its latency.
+
+Questions files are either plain text with one question per line, or JSONL with a
+"question" field per line.
+
+Example Usage:
+    python main.py --topic "vision transformer" --questions_file questions.txt --output answers.jsonl
+"""
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List
+
+
+def load_questions(path: str) -> List[str]:
+    """
+    Read questions from a text or JSONL file.
+
+    Args:
+        path: File with one question per line. Lines starting with "{" are parsed as JSON
+            objects with a "question" field. Blank lines are skipped.
+
+    Returns:
+        Questions in file order.
+    """
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            questions.append(json.loads(line)["question"] if line.startswith("{") else line)
+    return questions
+
+
+def wait_for_documents(client, datastore_id: str, interval: float = 15, timeout: float = 1800) -> bool:
+    """
+    Poll a datastore until no document is still being ingested.
+
+    Done once before the batch, instead of in every query as ContextualAIQueryTool does when
+    given a datastore_id.
+
+    Args:
+        client: ContextualAI client.
+        datastore_id: Datastore to check.
+        interval: Seconds between checks.
+        timeout: Seconds to wait before querying anyway.
+
+    Returns:
+        True if all documents finished ingestion, False on timeout.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        statuses = [doc.status for doc in client.datastores.documents.list(datastore_id)]
+        if not any(status in ("pending", "processing", "retrying") for status in statuses):
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(interval)
+
+
+def answer_questions(
+    query_tool,
+    agent_id: str,
+    questions: List[str],
+    output_path: str,
+    max_workers: int = 8,
+) -> Dict[str, Any]:
+    """
+    Query the agent with every question concurrently and write the answers to JSONL.
+
+    Args:
+        query_tool: ContextualAIQueryTool.
+        agent_id: Agent to query.
+        questions: Questions to ask.
+        output_path: JSONL file. Each line has index, question, answer, latency_s and error,
+            written in completion order.
+        max_workers: Queries in flight at once.
+
+    Returns:
+        Summary with the number of questions and errors, wall time and latency percentiles.
+    """
+    def ask(question: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        answer, error = None, None
+        try:
+            answer = query_tool.run(query=question, agent_id=agent_id)
+            # The tool reports API failures as a string instead of raising
+            if answer.startswith("Error querying Contextual AI agent"):
+                answer, error = None, answer
+        except Exception as e:
+            error = str(e)
+        return {"answer": answer, "error": error, "latency_s": round(time.perf_counter() - start, 3)}
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    with open(output_path, "w", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(questions)))) as pool:
+        futures = {pool.submit(ask, question): i for i, question in enumerate(questions)}
+        for future in as_completed(futures):
+            index = futures[future]
+            record = {"index": index, "question": questions[index], **future.result()}
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            latencies.append(record["latency_s"])
+            errors += record["error"] is not None
+
+    latencies.sort()
+
+    def percentile(q: float):
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else None
+
+    return {
+        "questions": len(questions),
+        "errors": errors,
+        "wall_time_s": round(time.perf_counter() - start, 3),
+        "p50_latency_s": percentile(0.5),
+        "p95_latency_s": percentile(0.95),
+    }
@@ -0,0 +1,255 @@
+"""
+Local registry of Contextual AI datastores and agents keyed by the content of their PDFs.
+
+The registry is a JSON file that maps the SHA-256 of a PDF set to the datastore and agent
+built from it. The set hash is computed from the sorted SHA-256 digests of the files, so
+it does not depend on file names, paths or order. A repeat research topic that downloads
+the same papers finds its existing agent and skips ingestion.
+
+New PDF sets are uploaded concurrently, and arXiv PDFs are downloaded concurrently, with
+files already on disk reused. A registered agent is only replaced when the API reports it
+as not found; other errors propagate. A datastore whose upload or agent creation fails is
+deleted again, so retries do not leave orphaned datastores behind.
+
+Example Usage:
+    from contextual import ContextualAI
+    from datastore_registry import DatastoreRegistry, get_or_create_agent
+
+    client = ContextualAI(api_key=api_key)
+    entry, reused = get_or_create_agent(
+        client, DatastoreRegistry(), "Research Paper Assistant", "AI assistant with access to research papers",
+        "Research Papers Knowledge Base", ["./arxiv_pdfs/2204_07780v1.pdf", "./arxiv_pdfs/2305_09880v4.pdf"],
+    )
+    print(entry["agent_id"], entry["datastore_id"], reused)
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from contextual import NotFoundError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REGISTRY_PATH = "./contextual_registry.json"
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """Hex SHA-256 digest of a file's content, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def pdf_set_hash(paths: Sequence[str]) -> str:
+    """
+    SHA-256 identifying a set of files by content.
+
+    Args:
+        paths: File paths. Duplicates and order do not change the hash.
+
+    Returns:
+        Hex digest over the sorted, de-duplicated per-file digests.
+    """
+    digests = sorted({file_sha256(path) for path in paths})
+    return hashlib.sha256("\n".join(digests).encode()).hexdigest()
+
+
+class DatastoreRegistry:
+    """JSON file mapping PDF set hashes to the datastore and agent created from them."""
+
+    def __init__(self, path: str = DEFAULT_REGISTRY_PATH):
+        """
+        Args:
+            path: Registry file. Created on the first `put`.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as f:
+            return json.load(f)
+
+    def _write(self, entries: Dict[str, Dict[str, Any]]):
+        # Write to a temporary file and rename, so an interrupted run never leaves a truncated registry
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get(self, set_hash: str) -> Optional[Dict[str, Any]]:
+        """Entry for a PDF set hash, or None."""
+        with self._lock:
+            return self._read().get(set_hash)
+
+    def put(self, set_hash: str, entry: Dict[str, Any]):
+        """Store or replace the entry for a PDF set hash."""
+        with self._lock:
+            entries = self._read()
+            entries[set_hash] = entry
+            self._write(entries)
+
+    def remove(self, set_hash: str):
+        """Forget a PDF set hash, e.g. when its agent was deleted."""
+        with self._lock:
+            entries = self._read()
+            if entries.pop(set_hash, None) is not None:
+                self._write(entries)
+
+    def entries(self) -> Dict[str, Dict[str, Any]]:
+        """All entries keyed by PDF set hash."""
+        with self._lock:
+            return self._read()
+
+
+def upload_documents(client, datastore_id: str, paths: Sequence[str], max_workers: int = 8) -> List[str]:
+    """
+    Ingest files into a datastore concurrently.
+
+    Args:
+        client: ContextualAI client. Its HTTP client is shared by the worker threads.
+        datastore_id: Datastore to ingest into.
+        paths: Files to upload.
+        max_workers: Uploads in flight at once.
+
+    Returns:
+        Document IDs in the order of paths.
+    """
+    def ingest(path: str) -> str:
+        with open(path, "rb") as f:
+            return client.datastores.documents.ingest(datastore_id, file=f).id
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(paths)))) as pool:
+        return list(pool.map(ingest, paths))
+
+
+def agent_exists(client, agent_id: str) -> bool:
+    """
+    Whether an agent can still be fetched, i.e. was not deleted since it was registered.
+
+    Only a not-found response counts as deleted. Network errors, timeouts and 5xx responses
+    are raised, so a transient failure never triggers a duplicate ingestion.
+    """
+    try:
+        client.agents.metadata(agent_id)
+        return True
+    except NotFoundError:
+        return False
+
+
+def get_or_create_agent(
+    client,
+    registry: DatastoreRegistry,
+    agent_name: str,
+    agent_description: str,
+    datastore_name: str,
+    document_paths: Sequence[str],
+    max_workers: int = 8,
+    verify: bool = True,
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    Return the agent for a PDF set, creating the datastore and agent only for new sets.
+
+    Args:
+        client: ContextualAI client.
+        registry: Registry to look up and record the PDF set in.
+        agent_name: Name for a new agent.
+        agent_description: Description for a new agent.
+        datastore_name: Name for a new datastore.
+        document_paths: PDFs to ingest.
+        max_workers: Concurrent uploads for a new datastore.
+        verify: Check that a registered agent still exists before reusing it.
+
+    Returns:
+        The registry entry and whether it was reused.
+    """
+    missing = [path for path in document_paths if not os.path.exists(path)]
+    if missing:
+        raise FileNotFoundError(f"Document not found: {missing[0]}")
+    paths = list(dict.fromkeys(os.path.abspath(path) for path in document_paths))
+
+    set_hash = pdf_set_hash(paths)
+    entry = registry.get(set_hash)
+    if entry is not None:
+        if not verify or agent_exists(client, entry["agent_id"]):
+            return entry, True
+        registry.remove(set_hash)
+
+    datastore_id = client.datastores.create(name=datastore_name).id
+    try:
+        document_ids = upload_documents(client, datastore_id, paths, max_workers=max_workers)
+        agent = client.agents.create(name=agent_name, description=agent_description, datastore_ids=[datastore_id])
+    except Exception:
+        # Nothing was registered for this datastore, so a retry would otherwise leave it orphaned
+        try:
+            client.datastores.delete(datastore_id)
+        except Exception as e:
+            logger.warning(f"Could not delete datastore {datastore_id} after a failed ingestion: {e}")
+        raise
+
+    entry = {
+        "agent_id": agent.id,
+        "datastore_id": datastore_id,
+        "agent_name": agent_name,
+        "document_ids": document_ids,
+        "documents": [os.path.basename(path) for path in paths],
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    registry.put(set_hash, entry)
+    return entry, False
+
+
+def download_files(
+    downloads: Sequence[Tuple[str, str]],
+    max_workers: int = 4,
+    timeout: float = 60,
+) -> List[Optional[str]]:
+    """
+    Download files concurrently, skipping ones already on disk.
+
+    Each file is written to a temporary name and renamed when complete, so an interrupted
+    download is never mistaken for a finished one on the next run.
+
+    Args:
+        downloads: (url, save_path) pairs.
+        max_workers: Downloads in flight at once.
+        timeout: Per-request timeout in seconds.
+
+    Returns:
+        For each pair, None on success or the error message.
+    """
+    def download(item: Tuple[str, str]) -> Optional[str]:
+        url, save_path = item
+        if os.path.exists(save_path) and os.path.getsize(save_path) > 0:
+            return None
+        tmp_path = f"{save_path}.part"
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as response, open(tmp_path, "wb") as f:
+                while True:
+                    chunk = response.read(1 << 16)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+            os.replace(tmp_path, save_path)
+            return None
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return f"{url}: {e}"
+
+    if not downloads:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(downloads)))) as pool:
+        return list(pool.map(download, downloads))
@@ -1,24 +1,70 @@
 import os
 os.environ.clear()
 
+import argparse
 from dotenv import load_dotenv
 from crewai import Crew, Process
-from agents import arxiv_researcher, document_processor, knowledge_assistant
-from tasks import create_tasks
+from agents import arxiv_researcher, document_processor, knowledge_assistant, create_agent_tool, query_tool
+from tasks import create_tasks, create_setup_tasks
+from batch_questions import answer_questions, load_questions, wait_for_documents
 load_dotenv()
 
-def main():    
+def run_batch(search_query: str, questions_file: str, output: str, max_workers: int):
+    """Build the knowledge base once, then answer every question in the file concurrently"""
+    questions = load_questions(questions_file)
+    print(f"Loaded {len(questions)} questions from {questions_file}")
+
+    crew = Crew(
+        agents=[arxiv_researcher, document_processor],
+        tasks=create_setup_tasks(search_query),
+        process=Process.sequential,
+        verbose=True
+    )
+    crew.kickoff()
+
+    entry = create_agent_tool.last_entry
+    if entry is None:
+        raise SystemExit("The document processor did not create or reuse an agent; no questions were sent.")
+
+    print("Waiting for document ingestion to finish...")
+    ingested = wait_for_documents(create_agent_tool.contextual_client, entry["datastore_id"])
+    if not ingested:
+        print("WARNING: documents were still being ingested when the wait timed out; "
+              "answers may miss content from those papers.")
+    summary = answer_questions(query_tool, entry["agent_id"], questions, output, max_workers=max_workers)
+
+    print("\n" + "=" * 60)
+    print("BATCH RESULT")
+    print("=" * 60)
+    print(f"Agent ID: {entry['agent_id']}, datastore ID: {entry['datastore_id']}")
+    if not ingested:
+        print("Ingestion had not finished when the questions were sent.")
+    print(f"Answered {summary['questions'] - summary['errors']}/{summary['questions']} questions in "
+          f"{summary['wall_time_s']}s (p50 {summary['p50_latency_s']}s, p95 {summary['p95_latency_s']}s)")
+    print(f"Answers written to {output}")
+
+def main():
+    parser = argparse.ArgumentParser(description="ArXiv research pipeline with Contextual AI")
+    parser.add_argument("--topic", help="Research topic for ArXiv search (prompted if omitted)")
+    parser.add_argument("--questions_file", help="Text or JSONL file of questions to answer in batch mode")
+    parser.add_argument("--output", default="answers.jsonl", help="JSONL file for batch answers")
+    parser.add_argument("--max_workers", type=int, default=8, help="Concurrent queries in batch mode")
+    args = parser.parse_args()
+
     print("=" * 60)
     print("ArXiv Research Pipeline with Contextual AI")
     print("=" * 60)
-    search_query = input("Enter your research topic for ArXiv search: ").strip()
+    search_query = args.topic or input("Enter your research topic for ArXiv search: ").strip()
+    if args.questions_file:
+        run_batch(search_query, args.questions_file, args.output, args.max_workers)
+        return
     user_question = input("Enter your question about the papers: ").strip()
     print("=" * 60)
-    
+
     # Create tasks
     tasks = create_tasks(search_query, user_question)
-    
-    # Create crew 
+
+    # Create crew
     crew = Crew(
         agents=[arxiv_researcher, document_processor, knowledge_assistant],
         tasks=tasks,
@@ -33,4 +79,4 @@ def main():
     print(result)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
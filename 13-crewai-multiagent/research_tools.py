@@ -0,0 +1,79 @@
+import logging
+import re
+from pathlib import Path
+from typing import Any
+
+from crewai_tools.tools.arxiv_paper_tool.arxiv_paper_tool import ArxivPaperTool, ArxivToolInput
+from crewai_tools import ContextualAICreateAgentTool
+
+from datastore_registry import DEFAULT_REGISTRY_PATH, DatastoreRegistry, download_files, get_or_create_agent
+
+logger = logging.getLogger(__name__)
+
+
+class ParallelArxivPaperTool(ArxivPaperTool):
+    """ArxivPaperTool that downloads PDFs concurrently and keeps the ones already in save_dir."""
+
+    max_download_workers: int = 4
+
+    def _run(self, search_query: str, max_results: int = 5) -> str:
+        try:
+            args = ArxivToolInput(search_query=search_query, max_results=max_results)
+            papers = self.fetch_arxiv_data(args.search_query, args.max_results)
+
+            if self.download_pdfs:
+                save_dir = self._validate_save_path(self.save_dir)
+                downloads = []
+                for paper in papers:
+                    if not paper["pdf_url"]:
+                        continue
+                    filename_base = paper["arxiv_id"]
+                    if self.use_title_as_filename:
+                        filename_base = re.sub(r'[\\/*?:"<>|]', "_", paper["title"]).strip() or filename_base
+                    downloads.append((paper["pdf_url"], str(Path(save_dir) / f"{filename_base[:500]}.pdf")))
+                for error in download_files(downloads, self.max_download_workers):
+                    if error:
+                        logger.error(f"Failed to download {error}")
+
+            results = [self._format_paper_result(p) for p in papers]
+            return "\n\n" + "-" * 80 + "\n\n".join(results)
+
+        except Exception as e:
+            logger.error(f"ArxivTool Error: {e!s}")
+            return f"Failed to fetch or download Arxiv papers: {e!s}"
+
+
+class CachedContextualAICreateAgentTool(ContextualAICreateAgentTool):
+    """ContextualAICreateAgentTool that reuses the agent of a PDF set it has ingested before."""
+
+    registry_path: str = DEFAULT_REGISTRY_PATH
+    max_upload_workers: int = 8
+    registry: Any = None
+    # Registry entry of the most recent successful run, for callers that need the IDs without parsing the reply
+    last_entry: Any = None
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.registry = DatastoreRegistry(self.registry_path)
+
+    def _run(
+        self,
+        agent_name: str,
+        agent_description: str,
+        datastore_name: str,
+        document_paths: list[str],
+    ) -> str:
+        try:
+            entry, reused = get_or_create_agent(
+                self.contextual_client, self.registry, agent_name, agent_description, datastore_name,
+                document_paths, max_workers=self.max_upload_workers,
+            )
+            self.last_entry = entry
+            if reused:
+                return (f"Reusing existing agent '{entry['agent_name']}' with ID: {entry['agent_id']} and datastore ID: "
+                        f"{entry['datastore_id']}. These {len(entry['documents'])} documents were already ingested.")
+            return (f"Successfully created agent '{agent_name}' with ID: {entry['agent_id']} and datastore ID: "
+                    f"{entry['datastore_id']}. Uploaded {len(entry['document_ids'])} documents.")
+
+        except Exception as e:
+            return f"Failed to create agent with documents: {e!s}"
@@ -1,8 +1,8 @@
 from crewai import Task
 from agents import arxiv_researcher, document_processor, knowledge_assistant
 
-def create_tasks(search_query: str, user_question: str):
-    """Create tasks with user-provided search query and question"""
+def create_setup_tasks(search_query: str):
+    """Create the search and ingestion tasks that build the knowledge base for a search query"""
     
     arxiv_search_task = Task(
         description=f"""
@@ -32,6 +32,13 @@ def create_tasks(search_query: str, user_question: str):
         depends_on=[arxiv_search_task]
     )
 
+    return [arxiv_search_task, document_processing_task]
+
+def create_tasks(search_query: str, user_question: str):
+    """Create tasks with user-provided search query and question"""
+    
+    arxiv_search_task, document_processing_task = create_setup_tasks(search_query)
+
     knowledge_query_task = Task(
         description=f"""
         Answer this question using the processed research papers: "{user_question}"
@@ -0,0 +1,117 @@
+"""
+Benchmark for metrics_store against the notebook's per-row feature engineering.
+
+First checks on data/synthetic_data.csv that the stored features and daily counts equal
+the notebook's (.apply(lambda x: len(x.split())), str.contains, dt accessors). Then
+replicates the CSV to a larger message history and compares:
+- the notebook path: build the DataFrame from all messages and engineer features per row
+- the store: ingest the history once, load the dashboard columns, and append one new day
+
+Example Usage:
+    python bench_metrics_store.py --rows 1000000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from metrics_store import MetricsStore
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "synthetic_data.csv")
+
+
+def notebook_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Feature engineering as in monitoring_intro.ipynb."""
+    df = df.copy()
+    df['created_at'] = pd.to_datetime(df['created_at'], format='%Y-%m-%d %H:%M:%S.%f')
+    df['question_word_count'] = df['question'].astype(str).apply(lambda x: len(x.split()))
+    df['answer_word_count'] = df['answer'].astype(str).apply(lambda x: len(x.split()))
+    df['no_relevant_docs_flag'] = df['answer'].str.contains("I don't have relevant documentation", case=False, na=False)
+    df['date'] = df['created_at'].dt.date
+    df['hour'] = df['created_at'].dt.hour
+    df['day_of_week'] = df['created_at'].dt.day_name()
+    df['feedback_category'] = df['feedback'].fillna('no_feedback')
+    df['has_feedback'] = df['feedback_category'] != 'no_feedback'
+    return df
+
+
+def check_fixture(root: str):
+    raw = pd.read_csv(FIXTURE)
+    store = MetricsStore(root)
+    # Two overlapping batches, as consecutive syncs would store them
+    store.ingest_dataframe(raw.iloc[:300])
+    store.ingest_dataframe(raw.iloc[200:])
+    stored = store.load()
+    expected = notebook_features(raw).sort_values("created_at", kind="stable").reset_index(drop=True)
+    assert len(stored) == len(expected), (len(stored), len(expected))
+    for column in ["id", "created_at", "question_word_count", "answer_word_count", "no_relevant_docs_flag", "date",
+                   "hour", "day_of_week", "feedback_category", "has_feedback"]:
+        assert (stored[column].to_numpy(object) == expected[column].to_numpy(object)).all(), column
+    assert stored["is_flagged"].sum() == (raw['issues'] == '{}').sum()
+    daily = store.daily()
+    assert (daily["messages"].to_numpy() == expected.groupby("date").size().to_numpy()).all()
+    print(f"Fixture check passed: {len(stored)} messages, {len(daily)} days")
+
+
+def replicate(raw: pd.DataFrame, rows: int, days: int, seed: int = 0) -> pd.DataFrame:
+    """Resample the fixture to rows messages spread evenly over days, with fresh ids."""
+    rng = np.random.default_rng(seed)
+    df = raw.iloc[rng.integers(len(raw), size=rows)].reset_index(drop=True)
+    start = pd.to_datetime(raw["created_at"], format='%Y-%m-%d %H:%M:%S.%f').min().normalize()
+    offsets = np.sort(rng.integers(0, days * 24 * 3600 * 10**6, size=rows))
+    df["created_at"] = pd.Series(start + pd.to_timedelta(offsets, unit="us")).dt.strftime('%Y-%m-%d %H:%M:%S.%f')
+    df["id"] = [f"msg-{i}" for i in range(rows)]
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the metrics store against notebook feature engineering")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Messages in the replicated history")
+    parser.add_argument("--days", type=int, default=90, help="Days the history spans")
+    parser.add_argument("--batches", type=int, default=10, help="Syncs the history is ingested in")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="metrics_store_")
+    try:
+        check_fixture(os.path.join(root, "fixture"))
+
+        history = replicate(pd.read_csv(FIXTURE), args.rows, args.days)
+        history_days = pd.to_datetime(history["created_at"]).dt.date
+        new_day = history_days == history_days.max()
+        print(f"History: {len(history):,} messages over {history_days.nunique()} days")
+
+        start = time.perf_counter()
+        notebook_features(history)
+        notebook_s = time.perf_counter() - start
+
+        store = MetricsStore(os.path.join(root, "store"))
+        old = history[~new_day]
+        start = time.perf_counter()
+        for batch in np.array_split(np.arange(len(old)), args.batches):
+            store.ingest_dataframe(old.iloc[batch])
+        ingest_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        appended = store.ingest_dataframe(history[new_day])
+        append_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        df = store.load()
+        daily = store.daily()
+        load_s = time.perf_counter() - start
+        assert len(df) == len(history) and daily["messages"].sum() == len(history)
+
+        print(f"Notebook feature engineering on the full history: {notebook_s:.2f}s")
+        print(f"Store: initial ingestion {ingest_s:.2f}s ({args.batches} batches), "
+              f"appending a new day of {appended:,} messages {append_s:.2f}s")
+        print(f"Store: dashboard load (all messages with features + daily aggregates) {load_s:.2f}s")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
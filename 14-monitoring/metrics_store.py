@@ -0,0 +1,365 @@
+"""
+Incremental, columnar store of agent metrics for the monitoring dashboard.
+
+Messages from the Metrics API (client.agents.query.metrics) are appended to a Parquet
+dataset partitioned by day (`<root>/date=YYYY-MM-DD/part-*.parquet`). A watermark of the
+newest stored created_at is kept in `<root>/_state.json`, so each sync only fetches
+messages newer than it. The API returns at most two days per request, so a sync walks
+two-day windows from the watermark to now and pages through each with limit/offset.
+The watermark only moves once a whole window has been stored: pages can arrive in any
+order, so a sync interrupted mid-window resumes from the start of that window.
+
+Features are computed once, vectorized, when rows are stored: word counts with Arrow's
+whitespace split, the no-relevant-docs flag with Arrow substring matching, and the
+hour / weekday / feedback columns. Daily aggregates live in `<root>/_daily.parquet` and
+are recomputed only for the days a sync touched. The dashboard reads the stored columns
+instead of re-fetching history and re-running per-row string functions.
+
+Example Usage:
+    store = MetricsStore("metrics_store")
+    store.sync(client, agent_id, start="2025-07-30")   # only new messages after the first run
+    df = store.load()
+    daily = store.daily()
+
+    store.ingest_dataframe(pd.read_csv("data/synthetic_data.csv"))
+"""
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_COLUMNS = ["id", "user_message_id", "assistant_message_id", "question", "answer", "created_at", "email",
+                   "feedback", "issues", "detail", "correct_source"]
+FEATURE_COLUMNS = ["question_word_count", "answer_word_count", "no_relevant_docs_flag", "is_flagged", "hour",
+                   "day_of_week", "feedback_category", "has_feedback"]
+FEEDBACK_CATEGORIES = ["thumbs_up", "thumbs_down", "flagged", "no_feedback"]
+NO_RELEVANT_DOCS = "I don't have relevant documentation"
+METRICS_WINDOW = timedelta(days=2)
+DAY_NAMES = np.array(["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"])
+
+SCHEMA = pa.schema(
+    [(name, pa.string()) for name in MESSAGE_COLUMNS if name != "created_at"]
+    + [
+        ("created_at", pa.timestamp("us")),
+        ("question_word_count", pa.int32()),
+        ("answer_word_count", pa.int32()),
+        ("no_relevant_docs_flag", pa.bool_()),
+        ("is_flagged", pa.bool_()),
+        ("hour", pa.int8()),
+        ("day_of_week", pa.string()),
+        ("feedback_category", pa.string()),
+        ("has_feedback", pa.bool_()),
+    ]
+)
+PARTITIONING = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+
+
+def _as_text(value: Any) -> Optional[str]:
+    """Metrics API fields as strings; dicts and lists (e.g. issues) become JSON."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True)
+    return str(value)
+
+
+def messages_to_table(messages: pd.DataFrame) -> pa.Table:
+    """
+    Normalize raw messages and add the dashboard features, vectorized.
+
+    Args:
+        messages: One row per message with (a subset of) MESSAGE_COLUMNS; created_at may be
+            strings or datetimes. Missing columns are stored as nulls and other columns dropped.
+
+    Returns:
+        Arrow table with SCHEMA
+    """
+    columns = {}
+    for name in MESSAGE_COLUMNS:
+        if name == "created_at":
+            continue
+        if name not in messages:
+            columns[name] = pa.nulls(len(messages), type=pa.string())
+            continue
+        try:
+            columns[name] = pa.array(messages[name], type=pa.string(), from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Non-string values, e.g. issues as a dict or correct_source as a number
+            columns[name] = pa.array(messages[name].map(_as_text), type=pa.string())
+    # Naive timestamps (as in the CSV export) are taken to be UTC
+    created_at = pd.to_datetime(messages["created_at"], format="ISO8601", utc=True).dt.tz_localize(None)
+    columns["created_at"] = pa.array(created_at.astype("datetime64[us]"), type=pa.timestamp("us"))
+
+    # Same counts as len(text.split()); missing questions or answers count as zero words
+    for name in ("question", "answer"):
+        text = pc.utf8_trim_whitespace(pc.fill_null(columns[name], ""))
+        words = pc.list_value_length(pc.utf8_split_whitespace(text))
+        columns[f"{name}_word_count"] = pc.cast(pc.if_else(pc.equal(text, ""), 0, words), pa.int32())
+    columns["no_relevant_docs_flag"] = pc.fill_null(
+        pc.match_substring(columns["answer"], NO_RELEVANT_DOCS, ignore_case=True), False)
+    columns["is_flagged"] = pc.fill_null(pc.equal(columns["issues"], "{}"), False)
+
+    timestamps = created_at.to_numpy()
+    columns["hour"] = pa.array(created_at.dt.hour.to_numpy(np.int8), type=pa.int8())
+    # 1970-01-01 was a Thursday (weekday 3)
+    weekday = (timestamps.astype("datetime64[D]").astype(np.int64) + 3) % 7
+    columns["day_of_week"] = pa.array(DAY_NAMES[weekday], type=pa.string())
+    columns["feedback_category"] = pc.fill_null(columns["feedback"], "no_feedback")
+    columns["has_feedback"] = pc.is_valid(columns["feedback"])
+    return pa.table(columns, schema=SCHEMA)
+
+
+def daily_aggregates(table: pa.Table) -> pd.DataFrame:
+    """
+    Per-day message counts, feedback counts, flags and mean lengths.
+
+    Args:
+        table: Rows with (at least) the id, created_at, feedback_category, flag and word count columns
+
+    Returns:
+        One row per date (sorted), with messages, one column per feedback category,
+        no_relevant_docs, flagged, and mean question / answer word counts
+    """
+    days = pc.strftime(table["created_at"], format="%Y-%m-%d")
+    table = table.append_column("date", days)
+    grouped = table.group_by("date").aggregate([
+        ("id", "count"),
+        ("no_relevant_docs_flag", "sum"),
+        ("is_flagged", "sum"),
+        ("question_word_count", "mean"),
+        ("answer_word_count", "mean"),
+    ]).to_pandas().rename(columns={
+        "id_count": "messages",
+        "no_relevant_docs_flag_sum": "no_relevant_docs",
+        "is_flagged_sum": "flagged_issues",
+        "question_word_count_mean": "mean_question_words",
+        "answer_word_count_mean": "mean_answer_words",
+    })
+    feedback = table.group_by(["date", "feedback_category"]).aggregate([("id", "count")]).to_pandas()
+    feedback = feedback.pivot(index="date", columns="feedback_category", values="id_count")
+    feedback = feedback.reindex(columns=FEEDBACK_CATEGORIES, fill_value=0).fillna(0).astype(np.int64)
+    daily = grouped.set_index("date").join(feedback).sort_index()
+    daily.index = pd.to_datetime(daily.index)
+    return daily[["messages", *FEEDBACK_CATEGORIES, "no_relevant_docs", "flagged_issues", "mean_question_words",
+                  "mean_answer_words"]]
+
+
+class MetricsStore:
+    """Day-partitioned Parquet store of metrics messages with a fetch watermark."""
+
+    def __init__(self, root: str = "metrics_store"):
+        """
+        Open (or create) a store.
+
+        Args:
+            root: Directory of the Parquet dataset
+        """
+        self.root = root
+        self.state_path = os.path.join(root, "_state.json")
+        self.daily_path = os.path.join(root, "_daily.parquet")
+        os.makedirs(root, exist_ok=True)
+        self.state: Dict[str, Any] = {}
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                self.state = json.load(f)
+
+    @property
+    def watermark(self) -> Optional[pd.Timestamp]:
+        """created_at (UTC) of the newest stored message."""
+        return pd.Timestamp(self.state["watermark"]) if self.state.get("watermark") else None
+
+    def _save_state(self):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def _dataset(self) -> Optional[ds.Dataset]:
+        paths = [os.path.join(dirpath, name) for dirpath, _, names in os.walk(self.root)
+                 for name in names if name.endswith(".parquet") and not name.startswith("_")]
+        if not paths:
+            return None
+        return ds.dataset(paths, schema=SCHEMA.append(pa.field("date", pa.string())), format="parquet",
+                          partitioning=PARTITIONING, partition_base_dir=self.root)
+
+    def append(self, table: pa.Table, update_watermark: bool = True) -> int:
+        """
+        Append rows, skipping ids already stored, and update the watermark and daily aggregates.
+
+        Args:
+            table: Rows with SCHEMA, e.g. from messages_to_table
+            update_watermark: Move the watermark to the newest row; sync() passes False for
+                pages and advances it itself once their window is complete
+
+        Returns:
+            Number of rows written
+        """
+        if table.num_rows == 0:
+            return 0
+        # Keep the first row per id; fetch windows overlap at their boundaries
+        _, first_index = np.unique(table["id"].to_numpy(zero_copy_only=False), return_index=True)
+        table = table.take(np.sort(first_index))
+        # Group rows by day with one sort, so each partition is a slice
+        day_numbers = pc.cast(pc.cast(table["created_at"], pa.date32()), pa.int32()).to_numpy()
+        order = np.argsort(day_numbers, kind="stable")
+        table = table.take(order)
+        day_numbers = day_numbers[order]
+        touched = [str(day) for day in np.unique(day_numbers).astype("datetime64[D]")]
+
+        # Only the touched partitions can hold duplicates of these rows
+        dataset = self._dataset()
+        if dataset is not None:
+            stored = dataset.to_table(columns=["id"], filter=ds.field("date").isin(touched))["id"]
+            if len(stored):
+                keep = pc.invert(pc.is_in(table["id"], value_set=stored))
+                table, day_numbers = table.filter(keep), day_numbers[keep.to_numpy(zero_copy_only=False)]
+        if table.num_rows:
+            days, starts, counts = np.unique(day_numbers, return_index=True, return_counts=True)
+            for day, start, count in zip(days.astype("datetime64[D]"), starts, counts):
+                directory = os.path.join(self.root, f"date={day}")
+                os.makedirs(directory, exist_ok=True)
+                pq.write_table(table.slice(start, count), os.path.join(directory, f"part-{uuid.uuid4().hex}.parquet"))
+            if update_watermark:
+                self._advance_watermark(table)
+            self._update_daily(touched)
+        logger.info(f"Stored {table.num_rows} new messages across {len(touched)} days")
+        return table.num_rows
+
+    def _advance_watermark(self, table: pa.Table):
+        """Move the watermark to the newest created_at in table, if that is newer, and save it."""
+        if table.num_rows == 0:
+            return
+        newest = pd.Timestamp(pc.max(table["created_at"]).as_py(), tz="UTC")
+        if self.watermark is None or newest > self.watermark:
+            self.state["watermark"] = newest.isoformat()
+            self._save_state()
+
+    def _update_daily(self, days: List[str]):
+        columns = ["id", "created_at", "feedback_category", "no_relevant_docs_flag", "is_flagged", "question_word_count",
+                   "answer_word_count"]
+        touched = self._dataset().to_table(columns=columns, filter=ds.field("date").isin(days))
+        updated = daily_aggregates(touched)
+        if os.path.exists(self.daily_path):
+            previous = pd.read_parquet(self.daily_path)
+            updated = pd.concat([previous.drop(index=updated.index, errors="ignore"), updated]).sort_index()
+        updated.to_parquet(self.daily_path)
+
+    def ingest_dataframe(self, messages: pd.DataFrame) -> int:
+        """Store a DataFrame of messages (e.g. a metrics export or data/synthetic_data.csv)."""
+        return self.append(messages_to_table(messages))
+
+    def fetch_new(self, client: Any, agent_id: str, start: Optional[str] = None, end: Optional[datetime] = None,
+                  page_size: int = 1000) -> Iterator[Tuple[List[Dict[str, Any]], bool]]:
+        """
+        Fetch messages created after the watermark (or start), in pages.
+
+        Args:
+            client: ContextualAI client
+            agent_id: Agent to fetch metrics for
+            start: Where to begin when the store is empty (default: two days before end)
+            end: Fetch up to this time (default: now)
+            page_size: Messages per request
+
+        Yields:
+            (messages, window_done) per API page: the page's message dicts, and whether it is
+            the last page of its two-day window. An empty window yields ([], True).
+        """
+        end = pd.Timestamp(end or datetime.now(timezone.utc))
+        end = end.tz_localize("UTC") if end.tzinfo is None else end.tz_convert("UTC")
+        if self.watermark is not None:
+            window_start = self.watermark
+        elif start is not None:
+            window_start = pd.Timestamp(start, tz="UTC") if pd.Timestamp(start).tzinfo is None \
+                else pd.Timestamp(start).tz_convert("UTC")
+        else:
+            window_start = end - METRICS_WINDOW
+        while window_start < end:
+            window_end = min(window_start + METRICS_WINDOW, end)
+            offset = 0
+            while True:
+                response = client.agents.query.metrics(agent_id=agent_id, created_after=window_start.to_pydatetime(),
+                                                       created_before=window_end.to_pydatetime(), limit=page_size,
+                                                       offset=offset)
+                done = not response.next_offset or not response.messages
+                yield response.messages or [], done
+                if done:
+                    break
+                offset = response.next_offset
+            window_start = window_end
+
+    def sync(self, client: Any, agent_id: str, start: Optional[str] = None, end: Optional[datetime] = None,
+             page_size: int = 1000) -> int:
+        """
+        Fetch and store the messages newer than the watermark.
+
+        Args:
+            client: ContextualAI client
+            agent_id: Agent to fetch metrics for; a store holds one agent
+            start: Where to begin when the store is empty
+            end: Fetch up to this time (default: now)
+            page_size: Messages per request
+
+        Returns:
+            Number of new messages stored
+        """
+        if self.state.setdefault("agent_id", agent_id) != agent_id:
+            raise ValueError(f"Store {self.root} holds agent {self.state['agent_id']}, not {agent_id}")
+        stored = 0
+        window = []
+        for page, window_done in self.fetch_new(client, agent_id, start=start, end=end, page_size=page_size):
+            if page:
+                table = messages_to_table(pd.DataFrame(page))
+                stored += self.append(table, update_watermark=False)
+                window.append(table.select(["created_at"]))
+            if window_done:
+                # Every page of the window is stored, so nothing older than its newest message is missing
+                if window:
+                    self._advance_watermark(pa.concat_tables(window))
+                window = []
+        self._save_state()
+        return stored
+
+    def load(self, columns: Optional[List[str]] = None, start: Optional[str] = None,
+             end: Optional[str] = None) -> pd.DataFrame:
+        """
+        Read stored messages with their features.
+
+        Args:
+            columns: Columns to read (default: all)
+            start: First day to include, "YYYY-MM-DD"
+            end: Last day to include, "YYYY-MM-DD"
+
+        Returns:
+            DataFrame sorted by created_at, with a date column (datetime.date) added
+        """
+        dataset = self._dataset()
+        read_columns = list(dict.fromkeys((columns or SCHEMA.names) + ["created_at"]))
+        if dataset is None:
+            return pd.DataFrame(columns=read_columns + ["date"])
+        condition = None
+        if start is not None:
+            condition = ds.field("date") >= start
+        if end is not None:
+            condition = (ds.field("date") <= end) if condition is None else condition & (ds.field("date") <= end)
+        table = dataset.to_table(columns=read_columns, filter=condition)
+        table = table.sort_by("created_at")
+        df = table.to_pandas()
+        df["date"] = df["created_at"].dt.date
+        return df.reset_index(drop=True)
+
+    def daily(self) -> pd.DataFrame:
+        """Stored daily aggregates, indexed by date."""
+        if not os.path.exists(self.daily_path):
+            return pd.DataFrame()
+        return pd.read_parquet(self.daily_path)
@@ -0,0 +1,131 @@
+"""
+Tests for metrics_store with data/synthetic_data.csv as the fixture.
+
+The sync tests serve the fixture from a fake Metrics API that filters by created_at and
+pages newest-first, like a server that does not sort oldest-first.
+
+Example Usage:
+    python -m pytest test_metrics_store.py -q
+"""
+import os
+import sys
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import metrics_store  # noqa: E402
+from bench_metrics_store import FIXTURE, notebook_features  # noqa: E402
+from metrics_store import MetricsStore  # noqa: E402
+
+FEATURE_COLUMNS = ["id", "created_at", "question_word_count", "answer_word_count", "no_relevant_docs_flag", "date",
+                   "hour", "day_of_week", "feedback_category", "has_feedback"]
+
+
+@pytest.fixture(scope="module")
+def raw():
+    return pd.read_csv(FIXTURE)
+
+
+class FakeMetricsAPI:
+    """client.agents.query.metrics over a DataFrame of messages, newest first."""
+
+    def __init__(self, messages: pd.DataFrame, fail_on_call=None):
+        self.messages = messages
+        self.created_at = pd.to_datetime(messages["created_at"]).dt.tz_localize("UTC")
+        self.fail_on_call = fail_on_call
+        self.calls = 0
+        self.agents = SimpleNamespace(query=SimpleNamespace(metrics=self.metrics))
+
+    def metrics(self, agent_id, created_after, created_before, limit, offset):
+        self.calls += 1
+        if self.calls == self.fail_on_call:
+            raise ConnectionError("connection reset")
+        in_window = (self.created_at >= created_after) & (self.created_at < created_before)
+        window = self.messages[in_window.to_numpy()].iloc[::-1]
+        page = window.iloc[offset:offset + limit]
+        next_offset = offset + limit if offset + limit < len(window) else None
+        return SimpleNamespace(messages=page.to_dict("records"), next_offset=next_offset)
+
+
+def test_stored_features_match_the_notebook(tmp_path, raw):
+    store = MetricsStore(str(tmp_path))
+    assert store.ingest_dataframe(raw) == len(raw)
+
+    stored = store.load()
+    expected = notebook_features(raw).sort_values("created_at", kind="stable").reset_index(drop=True)
+    for column in FEATURE_COLUMNS:
+        assert (stored[column].to_numpy(object) == expected[column].to_numpy(object)).all(), column
+    assert stored["is_flagged"].sum() == (raw["issues"] == "{}").sum()
+
+    daily = store.daily()
+    counts = expected.groupby("date").size()
+    assert daily["messages"].tolist() == counts.tolist()
+    assert (daily[metrics_store.FEEDBACK_CATEGORIES].sum(axis=1) == daily["messages"]).all()
+
+
+def test_overlapping_ingests_store_each_message_once(tmp_path, raw):
+    store = MetricsStore(str(tmp_path))
+    first = store.ingest_dataframe(raw.iloc[:300])
+    second = store.ingest_dataframe(raw.iloc[200:])
+    again = store.ingest_dataframe(raw)
+
+    assert (first, second, again) == (300, len(raw) - 300, 0)
+    stored = store.load(columns=["id"])
+    assert len(stored) == stored["id"].nunique() == len(raw)
+    assert store.daily()["messages"].sum() == len(raw)
+
+
+def test_daily_aggregates_are_recomputed_only_for_touched_days(tmp_path, raw, monkeypatch):
+    dates = pd.to_datetime(raw["created_at"]).dt.date
+    last_day = dates.max()
+    store = MetricsStore(str(tmp_path))
+    store.ingest_dataframe(raw[(dates != last_day).to_numpy()])
+    before = store.daily()
+
+    recomputed = []
+    aggregate = metrics_store.daily_aggregates
+    monkeypatch.setattr(metrics_store, "daily_aggregates",
+                        lambda table: recomputed.append(aggregate(table)) or recomputed[-1])
+    store.ingest_dataframe(raw[(dates == last_day).to_numpy()])
+
+    assert [frame.index.date.tolist() for frame in recomputed] == [[last_day]]
+    after = store.daily()
+    pd.testing.assert_frame_equal(after.loc[before.index], before)
+    assert after.loc[pd.Timestamp(last_day), "messages"] == (dates == last_day).sum()
+
+
+def test_sync_advances_the_watermark_per_window(tmp_path, raw):
+    store = MetricsStore(str(tmp_path))
+    api = FakeMetricsAPI(raw)
+    created_at = pd.to_datetime(raw["created_at"])
+
+    stored = store.sync(api, "agent", start="2025-08-05", end=pd.Timestamp("2025-08-09", tz="UTC"), page_size=25)
+    first_window = created_at < pd.Timestamp("2025-08-09")
+    assert stored == first_window.sum()
+    assert store.watermark == pd.Timestamp(created_at[first_window].max(), tz="UTC")
+
+    # A second sync starts at the watermark and fetches only newer messages
+    stored = store.sync(api, "agent", end=pd.Timestamp("2025-08-16", tz="UTC"), page_size=25)
+    assert stored == (~first_window).sum()
+    assert store.watermark == pd.Timestamp(created_at.max(), tz="UTC")
+    assert len(store.load(columns=["id"])) == len(raw)
+    assert MetricsStore(str(tmp_path)).watermark == store.watermark
+
+
+def test_interrupted_sync_does_not_skip_older_messages(tmp_path, raw):
+    store = MetricsStore(str(tmp_path))
+    end = pd.Timestamp("2025-08-07", tz="UTC")
+    window = (pd.to_datetime(raw["created_at"]) < end.tz_localize(None)).sum()
+
+    # Pages come newest first; the connection drops after the first page of the window
+    with pytest.raises(ConnectionError):
+        store.sync(FakeMetricsAPI(raw, fail_on_call=2), "agent", start="2025-08-05", end=end, page_size=20)
+    assert len(store.load(columns=["id"])) == 20
+    assert store.watermark is None
+
+    # Resuming re-walks the window and picks up the older pages that were never fetched
+    stored = MetricsStore(str(tmp_path)).sync(FakeMetricsAPI(raw), "agent", start="2025-08-05", end=end, page_size=20)
+    assert stored == window - 20
+    assert len(store.load(columns=["id"])) == window
@@ -0,0 +1,374 @@
+"""
+Incremental ingestion of parsed blocks into a Chroma collection.
+
+- Each chunk's id is a SHA-256 hash of its text and metadata. Ids already in the
+  collection are skipped, so re-ingesting a corpus only touches new or changed blocks.
+- Embeddings are cached on disk (SQLite) by model and text hash, so a block that was
+  embedded before costs no embedding call, even after the collection is rebuilt.
+- Missing embeddings are computed in batches bounded by count and characters, with
+  several batches in flight, and the collection is written with bulk upserts.
+- HashEmbeddingFunction is a deterministic local embedding function that stands in
+  for OpenAI when running offline.
+
+Example Usage:
+    records = []
+    for job in parse_jobs:
+        records.extend(blocks_to_records(job["results"], job["document"]))
+    ingestor = ChromaIngestor(collection, openai_ef, model_name="text-embedding-3-small")
+    stats = ingestor.ingest(records)
+
+    python chroma_ingest.py --num_documents 200   # offline run with HashEmbeddingFunction
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = "embedding_cache.sqlite"
+BLOCK_TYPES = ("text", "heading", "table")
+MIN_BLOCK_CHARS = 30
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def blocks_to_records(results: Any, document: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Turn a blocks-per-page parse result into chunk records for Chroma.
+
+    Text, heading and table blocks longer than MIN_BLOCK_CHARS become one record each.
+    The markdown of a block's parents is prepended so each chunk keeps its section context.
+
+    Args:
+        results: job_results response with blocks-per-page output
+        document: The parsed document's dict, with "title" and "type"
+
+    Returns:
+        Dicts with "text" and "metadata" (title, source, document_type, block_type, block_id,
+        and hierarchy_level / confidence_level when the parser provides them)
+    """
+    # Lookup table for parent content
+    hash_table = {block.id: block.markdown for page in results.pages for block in page.blocks}
+    records = []
+    for page in results.pages:
+        for block in page.blocks:
+            if block.type not in BLOCK_TYPES or len(block.markdown.strip()) <= MIN_BLOCK_CHARS:
+                continue
+            context_text = block.markdown
+            if getattr(block, "parent_ids", None):
+                parent_content = "\n".join(hash_table.get(parent_id, "") for parent_id in block.parent_ids)
+                if parent_content.strip():
+                    context_text = f"{parent_content}\n\n{block.markdown}"
+            metadata = {
+                "title": document["title"],
+                "source": f"Page {page.index + 1}",
+                "document_type": document["type"],
+                "block_type": block.type,
+                "block_id": block.id,  # Key into HierarchyIndex for context expansion
+            }
+            # Chroma metadata values cannot be None, so optional fields are only added when present
+            if getattr(block, "hierarchy_level", None) is not None:
+                metadata["hierarchy_level"] = block.hierarchy_level
+            if getattr(block, "confidence_level", None) is not None:
+                metadata["confidence_level"] = block.confidence_level
+            records.append({
+                "text": f"Document: {document['title']}\nType: {document['type']}\n\n{context_text}",
+                "metadata": metadata,
+            })
+    return records
+
+
+def record_id(record: Dict[str, Any]) -> str:
+    """Content hash of a record's text and metadata, used as its Chroma id."""
+    blob = json.dumps({"text": record["text"], "metadata": record["metadata"]}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class HashEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Deterministic local embeddings from hashed word unigrams and bigrams.
+
+    Each token is hashed to a dimension and a sign; the counts are log-scaled and the
+    vector is L2-normalized. Texts sharing words get similar vectors, which is enough
+    to exercise ingestion and querying without an embedding API.
+    """
+
+    def __init__(self, dimensions: int = 384):
+        """
+        Initialize the embedding function.
+
+        Args:
+            dimensions: Embedding size
+        """
+        self.dimensions = dimensions
+
+    def __call__(self, input: Documents) -> Embeddings:
+        embeddings = np.zeros((len(input), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(input):
+            words = TOKEN_PATTERN.findall(text.lower())
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            for feature in features:
+                digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+                embeddings[row, digest % self.dimensions] += 1.0 if digest >> 63 else -1.0
+        embeddings = np.sign(embeddings) * np.log1p(np.abs(embeddings))
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return list(embeddings / np.maximum(norms, 1e-12))
+
+    @staticmethod
+    def name() -> str:
+        return "hash"
+
+    def get_config(self) -> Dict[str, Any]:
+        return {"dimensions": self.dimensions}
+
+    @staticmethod
+    def build_from_config(config: Dict[str, Any]) -> "HashEmbeddingFunction":
+        return HashEmbeddingFunction(config.get("dimensions", 384))
+
+
+class EmbeddingCache:
+    """SQLite cache of embeddings (float32) keyed by model name and text hash."""
+
+    def __init__(self, path: str):
+        """
+        Open (or create) the cache.
+
+        Args:
+            path: Path of the SQLite database file
+        """
+        self.path = path
+        self.stats = {"hits": 0, "misses": 0, "writes": 0}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Embedding batches are written from worker threads
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )"""
+        )
+
+    def get_many(self, model: str, hashes: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Return the cached embeddings among hashes, keyed by hash."""
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        # Stay under SQLite's limit on query parameters
+        for start in range(0, len(unique), 500):
+            chunk = unique[start:start + 500]
+            rows = self._conn.execute(
+                f"SELECT text_hash, embedding FROM embeddings WHERE model = ? AND text_hash IN "
+                f"({','.join('?' * len(chunk))})", (model, *chunk)).fetchall()
+            found.update((h, np.frombuffer(blob, dtype=np.float32)) for h, blob in rows)
+        self.stats["hits"] += len(found)
+        self.stats["misses"] += len(unique) - len(found)
+        return found
+
+    def set_many(self, model: str, items: Dict[str, np.ndarray]):
+        """Store embeddings keyed by text hash."""
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, embedding) VALUES (?, ?, ?)",
+                [(model, h, np.asarray(vector, dtype=np.float32).tobytes()) for h, vector in items.items()])
+        self.stats["writes"] += len(items)
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class ChromaIngestor:
+    """Adds records to a Chroma collection, embedding and writing only what is new."""
+
+    def __init__(self, collection: Any, embedding_function: Callable[[List[str]], Any],
+                 model_name: Optional[str] = None, cache_path: Optional[str] = DEFAULT_CACHE_PATH,
+                 batch_size: int = 256, max_batch_chars: int = 400_000, concurrency: int = 4,
+                 upsert_batch_size: int = 1000):
+        """
+        Initialize the ingestor.
+
+        Args:
+            collection: Chroma collection to write to
+            embedding_function: Callable mapping a list of texts to embeddings, e.g. the
+                collection's OpenAIEmbeddingFunction
+            model_name: Cache namespace for the embeddings (default: the embedding function's class name)
+            cache_path: SQLite file embeddings are cached in; None disables the cache
+            batch_size: Maximum texts per embedding call
+            max_batch_chars: Maximum characters per embedding call, to stay under request token limits
+            concurrency: Embedding calls in flight
+            upsert_batch_size: Records per collection.upsert call
+        """
+        self.collection = collection
+        self.embedding_function = embedding_function
+        self.model_name = model_name or type(embedding_function).__name__
+        self.cache = EmbeddingCache(cache_path) if cache_path else None
+        self.batch_size = batch_size
+        self.max_batch_chars = max_batch_chars
+        self.concurrency = concurrency
+        self.upsert_batch_size = upsert_batch_size
+
+    def existing_ids(self, ids: Sequence[str]) -> set:
+        """Ids among ids that are already in the collection."""
+        found = set()
+        for start in range(0, len(ids), self.upsert_batch_size):
+            found.update(self.collection.get(ids=list(ids[start:start + self.upsert_batch_size]), include=[])["ids"])
+        return found
+
+    def _batches(self, texts: List[str]) -> List[List[int]]:
+        batches, current, chars = [], [], 0
+        for i, text in enumerate(texts):
+            if current and (len(current) >= self.batch_size or chars + len(text) > self.max_batch_chars):
+                batches.append(current)
+                current, chars = [], 0
+            current.append(i)
+            chars += len(text)
+        if current:
+            batches.append(current)
+        return batches
+
+    def embed(self, texts: List[str], stats: Optional[Dict[str, int]] = None) -> List[np.ndarray]:
+        """Embed texts, taking cached embeddings where available and batching the rest."""
+        stats = stats if stats is not None else {}
+        hashes = [text_hash(text) for text in texts]
+        vectors = self.cache.get_many(self.model_name, hashes) if self.cache is not None else {}
+        # Identical texts are embedded once
+        missing = list({h: text for h, text in zip(hashes, texts) if h not in vectors}.items())
+        stats["cached_embeddings"] = stats.get("cached_embeddings", 0) + len(set(hashes) & set(vectors))
+        stats["embedded"] = stats.get("embedded", 0) + len(missing)
+
+        def embed_batch(batch: List[int]):
+            embeddings = self.embedding_function([missing[i][1] for i in batch])
+            result = {missing[i][0]: np.asarray(vector, dtype=np.float32) for i, vector in zip(batch, embeddings)}
+            if self.cache is not None:
+                self.cache.set_many(self.model_name, result)
+            return result
+
+        batches = self._batches([text for _, text in missing])
+        stats["embedding_calls"] = stats.get("embedding_calls", 0) + len(batches)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for result in executor.map(embed_batch, batches):
+                vectors.update(result)
+        return [vectors[h] for h in hashes]
+
+    def ingest(self, records: List[Dict[str, Any]], prune: bool = False) -> Dict[str, int]:
+        """
+        Add records to the collection, skipping ones it already holds.
+
+        Args:
+            records: Dicts with "text" and "metadata", e.g. from blocks_to_records
+            prune: Delete chunks of the ingested titles that are no longer among the records
+                (blocks that changed or disappeared since the last ingestion)
+
+        Returns:
+            Counts of records, duplicates, existing (skipped), cached_embeddings, embedded,
+            embedding_calls, upserted and deleted chunks
+        """
+        stats = {"records": len(records), "duplicates": 0, "existing": 0, "cached_embeddings": 0, "embedded": 0,
+                 "embedding_calls": 0, "upserted": 0, "deleted": 0}
+        by_id = {}
+        for record in records:
+            by_id.setdefault(record_id(record), record)
+        stats["duplicates"] = len(records) - len(by_id)
+        existing = self.existing_ids(list(by_id))
+        stats["existing"] = len(existing)
+        new_ids = [chunk_id for chunk_id in by_id if chunk_id not in existing]
+
+        if new_ids:
+            texts = [by_id[chunk_id]["text"] for chunk_id in new_ids]
+            embeddings = self.embed(texts, stats)
+            for start in range(0, len(new_ids), self.upsert_batch_size):
+                end = start + self.upsert_batch_size
+                self.collection.upsert(
+                    ids=new_ids[start:end],
+                    embeddings=np.stack(embeddings[start:end]),
+                    documents=texts[start:end],
+                    metadatas=[by_id[chunk_id]["metadata"] for chunk_id in new_ids[start:end]],
+                )
+            stats["upserted"] = len(new_ids)
+
+        if prune:
+            titles = sorted({record["metadata"]["title"] for record in by_id.values()})
+            stored = self.collection.get(where={"title": {"$in": titles}}, include=[])["ids"]
+            stale = [chunk_id for chunk_id in stored if chunk_id not in by_id]
+            for start in range(0, len(stale), self.upsert_batch_size):
+                self.collection.delete(ids=stale[start:start + self.upsert_batch_size])
+            stats["deleted"] = len(stale)
+        logger.info(f"Ingestion stats: {stats}")
+        return stats
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
+
+
+def synthetic_records(num_documents: int, blocks_per_document: int = 50, seed: int = 0) -> List[Dict[str, Any]]:
+    """Generated records shaped like blocks_to_records output."""
+    rng = np.random.default_rng(seed)
+    words = ("the model attention layer encoder decoder sequence token training data results table benchmark "
+             "performance accuracy dataset evaluation parameters transformer embedding baseline").split()
+    records = []
+    for d in range(num_documents):
+        for b in range(blocks_per_document):
+            text = " ".join(rng.choice(words, size=rng.integers(20, 120)))
+            records.append({
+                "text": f"Document: Document {d}\nType: research_paper\n\n{text}",
+                "metadata": {"title": f"Document {d}", "source": f"Page {b // 10 + 1}",
+                             "document_type": "research_paper", "block_type": "text"},
+            })
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline incremental Chroma ingestion run")
+    parser.add_argument("--num_documents", type=int, default=200)
+    parser.add_argument("--blocks_per_document", type=int, default=50)
+    parser.add_argument("--changed_fraction", type=float, default=0.05,
+                        help="Fraction of blocks edited before the second ingestion")
+    parser.add_argument("--cache_path", type=str, default="embedding_cache_fake.sqlite")
+    args = parser.parse_args()
+
+    import chromadb
+
+    embedding_function = HashEmbeddingFunction()
+    collection = chromadb.Client().get_or_create_collection("ingest_benchmark", embedding_function=embedding_function)
+    ingestor = ChromaIngestor(collection, embedding_function, cache_path=args.cache_path)
+    records = synthetic_records(args.num_documents, args.blocks_per_document)
+
+    start = time.perf_counter()
+    print(f"First ingestion:  {ingestor.ingest(records)} in {time.perf_counter() - start:.2f}s")
+    start = time.perf_counter()
+    print(f"Re-ingestion:     {ingestor.ingest(records)} in {time.perf_counter() - start:.2f}s")
+    rng = np.random.default_rng(1)
+    for i in rng.choice(len(records), size=int(len(records) * args.changed_fraction), replace=False):
+        records[i] = {**records[i], "text": records[i]["text"] + " (revised)"}
+    start = time.perf_counter()
+    print(f"Changed blocks:   {ingestor.ingest(records, prune=True)} in {time.perf_counter() - start:.2f}s")
+    print(f"Collection size: {collection.count()}, embedding cache: {ingestor.cache.stats}")
+    ingestor.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Local stand-in for the Contextual AI /parse API, for running the parse pipeline offline.
+
+Serves the three endpoints the SDK's parse client calls, under /v1 like the real API:
+- POST /v1/parse                            multipart upload, returns {"job_id"}
+- GET  /v1/parse/jobs/{job_id}/status       pending -> processing -> completed / failed / cancelled
+- GET  /v1/parse/jobs/{job_id}/results      blocks-per-page output with a document hierarchy
+
+Each job finishes after a random delay. Results are generated from a hash of the
+uploaded bytes, so re-parsing the same file returns the same blocks. Request counters,
+the outcome of every job and the peak numbers of concurrent uploads and of concurrent
+status/results requests are kept in `stats`.
+
+Example Usage:
+    async with FakeParseService(min_latency=0.5, max_latency=3.0) as service:
+        client = AsyncContextualAI(api_key="fake", base_url=service.base_url)
+        ...
+
+    python fake_parse_service.py --port 8090   # serve until interrupted
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+HEADINGS = ["Introduction", "Background", "Method", "Model Architecture", "Experiments", "Results", "Discussion",
+            "Related Work", "Conclusion", "Training Data", "Evaluation", "Ablations"]
+WORDS = ("the model attention layer encoder decoder sequence token training data results table benchmark "
+         "performance accuracy dataset evaluation parameters learning rate batch size transformer "
+         "embedding representation output input task baseline score improvement").split()
+
+
+class FakeParseService:
+    """aiohttp app that mimics the asynchronous parse job API."""
+
+    def __init__(self, min_latency: float = 0.5, max_latency: float = 3.0, failure_rate: float = 0.0,
+                 pages: int = 3, blocks_per_page: int = 8, upload_delay: float = 0.01, seed: int = 0,
+                 cancel_rate: float = 0.0, status_delay: float = 0.0):
+        """
+        Initialize the service.
+
+        Args:
+            min_latency: Minimum seconds from upload until a job finishes
+            max_latency: Maximum seconds from upload until a job finishes
+            failure_rate: Fraction of jobs that end in "failed"
+            pages: Pages per parsed document
+            blocks_per_page: Blocks per page
+            upload_delay: Seconds each upload request takes
+            seed: Seed for job latencies and failures
+            cancel_rate: Fraction of jobs that end in "cancelled"
+            status_delay: Seconds each status and results request takes
+        """
+        self.min_latency = min_latency
+        self.max_latency = max_latency
+        self.failure_rate = failure_rate
+        self.cancel_rate = cancel_rate
+        self.status_delay = status_delay
+        self.pages = pages
+        self.blocks_per_page = blocks_per_page
+        self.upload_delay = upload_delay
+        self.rng = random.Random(seed)
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.stats = {"uploads": 0, "status_requests": 0, "results_requests": 0, "concurrent_uploads": 0,
+                      "max_concurrent_uploads": 0, "concurrent_polls": 0, "max_concurrent_polls": 0,
+                      "outcomes": {"completed": 0, "failed": 0, "cancelled": 0}}
+        self.app = web.Application(client_max_size=256 * 1024 ** 2)
+        self.app.router.add_post("/v1/parse", self.handle_upload)
+        self.app.router.add_get("/v1/parse/jobs/{job_id}/status", self.handle_status)
+        self.app.router.add_get("/v1/parse/jobs/{job_id}/results", self.handle_results)
+        self.runner: Optional[web.AppRunner] = None
+        self.base_url: Optional[str] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving and return the base URL to give the SDK client (ends in /v1)."""
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{port}/v1"
+        return self.base_url
+
+    async def close(self):
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _status(self, job: Dict[str, Any]) -> str:
+        elapsed = time.monotonic() - job["submitted_at"]
+        if elapsed >= job["latency"]:
+            return job["outcome"]
+        return "pending" if elapsed < job["latency"] * 0.2 else "processing"
+
+    async def handle_upload(self, request: web.Request) -> web.Response:
+        self.stats["concurrent_uploads"] += 1
+        self.stats["max_concurrent_uploads"] = max(self.stats["max_concurrent_uploads"],
+                                                   self.stats["concurrent_uploads"])
+        try:
+            form = await request.post()
+            upload = form.get("raw_file")
+            if upload is None or not hasattr(upload, "file"):
+                return web.json_response({"detail": "raw_file is required"}, status=422)
+            content = upload.file.read()
+            await asyncio.sleep(self.upload_delay)
+            job_id = str(uuid.uuid4())
+            latency = self.rng.uniform(self.min_latency, self.max_latency)
+            roll = self.rng.random()
+            if roll < self.failure_rate:
+                outcome = "failed"
+            elif roll < self.failure_rate + self.cancel_rate:
+                outcome = "cancelled"
+            else:
+                outcome = "completed"
+            self.jobs[job_id] = {
+                "file_name": upload.filename,
+                "digest": hashlib.sha256(content).hexdigest(),
+                "submitted_at": time.monotonic(),
+                "latency": latency,
+                "outcome": outcome,
+                "hierarchy": form.get("enable_document_hierarchy") == "true",
+            }
+            self.stats["uploads"] += 1
+            self.stats["outcomes"][outcome] += 1
+            return web.json_response({"job_id": job_id})
+        finally:
+            self.stats["concurrent_uploads"] -= 1
+
+    async def _poll_delay(self):
+        """Hold a status or results request for status_delay, tracking how many overlap."""
+        self.stats["concurrent_polls"] += 1
+        self.stats["max_concurrent_polls"] = max(self.stats["max_concurrent_polls"], self.stats["concurrent_polls"])
+        try:
+            await asyncio.sleep(self.status_delay)
+        finally:
+            self.stats["concurrent_polls"] -= 1
+
+    async def handle_status(self, request: web.Request) -> web.Response:
+        self.stats["status_requests"] += 1
+        await self._poll_delay()
+        job = self.jobs.get(request.match_info["job_id"])
+        if job is None:
+            return web.json_response({"detail": "Job not found"}, status=404)
+        return web.json_response({"file_name": job["file_name"], "status": self._status(job)})
+
+    async def handle_results(self, request: web.Request) -> web.Response:
+        self.stats["results_requests"] += 1
+        await self._poll_delay()
+        job = self.jobs.get(request.match_info["job_id"])
+        if job is None:
+            return web.json_response({"detail": "Job not found"}, status=404)
+        status = self._status(job)
+        body: Dict[str, Any] = {"file_name": job["file_name"], "status": status}
+        if status == "completed":
+            body.update(self.build_results(job["digest"], job["hierarchy"]))
+        return web.json_response(body)
+
+    def build_results(self, digest: str, hierarchy: bool = True) -> Dict[str, Any]:
+        """Deterministic blocks-per-page output for a document digest."""
+        rng = random.Random(digest)
+        pages: List[Dict[str, Any]] = []
+        heading_blocks = []
+        path: List[str] = []  # ids of the current heading at each level
+        for page_index in range(self.pages):
+            blocks = []
+            for b in range(self.blocks_per_page):
+                block_id = str(uuid.UUID(int=rng.getrandbits(128)))
+                roll = rng.random()
+                if b == 0 and page_index == 0:
+                    block_type, level = "heading", 0
+                elif roll < 0.2:
+                    block_type, level = "heading", min(rng.randint(1, 2), max(len(path), 1))
+                else:
+                    block_type, level = ("table" if roll < 0.3 else "text"), None
+                if block_type == "heading":
+                    markdown = "#" * (level + 1) + " " + rng.choice(HEADINGS)
+                elif block_type == "table":
+                    markdown = "| metric | value |\n|---|---|\n" + "\n".join(
+                        f"| {rng.choice(WORDS)} | {rng.randint(1, 999)}.{rng.randint(0, 9)} |" for _ in range(4))
+                else:
+                    markdown = " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 80))).capitalize() + "."
+                block: Dict[str, Any] = {
+                    "id": block_id,
+                    "type": block_type,
+                    "markdown": markdown,
+                    "bounding_box": {"x0": 0.1, "x1": 0.9, "y0": b / self.blocks_per_page,
+                                     "y1": (b + 1) / self.blocks_per_page},
+                }
+                if block_type == "table":
+                    block["confidence_level"] = rng.choice(["low", "medium", "high"])
+                if hierarchy:
+                    if block_type == "heading":
+                        path = path[:level]
+                        block["parent_ids"] = list(path)
+                        block["hierarchy_level"] = level
+                        path.append(block_id)
+                        heading_blocks.append({**block, "page_index": page_index})
+                    else:
+                        block["parent_ids"] = list(path)
+                        block["hierarchy_level"] = len(path)
+                blocks.append(block)
+            pages.append({"index": page_index, "blocks": blocks})
+        results: Dict[str, Any] = {"pages": pages}
+        if hierarchy:
+            toc = "\n".join("  " * h["hierarchy_level"] + f"- {h['markdown'].lstrip('# ')}" for h in heading_blocks)
+            results["document_metadata"] = {"hierarchy": {"blocks": heading_blocks, "table_of_contents": toc}}
+        return results
+
+
+async def serve(args: argparse.Namespace):
+    service = FakeParseService(args.min_latency, args.max_latency, args.failure_rate, cancel_rate=args.cancel_rate)
+    base_url = await service.start(args.host, args.port)
+    print(f"Fake parse service listening on {base_url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local fake of the Contextual AI parse API")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--min_latency", type=float, default=0.5, help="Minimum seconds per parse job")
+    parser.add_argument("--max_latency", type=float, default=3.0, help="Maximum seconds per parse job")
+    parser.add_argument("--failure_rate", type=float, default=0.0, help="Fraction of jobs that fail")
+    parser.add_argument("--cancel_rate", type=float, default=0.0, help="Fraction of jobs that are cancelled")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
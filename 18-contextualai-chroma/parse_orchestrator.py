@@ -0,0 +1,251 @@
+"""
+Concurrent download, upload and polling of Contextual AI parse jobs.
+
+Each document runs through download -> upload -> poll -> fetch results in its own task:
+- Uploads are bounded by max_concurrent_uploads, so hundreds of PDFs upload in parallel
+  without opening hundreds of connections at once.
+- Every pending job polls on its own schedule. The interval starts at initial_poll_interval
+  and grows by backoff_factor (with jitter) up to max_poll_interval while the job is still
+  running, so short jobs are picked up quickly and long ones cost few status calls.
+  Status and results calls are bounded by max_concurrent_polls.
+- run() is an async generator that yields each job as soon as it finishes, so chunking
+  and indexing can start on the first documents while the rest are still parsing.
+
+Runs against a local fake of the parse API (fake_parse_service.py) with --fake.
+
+Example Usage:
+    client = AsyncContextualAI(api_key=contextual_api_key)
+    orchestrator = ParseOrchestrator(client)
+    async for job in orchestrator.run(documents):
+        if job["status"] == "completed":
+            print(job["document"]["title"], len(job["results"].pages))
+
+    python parse_orchestrator.py --fake --num_documents 200
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+from contextual import AsyncContextualAI
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTPUT_TYPES = ["blocks-per-page"]
+TERMINAL_STATUSES = {"completed", "failed", "cancelled"}
+
+
+def parse_config_for(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Parse settings for a document, by document type."""
+    if document.get("parse_config"):
+        return dict(document["parse_config"])
+    if document["type"] == "research_paper":
+        # For research papers, focus on hierarchy and figures
+        return {
+            "parse_mode": "standard",
+            "figure_caption_mode": "concise",
+            "enable_document_hierarchy": True,
+            "page_range": "0-5"  # Parse first 6 pages
+        }
+    # For table-rich documents, enable table splitting
+    return {
+        "parse_mode": "standard",
+        "enable_split_tables": True,
+        "max_split_table_cells": 100,
+    }
+
+
+class ParseOrchestrator:
+    """Runs parse jobs for many documents concurrently and streams the finished jobs."""
+
+    def __init__(self, client: AsyncContextualAI, download_dir: str = "pdfs", max_concurrent_uploads: int = 8,
+                 max_concurrent_polls: int = 32, initial_poll_interval: float = 2.0, max_poll_interval: float = 30.0,
+                 backoff_factor: float = 1.5, job_timeout: float = 1800.0,
+                 output_types: Optional[List[str]] = None):
+        """
+        Initialize the orchestrator.
+
+        Args:
+            client: Async Contextual AI client
+            download_dir: Directory PDFs are downloaded to; files already there are not downloaded again
+            max_concurrent_uploads: Maximum downloads and uploads in flight
+            max_concurrent_polls: Maximum status and results requests in flight
+            initial_poll_interval: Seconds before a job's first status check
+            max_poll_interval: Longest wait between status checks of one job
+            backoff_factor: Growth of the poll interval after each check that finds the job still running
+            job_timeout: Seconds after upload before a job is given up on
+            output_types: Output types requested from job_results
+        """
+        self.client = client
+        self.download_dir = download_dir
+        self.max_concurrent_uploads = max_concurrent_uploads
+        self.max_concurrent_polls = max_concurrent_polls
+        self.initial_poll_interval = initial_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.backoff_factor = backoff_factor
+        self.job_timeout = job_timeout
+        self.output_types = output_types or DEFAULT_OUTPUT_TYPES
+        self.stats = {"downloaded": 0, "uploaded": 0, "status_checks": 0, "completed": 0, "failed": 0,
+                      "cancelled": 0}
+
+    async def _download(self, http: httpx.AsyncClient, document: Dict[str, Any], file_path: str):
+        if os.path.exists(file_path):
+            return
+        response = await http.get(document["url"], follow_redirects=True)
+        response.raise_for_status()
+        # Write under a temporary name so an interrupted download is never mistaken for a complete file
+        tmp_path = f"{file_path}.part"
+        await asyncio.to_thread(_write_bytes, tmp_path, response.content)
+        os.replace(tmp_path, file_path)
+        self.stats["downloaded"] += 1
+
+    async def _poll(self, job_id: str, polls: asyncio.Semaphore) -> str:
+        """Wait for a job to reach a terminal status, backing off while it runs."""
+        deadline = time.monotonic() + self.job_timeout
+        interval = self.initial_poll_interval
+        while True:
+            # Jitter keeps jobs uploaded together from polling in lockstep
+            await asyncio.sleep(interval * random.uniform(0.8, 1.2))
+            async with polls:
+                status = (await self.client.parse.job_status(job_id)).status
+            self.stats["status_checks"] += 1
+            if status in TERMINAL_STATUSES:
+                return status
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Parse job {job_id} still {status} after {self.job_timeout:.0f}s")
+            interval = min(interval * self.backoff_factor, self.max_poll_interval)
+
+    async def _process(self, http: httpx.AsyncClient, index: int, document: Dict[str, Any],
+                       uploads: asyncio.Semaphore, polls: asyncio.Semaphore) -> Dict[str, Any]:
+        file_path = os.path.join(self.download_dir, f"{document['type']}_{index}.pdf")
+        job = {"job_id": None, "file_path": file_path, "document": document, "status": None, "results": None,
+               "error": None, "elapsed": 0.0}
+        start = time.perf_counter()
+        try:
+            async with uploads:
+                await self._download(http, document, file_path)
+                content = await asyncio.to_thread(_read_bytes, file_path)
+                response = await self.client.parse.create(raw_file=(os.path.basename(file_path), content),
+                                                          **parse_config_for(document))
+            job["job_id"] = response.job_id
+            self.stats["uploaded"] += 1
+            logger.info(f"Submitted job {response.job_id} for {document['title']}")
+
+            job["status"] = await self._poll(response.job_id, polls)
+            if job["status"] == "completed":
+                async with polls:
+                    job["results"] = await self.client.parse.job_results(response.job_id,
+                                                                         output_types=self.output_types)
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = f"{type(e).__name__}: {e}"
+        job["elapsed"] = time.perf_counter() - start
+        self.stats[job["status"]] += 1
+        return job
+
+    async def run(self, documents: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Parse documents concurrently, yielding each job as it finishes.
+
+        Args:
+            documents: Dicts with "url", "title" and "type", and optionally "parse_config"
+
+        Yields:
+            Dicts with "job_id", "file_path", "document", "status" ("completed", "failed" or
+            "cancelled"), "results" (the job_results response, or None), "error" (set when the
+            download, upload or polling raised) and "elapsed" seconds
+        """
+        os.makedirs(self.download_dir, exist_ok=True)
+        uploads = asyncio.Semaphore(self.max_concurrent_uploads)
+        polls = asyncio.Semaphore(self.max_concurrent_polls)
+        limits = httpx.Limits(max_connections=self.max_concurrent_uploads)
+        async with httpx.AsyncClient(timeout=120, limits=limits) as http:
+            tasks = [asyncio.create_task(self._process(http, i, doc, uploads, polls))
+                     for i, doc in enumerate(documents)]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    yield await next_done
+            finally:
+                # The consumer stopped early or was cancelled; don't leave jobs polling in the background
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def parse_all(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Parse documents concurrently and return the jobs in document order."""
+        jobs = [job async for job in self.run(documents)]
+        order = {id(doc): i for i, doc in enumerate(documents)}
+        return sorted(jobs, key=lambda job: order[id(job["document"])])
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write_bytes(path: str, content: bytes):
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+async def run_fake(args: argparse.Namespace):
+    """Parse generated PDFs against the local fake parse service."""
+    from fake_parse_service import FakeParseService
+
+    os.makedirs(args.download_dir, exist_ok=True)
+    documents = []
+    for i in range(args.num_documents):
+        doc_type = "research_paper" if i % 2 == 0 else "table_rich_document"
+        # Pre-created files are not downloaded, so the URLs are never fetched
+        with open(os.path.join(args.download_dir, f"{doc_type}_{i}.pdf"), "wb") as f:
+            f.write(b"%PDF-1.4\n% fake document " + str(i).encode() + b"\n%%EOF\n")
+        documents.append({"url": f"https://example.com/{i}.pdf", "title": f"Document {i}", "type": doc_type})
+
+    async with FakeParseService(min_latency=args.min_latency, max_latency=args.max_latency,
+                                failure_rate=args.failure_rate, cancel_rate=args.cancel_rate) as service:
+        async with AsyncContextualAI(api_key="fake", base_url=service.base_url) as client:
+            orchestrator = ParseOrchestrator(client, download_dir=args.download_dir,
+                                             max_concurrent_uploads=args.max_concurrent_uploads,
+                                             max_concurrent_polls=args.max_concurrent_polls,
+                                             initial_poll_interval=args.initial_poll_interval,
+                                             max_poll_interval=args.max_poll_interval)
+            start = time.perf_counter()
+            first = None
+            async for job in orchestrator.run(documents):
+                if first is None:
+                    first = time.perf_counter() - start
+                if job["error"]:
+                    logger.warning(f"{job['document']['title']}: {job['error']}")
+            total = time.perf_counter() - start
+        print(f"Parsed {args.num_documents} documents in {total:.1f}s (first result after {first:.1f}s)")
+        print(f"Orchestrator stats: {orchestrator.stats}")
+        print(f"Service stats: {service.stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent Contextual AI parse job orchestration")
+    parser.add_argument("--fake", action="store_true", help="Run against the local fake parse service")
+    parser.add_argument("--num_documents", type=int, default=200, help="Generated documents to parse with --fake")
+    parser.add_argument("--download_dir", type=str, default="pdfs_fake")
+    parser.add_argument("--max_concurrent_uploads", type=int, default=8)
+    parser.add_argument("--max_concurrent_polls", type=int, default=32)
+    parser.add_argument("--initial_poll_interval", type=float, default=0.5)
+    parser.add_argument("--max_poll_interval", type=float, default=5.0)
+    parser.add_argument("--min_latency", type=float, default=1.0, help="Minimum fake job duration in seconds")
+    parser.add_argument("--max_latency", type=float, default=10.0, help="Maximum fake job duration in seconds")
+    parser.add_argument("--failure_rate", type=float, default=0.0, help="Fraction of fake jobs that fail")
+    parser.add_argument("--cancel_rate", type=float, default=0.0, help="Fraction of fake jobs that are cancelled")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+    if not args.fake:
+        parser.error("Only --fake runs from the command line; use ParseOrchestrator from the notebook for real jobs")
+    asyncio.run(run_fake(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Tests for incremental Chroma ingestion with the deterministic HashEmbeddingFunction.
+
+Example Usage:
+    python -m pytest test_chroma_ingest.py -q
+"""
+import os
+import sys
+import uuid
+
+import chromadb
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from chroma_ingest import ChromaIngestor, HashEmbeddingFunction, record_id, synthetic_records  # noqa: E402
+
+
+class CountingEmbeddingFunction(HashEmbeddingFunction):
+    """HashEmbeddingFunction that records every text it is asked to embed."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+        self.texts = []
+
+    def __call__(self, input):
+        self.calls += 1
+        self.texts.extend(input)
+        return super().__call__(input)
+
+
+def make_ingestor(tmp_path, cache_name: str = "cache.sqlite"):
+    embedding_function = CountingEmbeddingFunction()
+    collection = chromadb.EphemeralClient().create_collection(f"test_{uuid.uuid4().hex}",
+                                                              embedding_function=embedding_function)
+    ingestor = ChromaIngestor(collection, embedding_function, cache_path=str(tmp_path / cache_name), batch_size=32)
+    return ingestor, collection, embedding_function
+
+
+def revise(records, indices):
+    records = list(records)
+    for i in indices:
+        records[i] = {**records[i], "text": records[i]["text"] + " (revised)"}
+    return records
+
+
+def test_hash_embeddings_are_deterministic_and_normalized():
+    embedding_function = HashEmbeddingFunction(dimensions=64)
+    first = np.array(embedding_function(["attention layer encoder", "table benchmark"]))
+    second = np.array(HashEmbeddingFunction(dimensions=64)(["attention layer encoder", "table benchmark"]))
+    assert np.array_equal(first, second)
+    assert np.allclose(np.linalg.norm(first, axis=1), 1.0)
+
+
+def test_reingesting_makes_no_embedding_calls(tmp_path):
+    ingestor, collection, embedding_function = make_ingestor(tmp_path)
+    records = synthetic_records(4, 20)
+    first = ingestor.ingest(records)
+    assert first["upserted"] == collection.count() == len(records)
+
+    calls = embedding_function.calls
+    second = ingestor.ingest(records)
+    assert embedding_function.calls == calls
+    assert second["embedding_calls"] == second["embedded"] == second["upserted"] == 0
+    assert second["existing"] == len(records)
+
+
+def test_rebuilt_collection_reuses_cached_embeddings(tmp_path):
+    records = synthetic_records(3, 20)
+    ingestor, _, _ = make_ingestor(tmp_path)
+    ingestor.ingest(records)
+    ingestor.close()
+
+    rebuilt, collection, embedding_function = make_ingestor(tmp_path)
+    stats = rebuilt.ingest(records)
+    assert embedding_function.calls == 0
+    assert stats["cached_embeddings"] == len(records)
+    assert stats["upserted"] == collection.count() == len(records)
+
+
+def test_only_changed_blocks_are_embedded(tmp_path):
+    ingestor, collection, embedding_function = make_ingestor(tmp_path)
+    records = synthetic_records(4, 20)
+    ingestor.ingest(records)
+    embedding_function.texts.clear()
+
+    changed = [3, 17, 42, 79]
+    revised = revise(records, changed)
+    stats = ingestor.ingest(revised)
+    assert sorted(embedding_function.texts) == sorted(revised[i]["text"] for i in changed)
+    assert stats["embedded"] == stats["upserted"] == len(changed)
+    assert stats["existing"] == len(records) - len(changed)
+
+
+def test_prune_deletes_exactly_the_stale_ids(tmp_path):
+    ingestor, collection, _ = make_ingestor(tmp_path)
+    records = synthetic_records(4, 20)
+    ingestor.ingest(records)
+
+    # Revise blocks of Document 0 and 1 and re-ingest only those documents with prune
+    changed = [2, 5, 25, 30]
+    revised = revise(records, changed)
+    subset = [record for record in revised if record["metadata"]["title"] in ("Document 0", "Document 1")]
+    stale = {record_id(records[i]) for i in changed}
+    before = set(collection.get(include=[])["ids"])
+
+    stats = ingestor.ingest(subset, prune=True)
+    after = set(collection.get(include=[])["ids"])
+    assert stats["deleted"] == len(stale)
+    assert before - after == stale
+    assert after - before == {record_id(revised[i]) for i in changed}
+    # Chunks of documents that were not re-ingested are left alone
+    assert {record_id(record) for record in records[40:]} <= after
@@ -0,0 +1,90 @@
+"""
+Tests for ParseOrchestrator against the local fake parse service.
+
+Example Usage:
+    python -m pytest test_parse_orchestrator.py -q
+"""
+import asyncio
+import os
+import sys
+from collections import Counter
+
+from contextual import AsyncContextualAI
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_parse_service import FakeParseService  # noqa: E402
+from parse_orchestrator import TERMINAL_STATUSES, ParseOrchestrator  # noqa: E402
+
+
+def make_documents(download_dir: str, count: int):
+    """Documents whose PDFs are already on disk, so their URLs are never fetched."""
+    documents = []
+    for i in range(count):
+        doc_type = "research_paper" if i % 2 == 0 else "table_rich_document"
+        with open(os.path.join(download_dir, f"{doc_type}_{i}.pdf"), "wb") as f:
+            f.write(b"%PDF-1.4\n% test document " + str(i).encode() + b"\n%%EOF\n")
+        documents.append({"url": f"https://example.com/{i}.pdf", "title": f"Document {i}", "type": doc_type})
+    return documents
+
+
+async def parse_with_fake(documents, download_dir: str, service_kwargs=None, **orchestrator_kwargs):
+    async with FakeParseService(**{"min_latency": 0.05, "max_latency": 0.3, **(service_kwargs or {})}) as service:
+        async with AsyncContextualAI(api_key="fake", base_url=service.base_url, max_retries=0) as client:
+            orchestrator = ParseOrchestrator(client, download_dir=download_dir, initial_poll_interval=0.02,
+                                             max_poll_interval=0.1, **orchestrator_kwargs)
+            jobs = [job async for job in orchestrator.run(documents)]
+    return jobs, orchestrator.stats, service.stats
+
+
+def test_every_document_yields_one_terminal_job(tmp_path):
+    documents = make_documents(str(tmp_path), 40)
+    jobs, stats, service_stats = asyncio.run(parse_with_fake(
+        documents, str(tmp_path), service_kwargs={"failure_rate": 0.2, "cancel_rate": 0.15, "seed": 3}))
+
+    assert len(jobs) == len(documents)
+    assert sorted(id(job["document"]) for job in jobs) == sorted(id(doc) for doc in documents)
+    assert all(job["status"] in TERMINAL_STATUSES for job in jobs)
+    assert len({job["job_id"] for job in jobs}) == len(documents)
+
+
+def test_failed_and_cancelled_jobs_are_reported(tmp_path):
+    documents = make_documents(str(tmp_path), 40)
+    jobs, stats, service_stats = asyncio.run(parse_with_fake(
+        documents, str(tmp_path), service_kwargs={"failure_rate": 0.2, "cancel_rate": 0.15, "seed": 3}))
+
+    statuses = Counter(job["status"] for job in jobs)
+    outcomes = service_stats["outcomes"]
+    assert outcomes["failed"] > 0 and outcomes["cancelled"] > 0
+    assert statuses == Counter({status: n for status, n in outcomes.items() if n})
+    assert {status: stats[status] for status in TERMINAL_STATUSES} == dict(outcomes)
+    # Only completed jobs fetch results; jobs the service ended are reported without an exception
+    for job in jobs:
+        assert (job["results"] is not None) == (job["status"] == "completed")
+        assert job["error"] is None
+    assert service_stats["results_requests"] == outcomes["completed"]
+
+
+def test_upload_errors_are_reported_as_failed_jobs(tmp_path):
+    documents = make_documents(str(tmp_path), 6)
+    # Not on disk and not downloadable: the download fails before anything is uploaded
+    documents.append({"url": "http://127.0.0.1:9/missing.pdf", "title": "Missing", "type": "research_paper"})
+    jobs, stats, service_stats = asyncio.run(parse_with_fake(documents, str(tmp_path)))
+
+    assert len(jobs) == len(documents)
+    missing = next(job for job in jobs if job["document"]["title"] == "Missing")
+    assert missing["status"] == "failed"
+    assert missing["job_id"] is None and missing["error"]
+    assert stats["failed"] == 1 and stats["completed"] == 6
+    assert service_stats["uploads"] == 6
+
+
+def test_concurrency_limits_hold(tmp_path):
+    documents = make_documents(str(tmp_path), 30)
+    jobs, stats, service_stats = asyncio.run(parse_with_fake(
+        documents, str(tmp_path), service_kwargs={"upload_delay": 0.05, "status_delay": 0.03},
+        max_concurrent_uploads=3, max_concurrent_polls=2))
+
+    assert len(jobs) == len(documents)
+    assert 1 < service_stats["max_concurrent_uploads"] <= 3
+    assert 1 < service_stats["max_concurrent_polls"] <= 2
+    assert stats["uploaded"] == service_stats["uploads"] == len(documents)
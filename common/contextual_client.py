@@ -0,0 +1,443 @@
+"""
+Shared async HTTP client for the Contextual AI API with request metrics.
+
+One pooled aiohttp session (keep-alive connections, sized by max_connections) is
+used for every call, and every call goes through the same retry and rate limit
+policy:
+- 429, 408 and 5xx responses and connection errors are retried with jittered
+  exponential backoff, honoring Retry-After; other 4xx responses fail immediately
+- an optional AIMD rate limiter adapts the request rate to throttling
+
+Each endpoint (lmunit, generate, rerank, query, ...) gets a latency histogram and
+error counters, which can be exported as JSON or in the Prometheus text format so
+runs of different scripts can be compared.
+
+aiohttp speaks HTTP/1.1 only; connection reuse comes from the keep-alive pool.
+
+Example Usage:
+    async with ContextualClient(api_key, rate_limit=5, max_rate_limit=20) as client:
+        result = await client.lmunit(query, response, "Is the response helpful?")
+        ranked = await client.rerank(query, documents, model="ctxl-rerank-en-v1-instruct")
+    print(client.metrics.to_prometheus())
+    client.metrics.write("metrics.json")
+"""
+import asyncio
+import json
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://api.contextual.ai/v1"
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_TIMEOUT_SECONDS = 300
+DEFAULT_MAX_CONNECTIONS = 64
+DEFAULT_MAX_RATE_LIMIT_PER_SECOND = 20
+# Statuses worth retrying: throttling, timeouts and transient server errors.
+# Any other 4xx is a problem with the request itself and fails immediately.
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+ERROR_KINDS = ("throttled", "server_error", "client_error", "connection_error")
+
+
+class ContextualAPIError(Exception):
+    """A request failed with a non-retryable status or ran out of retries."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds to wait."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveRateLimiter:
+    """AIMD (additive increase, multiplicative decrease) async rate limiter.
+
+    Requests are spaced 1/rate seconds apart. Every success nudges the rate up so
+    that sustained healthy traffic gains roughly `increase` requests/second each
+    second; a throttled or failed response cuts the rate by `decrease`. A server
+    supplied Retry-After pauses all callers until it has elapsed.
+
+    Slots are not booked ahead: callers queue on a lock, and the caller at the head
+    re-checks the pause and the current rate each time it wakes, so a Retry-After
+    or a rate change applies to every request that has not been sent yet.
+    """
+
+    def __init__(self, initial_rate: float, min_rate: float = 0.5, max_rate: float = DEFAULT_MAX_RATE_LIMIT_PER_SECOND,
+                 increase: float = 1.0, decrease: float = 0.5):
+        """
+        Initialize the limiter.
+
+        Args:
+            initial_rate: Starting requests per second
+            min_rate: Lower bound for the rate after backing off
+            max_rate: Upper bound for the rate, e.g. your API quota
+            increase: Requests/second gained per second of successful traffic
+            decrease: Factor applied to the rate on a throttled or failed response
+        """
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, min_rate)
+        self.rate = min(max(initial_rate, min_rate), self.max_rate)
+        self.increase = increase
+        self.decrease = decrease
+        self._last_sent = float("-inf")
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait for the next free request slot."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                slot = max(self._last_sent + 1.0 / self.rate, self._paused_until)
+                if slot <= now:
+                    break
+                # on_backoff() or on_success() may move the slot while we sleep, so look again
+                await asyncio.sleep(slot - now)
+            self._last_sent = now
+
+    def on_success(self):
+        """Additively increase the rate after a successful response."""
+        self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+
+    def on_backoff(self, retry_after: Optional[float] = None):
+        """Multiplicatively decrease the rate and honor any Retry-After delay."""
+        now = time.monotonic()
+        # Concurrent requests tend to be throttled together; only back off once per
+        # window so a burst of 429s does not collapse the rate to min_rate.
+        if now - self._last_decrease >= 1.0 / self.rate:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self._last_decrease = now
+        if retry_after:
+            self._paused_until = max(self._paused_until, now + retry_after)
+
+
+class EndpointMetrics:
+    """Latency histogram and request/error counters for one endpoint."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * (len(self.buckets) + 1)  # last bucket is +Inf
+        self.latency_count = 0
+        self.latency_sum = 0.0
+        self.requests = 0
+        self.succeeded = 0
+        self.retries = 0
+        self.errors = {kind: 0 for kind in ERROR_KINDS}
+
+    def observe(self, seconds: float):
+        """Record the latency of a successful request."""
+        index = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+        self.bucket_counts[index] += 1
+        self.latency_count += 1
+        self.latency_sum += seconds
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a latency quantile by interpolating within histogram buckets."""
+        if not self.latency_count:
+            return None
+        rank = q * self.latency_count
+        seen, lower = 0, 0.0
+        for count, upper in zip(self.bucket_counts, self.buckets + (float("inf"),)):
+            if count and seen + count >= rank:
+                if upper == float("inf"):
+                    return lower
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = upper
+        return lower
+
+    def to_dict(self) -> Dict[str, Any]:
+        cumulative, buckets = 0, {}
+        for bound, count in zip(self.buckets + (float("inf"),), self.bucket_counts):
+            cumulative += count
+            buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+        return {
+            "requests": self.requests,
+            "succeeded": self.succeeded,
+            "retries": self.retries,
+            "errors": dict(self.errors),
+            "latency_seconds": {
+                "count": self.latency_count,
+                "sum": round(self.latency_sum, 6),
+                "mean": round(self.latency_sum / self.latency_count, 6) if self.latency_count else None,
+                "p50": self.quantile(0.5),
+                "p95": self.quantile(0.95),
+                "p99": self.quantile(0.99),
+                "buckets": buckets,
+            },
+        }
+
+
+class ClientMetrics:
+    """Per-endpoint metrics of a ContextualClient, exportable as JSON or Prometheus text."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.endpoints: Dict[str, EndpointMetrics] = {}
+
+    def __getitem__(self, endpoint: str) -> EndpointMetrics:
+        if endpoint not in self.endpoints:
+            self.endpoints[endpoint] = EndpointMetrics(self.buckets)
+        return self.endpoints[endpoint]
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        return {endpoint: metrics.to_dict() for endpoint, metrics in sorted(self.endpoints.items())}
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self, prefix: str = "contextual") -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        lines = [
+            f"# HELP {prefix}_request_duration_seconds Latency of successful requests.",
+            f"# TYPE {prefix}_request_duration_seconds histogram",
+        ]
+        for endpoint, metrics in sorted(self.endpoints.items()):
+            cumulative = 0
+            for bound, count in zip(metrics.buckets + (float("inf"),), metrics.bucket_counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f'{prefix}_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{le}"}} {cumulative}')
+            lines.append(f'{prefix}_request_duration_seconds_sum{{endpoint="{endpoint}"}} {metrics.latency_sum}')
+            lines.append(f'{prefix}_request_duration_seconds_count{{endpoint="{endpoint}"}} {metrics.latency_count}')
+        for name, help_text, attribute in (("requests", "HTTP attempts sent.", "requests"),
+                                           ("succeeded", "Requests that returned 200.", "succeeded"),
+                                           ("retries", "Attempts that were retries.", "retries")):
+            lines += [f"# HELP {prefix}_{name}_total {help_text}", f"# TYPE {prefix}_{name}_total counter"]
+            for endpoint, metrics in sorted(self.endpoints.items()):
+                lines.append(f'{prefix}_{name}_total{{endpoint="{endpoint}"}} {getattr(metrics, attribute)}')
+        lines += [f"# HELP {prefix}_errors_total Failed attempts by kind.", f"# TYPE {prefix}_errors_total counter"]
+        for endpoint, metrics in sorted(self.endpoints.items()):
+            for kind, count in metrics.errors.items():
+                lines.append(f'{prefix}_errors_total{{endpoint="{endpoint}",kind="{kind}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """Write the metrics to path: Prometheus text for .prom/.txt files, JSON otherwise."""
+        text = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+class ContextualClient:
+    """Async Contextual AI client with pooled connections, retries, rate limiting and metrics.
+
+    The endpoint helpers (lmunit, generate, rerank, query) build the request body;
+    post() can be used directly for any other endpoint.
+    """
+
+    def __init__(self, api_key: str, base_url: str = DEFAULT_BASE_URL, rate_limit: Optional[float] = None,
+                 max_rate_limit: float = DEFAULT_MAX_RATE_LIMIT_PER_SECOND, max_retries: int = DEFAULT_MAX_RETRIES,
+                 base_delay: float = DEFAULT_BASE_DELAY, timeout: float = DEFAULT_TIMEOUT_SECONDS,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS, metrics: Optional[ClientMetrics] = None):
+        """
+        Initialize the client.
+
+        Args:
+            api_key: Your Contextual AI API key
+            base_url: API root that endpoint paths are appended to
+            rate_limit: Starting requests per second for the adaptive limiter (None: no rate limit)
+            max_rate_limit: Ceiling the adaptive rate may grow to, e.g. your quota
+            max_retries: Maximum attempts per request
+            base_delay: Base delay in seconds for exponential backoff
+            timeout: Total timeout in seconds for one attempt
+            max_connections: Size of the keep-alive connection pool
+            metrics: Metrics registry to record into, e.g. one shared by several clients
+        """
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.rate_limiter = AdaptiveRateLimiter(rate_limit, max_rate=max_rate_limit) if rate_limit else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.metrics = metrics or ClientMetrics()
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+    @property
+    def current_rate(self) -> Optional[float]:
+        """Current requests per second allowed by the adaptive limiter, if any."""
+        return self.rate_limiter.rate if self.rate_limiter else None
+
+    def endpoint_url(self, endpoint: str) -> str:
+        return f"{self.base_url}/{endpoint.lstrip('/')}"
+
+    def get_stats(self) -> Dict:
+        """Return request/retry/error counters summed over endpoints, with the current rate."""
+        stats = {"requests": 0, "succeeded": 0, "retries": 0, **{kind: 0 for kind in ERROR_KINDS}}
+        for metrics in self.metrics.endpoints.values():
+            stats["requests"] += metrics.requests
+            stats["succeeded"] += metrics.succeeded
+            stats["retries"] += metrics.retries
+            for kind, count in metrics.errors.items():
+                stats[kind] += count
+        if self.rate_limiter:
+            stats["current_rate"] = round(self.current_rate, 3)
+        return stats
+
+    def _backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Exponential backoff with jitter, never shorter than a server supplied Retry-After."""
+        backoff = self.base_delay * (2 ** attempt)
+        delay = backoff / 2 + random.uniform(0, backoff / 2)
+        if retry_after is not None:
+            delay = retry_after + random.uniform(0, self.base_delay)
+        return delay
+
+    async def start(self):
+        """Open the pooled session."""
+        if not self.session:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+            self.session = aiohttp.ClientSession(connector=connector,
+                                                 timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+    async def close(self):
+        """Close the session and its connections."""
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def post(self, endpoint: str, payload: Dict[str, Any],
+                   handle_response: Optional[Callable[[aiohttp.ClientResponse, float], Awaitable]] = None,
+                   url: Optional[str] = None, metric_name: Optional[str] = None, headers: Optional[Dict] = None):
+        """
+        POST a JSON payload with rate limiting and jittered exponential backoff retry.
+
+        Args:
+            endpoint: Path relative to base_url, e.g. "lmunit"
+            payload: JSON request body
+            handle_response: Coroutine reading a 200 response, called with the response and
+                the time.perf_counter() value when the successful attempt was sent
+                (default: return the JSON body)
+            url: Absolute URL to call instead of base_url/endpoint, e.g. a mock server
+            metric_name: Name the request is recorded under (default: endpoint)
+            headers: Extra headers for this request
+
+        Returns:
+            The result of handle_response
+
+        Raises:
+            ContextualAPIError: On a non-retryable status or when retries are exhausted
+            aiohttp.ClientError, asyncio.TimeoutError: When the last attempt fails to connect
+        """
+        if not self.session:
+            raise RuntimeError("Session not started. Call start() first.")
+        url = url or self.endpoint_url(endpoint)
+        metrics = self.metrics[metric_name or endpoint]
+        request_headers = {**self.headers, **(headers or {})}
+
+        for attempt in range(self.max_retries):
+            if attempt > 0:
+                metrics.retries += 1
+            try:
+                if self.rate_limiter:
+                    await self.rate_limiter.acquire()
+                metrics.requests += 1
+                sent_at = time.perf_counter()
+                async with self.session.post(url, json=payload, headers=request_headers) as response:
+                    if response.status == 200:
+                        result = await handle_response(response, sent_at) if handle_response else await response.json()
+                        metrics.observe(time.perf_counter() - sent_at)
+                        metrics.succeeded += 1
+                        if self.rate_limiter:
+                            self.rate_limiter.on_success()
+                        return result
+                    if response.status not in RETRYABLE_STATUSES:
+                        metrics.errors["client_error"] += 1
+                        body = await response.text()
+                        raise ContextualAPIError(
+                            f"Request failed with non-retryable status {response.status}: {body[:200]}", response.status)
+                    metrics.errors["throttled" if response.status == 429 else "server_error"] += 1
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if self.rate_limiter:
+                    self.rate_limiter.on_backoff(retry_after)
+                if attempt == self.max_retries - 1:
+                    break
+                wait_time = self._backoff_delay(attempt, retry_after)
+                logger.warning(f"{metric_name or endpoint} request failed with status {response.status}, "
+                               f"retrying in {wait_time:.2f}s")
+                await asyncio.sleep(wait_time)
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                metrics.errors["connection_error"] += 1
+                if attempt == self.max_retries - 1:
+                    raise
+                if self.rate_limiter:
+                    self.rate_limiter.on_backoff()
+                wait_time = self._backoff_delay(attempt)
+                logger.warning(f"{metric_name or endpoint} request failed, retrying in {wait_time:.2f}s: {e!r}")
+                await asyncio.sleep(wait_time)
+
+        raise ContextualAPIError(f"Max retries ({self.max_retries}) exceeded")
+
+    async def lmunit(self, query: str, response: str, unit_test: str, **kwargs) -> Dict:
+        """Score a response against a natural-language unit test. Returns {"score": ...}."""
+        return await self.post("lmunit", {"query": query, "response": response, "unit_test": unit_test}, **kwargs)
+
+    async def generate(self, messages: List[Dict[str, str]], model: str = "v2", knowledge: Sequence[str] = (),
+                       system_prompt: str = "", parameters: Optional[Dict[str, Any]] = None, **kwargs):
+        """
+        Generate with the grounded language model.
+
+        Args:
+            messages: List of {"role", "content"} dicts
+            model: GLM version
+            knowledge: Knowledge strings to ground the response in
+            system_prompt: Optional system prompt
+            parameters: Extra body fields, e.g. temperature, top_p, max_new_tokens, avoid_commentary, stream
+            **kwargs: Passed to post(), e.g. handle_response for streamed responses
+
+        Returns:
+            The JSON body ({"response": ...}) unless handle_response is given
+        """
+        payload = {"model": model, "messages": messages, "knowledge": list(knowledge),
+                   "system_prompt": system_prompt, **(parameters or {})}
+        return await self.post("generate", payload, **kwargs)
+
+    async def rerank(self, query: str, documents: List[str], model: str, instruction: Optional[str] = None,
+                     top_n: Optional[int] = None, metadata: Optional[List[str]] = None, **kwargs) -> Dict:
+        """Rerank documents for a query. Returns {"results": [{"index", "relevance_score"}, ...]}."""
+        payload = {"query": query, "documents": documents, "model": model}
+        if instruction is not None:
+            payload["instruction"] = instruction
+        if top_n is not None:
+            payload["top_n"] = top_n
+        if metadata is not None:
+            payload["metadata"] = metadata
+        return await self.post("rerank", payload, **kwargs)
+
+    async def query(self, agent_id: str, messages: List[Dict[str, str]], **body) -> Dict:
+        """Query an agent, e.g. query(agent_id, [{"role": "user", "content": question}], stream=False)."""
+        return await self.post(f"agents/{agent_id}/query", {"messages": messages, **body}, metric_name="query")
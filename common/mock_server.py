@@ -0,0 +1,351 @@
+"""
+Local mock of the Contextual AI endpoints used by the evaluation scripts, for offline benchmarking.
+
+Serves under /v1 like the real API, so any ContextualClient can point its base_url at it:
+- POST /v1/lmunit                       {"score"} between 1 and 5
+- POST /v1/generate                     {"response"}, or server-sent events with "stream": true
+- POST /v1/rerank                       {"results": [{"index", "relevance_score"}]} by query term overlap
+- POST /v1/agents/{agent_id}/query      {"message": {"role", "content"}, "retrieval_contents": [...]}
+- POST /v1/applications/{agent_id}/query  the same, as called by 11-retrieval-analysis/retriever.py;
+                                          ?retrievals_only=true omits the message
+
+Responses are derived from a hash of the request, so repeated requests get the same answer.
+Each response is delayed by a sample from a LatencyModel. The server can also fail a
+fraction of requests with a 5xx, and enforce a token-bucket rate limit and a concurrency
+limit by answering 429 with Retry-After. Per-endpoint counters and the peak number of
+concurrent requests are kept in `stats`.
+
+Example Usage:
+    async with MockContextualServer(latency=LatencyModel("lognormal", median=0.05, sigma=0.5),
+                                    error_rate=0.01, rate_limit=200) as server:
+        async with ContextualClient("mock", base_url=server.base_url) as client:
+            await client.lmunit(query, response, "Is the response helpful?")
+        print(server.stats)
+
+    python mock_server.py --port 8089 --median_ms 50 --error_rate 0.01 --rate_limit 200
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import time
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+LATENCY_DISTRIBUTIONS = ("constant", "uniform", "lognormal")
+ENDPOINTS = ("lmunit", "generate", "rerank", "query")
+WORDS = ("the model response answer context document evidence claim source result method data table "
+         "value score question retrieval grounded passage summary analysis").split()
+
+
+class LatencyModel:
+    """Distribution of response delays.
+
+    The base delay is constant, uniform within median * (1 +/- sigma), or lognormal
+    with the given median and shape sigma. With probability tail_probability the
+    delay is multiplied by tail_factor, to model slow outliers that dominate p99.
+    """
+
+    def __init__(self, distribution: str = "lognormal", median: float = 0.05, sigma: float = 0.5,
+                 tail_probability: float = 0.0, tail_factor: float = 10.0, per_item: float = 0.0):
+        """
+        Initialize the model.
+
+        Args:
+            distribution: One of LATENCY_DISTRIBUTIONS
+            median: Median delay in seconds
+            sigma: Lognormal shape, or relative half-width for uniform
+            tail_probability: Fraction of requests that are slow outliers
+            tail_factor: Multiplier applied to outlier delays
+            per_item: Extra seconds per item in the request, e.g. per rerank document
+        """
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution {distribution!r}, expected one of {LATENCY_DISTRIBUTIONS}")
+        self.distribution = distribution
+        self.median = median
+        self.sigma = sigma
+        self.tail_probability = tail_probability
+        self.tail_factor = tail_factor
+        self.per_item = per_item
+
+    def sample(self, rng: random.Random, items: int = 0) -> float:
+        """Draw one delay in seconds for a request with the given number of items."""
+        if self.distribution == "constant":
+            delay = self.median
+        elif self.distribution == "uniform":
+            delay = rng.uniform(self.median * (1 - self.sigma), self.median * (1 + self.sigma))
+        else:
+            delay = self.median * math.exp(rng.gauss(0.0, self.sigma))
+        if self.tail_probability and rng.random() < self.tail_probability:
+            delay *= self.tail_factor
+        return max(0.0, delay + self.per_item * items)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+class TokenBucket:
+    """Requests/second limit with bursts of up to `burst` requests."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def try_acquire(self) -> Optional[float]:
+        """Take a token; returns None on success, else the seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return None
+        return (1 - self.tokens) / self.rate
+
+
+def stable_hash(payload: Any) -> int:
+    """64-bit hash of a JSON payload that is the same in every process."""
+    blob = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return int.from_bytes(hashlib.sha256(blob).digest()[:8], "big")
+
+
+class MockContextualServer:
+    """aiohttp app that mimics the LMUnit, generate, rerank and agent query endpoints."""
+
+    def __init__(self, latency: Optional[LatencyModel] = None, endpoint_latency: Optional[Dict[str, LatencyModel]] = None,
+                 error_rate: float = 0.0, error_status: int = 503, rate_limit: Optional[float] = None,
+                 burst: Optional[float] = None, max_concurrency: Optional[int] = None, retry_after: Optional[float] = None,
+                 stream_token_delay: float = 0.002, response_words: int = 60, retrievals: int = 10, seed: int = 0):
+        """
+        Initialize the server.
+
+        Args:
+            latency: Delay model for every endpoint (default: lognormal, 50 ms median)
+            endpoint_latency: Delay models overriding `latency` for some of ENDPOINTS
+            error_rate: Fraction of requests answered with error_status
+            error_status: Status of injected failures, e.g. 500 or 503
+            rate_limit: Requests/second accepted across endpoints before answering 429 (None: unlimited)
+            burst: Requests the rate limiter accepts at once (default: one second's worth)
+            max_concurrency: Requests processed at once before answering 429 (None: unlimited)
+            retry_after: Retry-After sent with 429s (default: time until the rate limiter has a token)
+            stream_token_delay: Seconds between streamed generate events
+            response_words: Words in generated and agent responses
+            retrievals: Retrieved chunks returned with each agent query
+            seed: Seed for delays and injected errors
+        """
+        self.latency = latency or LatencyModel()
+        self.endpoint_latency = endpoint_latency or {}
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.bucket = TokenBucket(rate_limit, burst) if rate_limit else None
+        self.max_concurrency = max_concurrency
+        self.retry_after = retry_after
+        self.stream_token_delay = stream_token_delay
+        self.response_words = response_words
+        self.retrievals = retrievals
+        self.rng = random.Random(seed)
+        self.in_flight = 0
+        self.stats: Dict[str, Any] = {"peak_in_flight": 0, "endpoints": {}}
+        self.app = web.Application(client_max_size=64 * 1024 ** 2)
+        self.app.router.add_post("/v1/lmunit", self.handle_lmunit)
+        self.app.router.add_post("/v1/generate", self.handle_generate)
+        self.app.router.add_post("/v1/rerank", self.handle_rerank)
+        self.app.router.add_post("/v1/agents/{agent_id}/query", self.handle_query)
+        self.app.router.add_post("/v1/applications/{agent_id}/query", self.handle_query)
+        self.runner: Optional[web.AppRunner] = None
+        self.base_url: Optional[str] = None
+
+    def config(self) -> Dict[str, Any]:
+        """The server settings, for recording next to benchmark results."""
+        return {
+            "latency": self.latency.to_dict(),
+            "endpoint_latency": {name: model.to_dict() for name, model in self.endpoint_latency.items()},
+            "error_rate": self.error_rate,
+            "error_status": self.error_status,
+            "rate_limit": self.bucket.rate if self.bucket else None,
+            "burst": self.bucket.capacity if self.bucket else None,
+            "max_concurrency": self.max_concurrency,
+            "retry_after": self.retry_after,
+            "stream_token_delay": self.stream_token_delay,
+        }
+
+    def reset_stats(self):
+        self.stats = {"peak_in_flight": 0, "endpoints": {}}
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving and return the base URL to give a ContextualClient (ends in /v1)."""
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{port}/v1"
+        return self.base_url
+
+    async def close(self):
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _count(self, endpoint: str, status: int):
+        counters = self.stats["endpoints"].setdefault(endpoint, {"requests": 0, "statuses": {}})
+        counters["requests"] += 1
+        counters["statuses"][str(status)] = counters["statuses"].get(str(status), 0) + 1
+
+    async def _serve(self, endpoint: str, request: web.Request, respond) -> web.StreamResponse:
+        """Apply auth, limits, injected errors and the delay, then build the response with respond(payload)."""
+        if not request.headers.get("Authorization", "").startswith("Bearer "):
+            self._count(endpoint, 401)
+            return web.json_response({"detail": "Missing bearer token"}, status=401)
+        if self.bucket is not None:
+            wait = self.bucket.try_acquire()
+            if wait is not None:
+                self._count(endpoint, 429)
+                retry_after = self.retry_after if self.retry_after is not None else wait
+                return web.json_response({"detail": "Rate limit exceeded"}, status=429,
+                                         headers={"Retry-After": f"{retry_after:.3f}"})
+        if self.max_concurrency is not None and self.in_flight >= self.max_concurrency:
+            self._count(endpoint, 429)
+            return web.json_response({"detail": "Too many concurrent requests"}, status=429,
+                                     headers={"Retry-After": f"{self.retry_after or 0.1:.3f}"})
+        try:
+            payload = await request.json()
+        except json.JSONDecodeError:
+            self._count(endpoint, 400)
+            return web.json_response({"detail": "Invalid JSON"}, status=400)
+
+        self.in_flight += 1
+        self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.in_flight)
+        try:
+            model = self.endpoint_latency.get(endpoint, self.latency)
+            items = len(payload.get("documents", [])) if endpoint == "rerank" else 0
+            await asyncio.sleep(model.sample(self.rng, items))
+            if self.error_rate and self.rng.random() < self.error_rate:
+                self._count(endpoint, self.error_status)
+                return web.json_response({"detail": "Injected failure"}, status=self.error_status)
+            response = await respond(request, payload)
+            self._count(endpoint, 200)
+            return response
+        finally:
+            self.in_flight -= 1
+
+    def _text(self, seed: int) -> str:
+        rng = random.Random(seed)
+        return " ".join(rng.choice(WORDS) for _ in range(self.response_words)).capitalize() + "."
+
+    async def handle_lmunit(self, request: web.Request) -> web.StreamResponse:
+        async def respond(_, payload):
+            # Scores on the API's 1-5 scale with one decimal, so ties occur as they do in practice
+            return web.json_response({"score": 1 + (stable_hash(payload) % 41) / 10})
+        return await self._serve("lmunit", request, respond)
+
+    async def handle_generate(self, request: web.Request) -> web.StreamResponse:
+        async def respond(request, payload):
+            text = self._text(stable_hash(payload.get("messages")))
+            if not payload.get("stream"):
+                return web.json_response({"response": text})
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await response.prepare(request)
+            for word in text.split(" "):
+                await response.write(f"data: {json.dumps({'delta': word + ' '})}\n\n".encode())
+                await asyncio.sleep(self.stream_token_delay)
+            await response.write(b"data: [DONE]\n\n")
+            await response.write_eof()
+            return response
+        return await self._serve("generate", request, respond)
+
+    async def handle_rerank(self, request: web.Request) -> web.StreamResponse:
+        async def respond(_, payload):
+            query_terms = set(re.findall(r"\w+", payload.get("query", "").lower()))
+            results = []
+            for index, document in enumerate(payload.get("documents", [])):
+                overlap = len(query_terms & set(re.findall(r"\w+", document.lower())))
+                results.append({"index": index, "relevance_score": overlap / len(query_terms) if query_terms else 0.0})
+            results.sort(key=lambda result: -result["relevance_score"])
+            if payload.get("top_n"):
+                results = results[:payload["top_n"]]
+            return web.json_response({"results": results})
+        return await self._serve("rerank", request, respond)
+
+    async def handle_query(self, request: web.Request) -> web.StreamResponse:
+        async def respond(request, payload):
+            seed = stable_hash([request.match_info["agent_id"], payload.get("messages")])
+            body: Dict[str, Any] = {
+                "conversation_id": f"conv-{seed % 10 ** 8}",
+                "message_id": f"msg-{seed % 10 ** 8}",
+                "retrieval_contents": [
+                    {"content_id": f"chunk-{(seed + i) % 10 ** 8}", "number": i + 1, "doc_name": f"doc-{i % 3}.pdf",
+                     "page": i + 1, "content_text": self._text(seed + i), "score": round(1 - i / self.retrievals, 4)}
+                    for i in range(self.retrievals)
+                ],
+            }
+            if request.query.get("retrievals_only") != "true":
+                body["message"] = {"role": "assistant", "content": self._text(seed)}
+            return web.json_response(body)
+        return await self._serve("query", request, respond)
+
+
+def add_server_arguments(parser: argparse.ArgumentParser):
+    """Add the mock server settings to a command line parser."""
+    parser.add_argument("--latency", type=str, default="lognormal", choices=LATENCY_DISTRIBUTIONS,
+                        help="Response delay distribution")
+    parser.add_argument("--median_ms", type=float, default=50, help="Median response delay in milliseconds")
+    parser.add_argument("--sigma", type=float, default=0.5, help="Lognormal shape, or relative half-width for uniform")
+    parser.add_argument("--tail_probability", type=float, default=0.0, help="Fraction of slow outlier responses")
+    parser.add_argument("--tail_factor", type=float, default=10.0, help="Delay multiplier of slow outliers")
+    parser.add_argument("--rerank_per_doc_ms", type=float, default=0.2, help="Extra rerank delay per document")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--error_status", type=int, default=503, help="Status of injected failures")
+    parser.add_argument("--rate_limit", type=float, default=None, help="Requests/second before answering 429")
+    parser.add_argument("--burst", type=float, default=None, help="Requests the rate limiter accepts at once")
+    parser.add_argument("--max_concurrency", type=int, default=None, help="Concurrent requests before answering 429")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for delays and injected errors")
+
+
+def server_from_args(args: argparse.Namespace) -> MockContextualServer:
+    """Build a server from the arguments added by add_server_arguments."""
+    latency = LatencyModel(args.latency, args.median_ms / 1000, args.sigma, args.tail_probability, args.tail_factor)
+    rerank_latency = LatencyModel(args.latency, args.median_ms / 1000, args.sigma, args.tail_probability,
+                                  args.tail_factor, per_item=args.rerank_per_doc_ms / 1000)
+    return MockContextualServer(latency, {"rerank": rerank_latency}, error_rate=args.error_rate,
+                                error_status=args.error_status, rate_limit=args.rate_limit, burst=args.burst,
+                                max_concurrency=args.max_concurrency, seed=args.seed)
+
+
+async def serve(args: argparse.Namespace):
+    server = server_from_args(args)
+    base_url = await server.start(args.host, args.port)
+    print(f"Mock Contextual API listening on {base_url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+        print(json.dumps(server.stats, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local mock of the Contextual AI evaluation endpoints")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+Offline end-to-end benchmark suite for the evaluation scripts, run against mock_server.py.
+
+Starts a MockContextualServer, then runs each scenario in a fresh interpreter so that
+imports and peak memory are measured per script:
+- lmunit        rewardbench_lmunit.lmunit_request() scoring --requests samples
+- facts         GLMv2_FACTS.generate_all() over --requests prompts
+- facts_stream  the same with SSE streaming
+- rerank        rerank_benchmark.run_benchmark() with ContextualReranker on the synthetic dataset
+- retrieval     retriever.retrieve_all() agent queries for --requests questions
+
+Each scenario reports requests/s, p50/p99 latency of the API calls (end to end,
+including retries), errors, peak RSS and wall time, plus the mock's status counts.
+The results are written as one JSON document, and can be appended to a JSONL
+history file to track them over time. Scripts keep their own defaults, e.g. the
+adaptive rate limiter of rewardbench_lmunit.py starts at 1 request/s.
+
+Example Usage:
+    python offline_benchmark.py --output bench_results.json
+    python offline_benchmark.py --scenarios lmunit rerank --requests 1000 --error_rate 0.02 --rate_limit 100 \\
+        --history bench_history.jsonl
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from mock_server import add_server_arguments, server_from_args
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(HERE)
+SCENARIOS = ("lmunit", "facts", "facts_stream", "rerank", "retrieval")
+SCENARIO_DIRS = {
+    "lmunit": "09-lmunit-rewardbench",
+    "facts": "10-FACTS-benchmark",
+    "facts_stream": "10-FACTS-benchmark",
+    "rerank": os.path.join("03-standalone-api", "03-rerank"),
+    "retrieval": "11-retrieval-analysis",
+}
+DEFAULT_REQUESTS = 500
+DEFAULT_CONCURRENCY = 16
+
+
+class LatencyRecorder:
+    """Records the duration of every ContextualClient.post call while active.
+
+    All scripts send their requests through ContextualClient.post, so wrapping it
+    measures what the script waits for per request, retries and backoff included.
+    """
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self._original = None
+
+    def __enter__(self):
+        from contextual_client import ContextualClient
+
+        self._original = original = ContextualClient.post
+        latencies = self.latencies
+
+        async def post(client, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await original(client, *args, **kwargs)
+            finally:
+                latencies.append(time.perf_counter() - start)
+
+        ContextualClient.post = post
+        return self
+
+    def __exit__(self, *exc):
+        from contextual_client import ContextualClient
+
+        ContextualClient.post = self._original
+
+
+def synthetic_texts(count: int, prefix: str, words: int = 40) -> List[str]:
+    """Distinct texts of roughly `words` words, so no script deduplicates or caches them away."""
+    filler = " ".join(["lorem ipsum dolor sit amet consectetur"] * (words // 6 + 1)).split()[:words]
+    return [f"{prefix} {i}: " + " ".join(filler) for i in range(count)]
+
+
+async def scenario_lmunit(base_url: str, requests: int, concurrency: int, rate_limit: Optional[float] = None,
+                          max_rate_limit: Optional[float] = None) -> Dict[str, Any]:
+    from rewardbench_lmunit import DEFAULT_MAX_RATE_LIMIT_PER_SECOND, DEFAULT_RATE_LIMIT_PER_SECOND, lmunit_request
+
+    errors = 0
+
+    def on_result(i, sample, result):
+        nonlocal errors
+        errors += isinstance(result, Exception)
+
+    queries, responses = synthetic_texts(requests, "Query", 20), synthetic_texts(requests, "Response", 120)
+    samples = ({"query": q, "response": r, "unit_test": "Is the response helpful?"} for q, r in zip(queries, responses))
+    stats = await lmunit_request(samples, api_key="mock", max_in_flight=concurrency, on_result=on_result,
+                                 total=requests, base_url=base_url,
+                                 rate_limit=rate_limit or DEFAULT_RATE_LIMIT_PER_SECOND,
+                                 max_rate_limit=max_rate_limit or DEFAULT_MAX_RATE_LIMIT_PER_SECOND)
+    return {"requests": requests, "errors": errors, "client": stats}
+
+
+async def scenario_facts(base_url: str, requests: int, concurrency: int, stream: bool = False) -> Dict[str, Any]:
+    from GLMv2_FACTS import generate_all
+
+    outputs = await generate_all(synthetic_texts(requests, "Prompt", 300), api_token="mock", concurrency=concurrency,
+                                 url=f"{base_url}/generate", stream=stream)
+    result = {"requests": requests, "errors": sum(output is None for output in outputs)}
+    ttft = [output["ttft_s"] for output in outputs if output and "ttft_s" in output]
+    if ttft:
+        result["ttft_p50_ms"] = float(np.percentile(ttft, 50)) * 1000
+        result["ttft_p99_ms"] = float(np.percentile(ttft, 99)) * 1000
+    return result
+
+
+async def scenario_rerank(base_url: str, requests: int, concurrency: int) -> Dict[str, Any]:
+    from contextual_client import ContextualClient
+    from rerank_benchmark import RERANK_MODELS, ContextualReranker, run_benchmark, synthetic_dataset
+
+    samples = synthetic_dataset(requests, num_candidates=50)
+    async with ContextualClient("mock", base_url=base_url, max_connections=concurrency) as client:
+        report = await run_benchmark(samples, ContextualReranker(client, RERANK_MODELS[0]), RERANK_MODELS[0],
+                                     concurrency=concurrency)
+    return {"requests": requests, "errors": report["errors"], "docs_per_second": report["docs_per_second"],
+            "avg_ndcg_cut_10": report.get("avg_ndcg_cut_10")}
+
+
+async def scenario_retrieval(base_url: str, requests: int, concurrency: int) -> Dict[str, Any]:
+    from retriever import retrieve_all
+
+    queries = [(question, f"doc-{i % 5}.pdf") for i, question in enumerate(synthetic_texts(requests, "Question", 15))]
+    # Questions whose request exhausted its retries are left out of the results
+    results = await retrieve_all(queries, "mock-agent", "mock", concurrency=concurrency, cache_path=None,
+                                 url=f"{base_url}/applications/{{agent_id}}/query?retrievals_only=true")
+    return {"requests": requests, "errors": len(set(queries)) - len(results)}
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB (ru_maxrss is KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def run_scenario(name: str, base_url: str, requests: int, concurrency: int,
+                 lmunit_rate_limit: Optional[float] = None, lmunit_max_rate_limit: Optional[float] = None) -> Dict[str, Any]:
+    """Run one scenario in this process and measure it."""
+    sys.path.insert(0, os.path.join(REPO_ROOT, SCENARIO_DIRS[name]))
+    scenario = {
+        "lmunit": lambda *args: scenario_lmunit(*args, rate_limit=lmunit_rate_limit,
+                                                max_rate_limit=lmunit_max_rate_limit),
+        "facts": scenario_facts,
+        "facts_stream": lambda *args: scenario_facts(*args, stream=True),
+        "rerank": scenario_rerank,
+        "retrieval": scenario_retrieval,
+    }[name]
+    with LatencyRecorder() as recorder:
+        start = time.perf_counter()
+        result = asyncio.run(scenario(base_url, requests, concurrency))
+        wall = time.perf_counter() - start
+    latencies = np.asarray(recorder.latencies)
+    result.update({
+        "wall_s": wall,
+        "requests_per_s": result["requests"] / wall if wall else 0.0,
+        "api_calls": len(latencies),
+        "latency_p50_ms": float(np.percentile(latencies, 50)) * 1000 if len(latencies) else None,
+        "latency_p99_ms": float(np.percentile(latencies, 99)) * 1000 if len(latencies) else None,
+        "peak_rss_mb": peak_rss_mb(),
+    })
+    return result
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run_suite(args: argparse.Namespace) -> Dict[str, Any]:
+    """Serve the mock and run every requested scenario against it in a subprocess."""
+    server = server_from_args(args)
+    base_url = await server.start()
+    env = {**os.environ, "TQDM_DISABLE": "1"}
+    report: Dict[str, Any] = {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "lmunit_rate_limit": args.lmunit_rate_limit,
+        "lmunit_max_rate_limit": args.lmunit_max_rate_limit,
+        "mock": server.config(),
+        "scenarios": {},
+    }
+    suite_start = time.perf_counter()
+    try:
+        with tempfile.TemporaryDirectory(prefix="offline_benchmark_") as tmp:
+            for name in args.scenarios:
+                server.reset_stats()
+                result_path = os.path.join(tmp, f"{name}.json")
+                scenario_args = ["--requests", str(args.requests), "--concurrency", str(args.concurrency),
+                                 "--result_path", result_path]
+                for flag in ("lmunit_rate_limit", "lmunit_max_rate_limit"):
+                    if getattr(args, flag) is not None:
+                        scenario_args += [f"--{flag}", str(getattr(args, flag))]
+                start = time.perf_counter()
+                # Scripts log every request; only the result file is read back
+                proc = await asyncio.create_subprocess_exec(
+                    sys.executable, os.path.abspath(__file__), "--run_scenario", name, "--base_url", base_url,
+                    *scenario_args, cwd=tmp, env=env,
+                    stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE)
+                _, stderr = await proc.communicate()
+                if proc.returncode != 0:
+                    result = {"failed": True, "stderr": stderr.decode(errors="replace")[-2000:]}
+                else:
+                    with open(result_path) as f:
+                        result = json.load(f)
+                result["process_wall_s"] = time.perf_counter() - start
+                result["server"] = json.loads(json.dumps(server.stats))
+                report["scenarios"][name] = result
+                print(format_result(name, result), flush=True)
+    finally:
+        await server.close()
+    report["total_wall_s"] = time.perf_counter() - suite_start
+    return report
+
+
+def format_result(name: str, result: Dict[str, Any]) -> str:
+    if result.get("failed"):
+        return f"{name:<13} FAILED\n{result['stderr']}"
+    return (f"{name:<13} {result['requests_per_s']:8.1f} req/s  p50 {result['latency_p50_ms'] or 0:7.1f} ms  "
+            f"p99 {result['latency_p99_ms'] or 0:7.1f} ms  errors {result['errors']:<4} "
+            f"peak RSS {result['peak_rss_mb']:6.0f} MB  wall {result['wall_s']:6.2f}s "
+            f"(process {result['process_wall_s']:.2f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the evaluation scripts offline against a mock API")
+    parser.add_argument("--scenarios", type=str, nargs="+", default=list(SCENARIOS), choices=SCENARIOS,
+                        help="Scenarios to run, in order")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS, help="Samples, prompts or queries per scenario")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Requests in flight per scenario")
+    parser.add_argument("--output", type=str, default=None, help="Write the results JSON here (default: stdout)")
+    parser.add_argument("--history", type=str, default=None, help="Append the results as one line to this JSONL file")
+    parser.add_argument("--lmunit_rate_limit", type=float, default=None,
+                        help="Starting requests/s of the lmunit scenario (default: the script's)")
+    parser.add_argument("--lmunit_max_rate_limit", type=float, default=None,
+                        help="Requests/s the lmunit scenario's rate limiter may grow to (default: the script's)")
+    add_server_arguments(parser)
+    # Internal: run one scenario against an already running server
+    parser.add_argument("--run_scenario", type=str, default=None, choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--base_url", type=str, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--result_path", type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scenario:
+        result = run_scenario(args.run_scenario, args.base_url, args.requests, args.concurrency,
+                              args.lmunit_rate_limit, args.lmunit_max_rate_limit)
+        with open(args.result_path, "w") as f:
+            json.dump(result, f)
+        return
+
+    report = asyncio.run(run_suite(args))
+    print(f"Total wall time: {report['total_wall_s']:.1f}s")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved results to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+    if args.history:
+        with open(args.history, "a") as f:
+            f.write(json.dumps(report) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Persistent, content-addressed cache for API responses.
+
+Responses are stored in a local SQLite database (WAL mode) keyed by a SHA-256 hash
+of the endpoint URL and the JSON payload, so re-running an evaluation only pays for
+requests that have not been answered before. Headers such as the API key are not
+part of the key.
+
+max_entries is enforced as entries are written: a set() that takes the cache over the
+limit evicts the least recently used entries straight away. Recency updates from cache
+hits are buffered and written in one transaction every touch_batch hits (and before any
+eviction), so a hit costs a primary-key lookup rather than a write.
+
+Example Usage:
+    cache = ResponseCache("lmunit_cache.sqlite", max_age_seconds=7 * 24 * 3600)
+    cached = cache.get(url, payload)
+    if cached is None:
+        cached = call_api(url, payload)
+        cache.set(url, payload, cached)
+    print(cache.stats)
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+
+DEFAULT_CACHE_MAX_ENTRIES = 1_000_000
+# Cache hits whose accessed_at updates are written together
+DEFAULT_TOUCH_BATCH = 256
+
+
+class ResponseCache:
+    """SQLite-backed response cache with size/age eviction and hit/miss counters."""
+
+    def __init__(self, path: str, max_entries: Optional[int] = DEFAULT_CACHE_MAX_ENTRIES,
+                 max_age_seconds: Optional[float] = None, touch_batch: int = DEFAULT_TOUCH_BATCH):
+        """
+        Open (or create) the cache.
+
+        Args:
+            path: Path of the SQLite database file
+            max_entries: Keep at most this many entries, evicting least recently used (None: unbounded)
+            max_age_seconds: Drop entries older than this many seconds (None: never expire)
+            touch_batch: Cache hits to buffer before writing their access times
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.touch_batch = max(1, touch_batch)
+        self._touched: Dict[str, float] = {}
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+        # Entries in the table; evict() counts them and set() keeps the count up to date,
+        # so the limit is checked on every write without COUNT(*)
+        self._count = 0
+        self.evict()
+
+    @staticmethod
+    def make_key(url: str, payload: Dict[str, Any]) -> str:
+        """Return the content hash for a request."""
+        blob = json.dumps({"url": url, "payload": payload}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def get(self, url: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return the cached response for a request, or None on a miss or expired entry."""
+        key = self.make_key(url, payload)
+        row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None or (self.max_age_seconds is not None and now - row[1] > self.max_age_seconds):
+            self.stats["misses"] += 1
+            return None
+        self._touched[key] = now
+        if len(self._touched) >= self.touch_batch:
+            self._flush_touched()
+        self.stats["hits"] += 1
+        return json.loads(row[0])
+
+    def set(self, url: str, payload: Dict[str, Any], response: Dict[str, Any]):
+        """Store a response for a request, replacing any previous entry, and evict if over max_entries."""
+        now = time.time()
+        key = self.make_key(url, payload)
+        exists = self._conn.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone() is not None
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (key, url, response, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (key, url, json.dumps(response), now, now),
+        )
+        self._touched.pop(key, None)
+        self.stats["writes"] += 1
+        if not exists:
+            self._count += 1
+            if self.max_entries is not None and self._count > self.max_entries:
+                self._evict_lru(self._count - self.max_entries)
+
+    def _flush_touched(self):
+        """Write the buffered access times of cache hits in one transaction."""
+        if not self._touched:
+            return
+        self._conn.execute("BEGIN")
+        self._conn.executemany("UPDATE responses SET accessed_at = ? WHERE key = ?",
+                               [(accessed_at, key) for key, accessed_at in self._touched.items()])
+        self._conn.execute("COMMIT")
+        self._touched.clear()
+
+    def _evict_lru(self, count: int) -> int:
+        """Remove the count least recently used entries."""
+        self._flush_touched()
+        cursor = self._conn.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?)",
+            (count,),
+        )
+        self._count -= cursor.rowcount
+        self.stats["evictions"] += cursor.rowcount
+        return cursor.rowcount
+
+    def evict(self) -> int:
+        """Remove expired entries and trim to max_entries. Returns the number of entries removed."""
+        removed = 0
+        if self.max_age_seconds is not None:
+            cursor = self._conn.execute("DELETE FROM responses WHERE created_at < ?",
+                                        (time.time() - self.max_age_seconds,))
+            removed += cursor.rowcount
+            self.stats["evictions"] += cursor.rowcount
+        self._count = len(self)
+        if self.max_entries is not None and self._count > self.max_entries:
+            removed += self._evict_lru(self._count - self.max_entries)
+        return removed
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        """Write pending access times, apply eviction and close the database."""
+        if self._conn is not None:
+            self._flush_touched()
+            self.evict()
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,187 @@
+"""
+Chunked, bounded-memory dataset I/O shared by the evaluation scripts.
+
+- read_rows: stream rows from CSV (pandas chunks), Parquet (row groups/batches) or JSONL
+- ChunkWriter: append rows to CSV, Parquet or JSONL as they are produced
+- bounded_map: run an async function over a row stream with bounded concurrency,
+  yielding results in input order while holding at most `window` rows in memory
+
+Example Usage:
+    async def main():
+        with ChunkWriter("output.csv") as writer:
+            async for row, result in bounded_map(read_rows("input.csv"), generate, concurrency=8):
+                writer.write({**row, "generated_output": result})
+"""
+import asyncio
+import os
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def file_format(path: str) -> str:
+    """Infer 'csv', 'parquet' or 'jsonl' from a file extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".parquet", ".pq"):
+        return "parquet"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if extension == ".csv":
+        return "csv"
+    raise ValueError(f"Unsupported file type '{extension}' for {path}; expected .csv, .parquet or .jsonl")
+
+
+def read_chunks(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+    """
+    Yield a file as DataFrames of at most chunk_size rows.
+
+    Args:
+        path: CSV, Parquet or JSONL file
+        chunk_size: Maximum rows per chunk
+        columns: Optional subset of columns to read
+    """
+    fmt = file_format(path)
+    if fmt == "csv":
+        yield from pd.read_csv(path, chunksize=chunk_size, usecols=columns)
+    elif fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+    else:
+        for chunk in pd.read_json(path, lines=True, chunksize=chunk_size):
+            yield chunk[columns] if columns else chunk
+
+
+def read_rows(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+              columns: Optional[List[str]] = None, skip: int = 0) -> Iterator[Dict[str, Any]]:
+    """Yield rows of a file as dicts, reading chunk_size rows at a time and skipping the first `skip`."""
+    for chunk in read_chunks(path, chunk_size, columns):
+        if skip >= len(chunk):
+            skip -= len(chunk)
+            continue
+        yield from chunk.iloc[skip:].to_dict(orient="records")
+        skip = 0
+
+
+def count_rows(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """Count data rows in a file without loading it all at once."""
+    if file_format(path) == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(path).metadata.num_rows
+    return sum(len(chunk) for chunk in read_chunks(path, chunk_size))
+
+
+class ChunkWriter:
+    """
+    Streaming writer for CSV, Parquet or JSONL output.
+
+    Rows are buffered and flushed every chunk_size rows, so memory stays bounded
+    and a crash loses at most one chunk. CSV and JSONL files can be appended to
+    (append=True) to continue an interrupted run; Parquet is always written fresh.
+    """
+
+    def __init__(self, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE, append: bool = False):
+        self.path = path
+        self.format = file_format(path)
+        self.chunk_size = chunk_size
+        if append and self.format == "parquet":
+            raise ValueError("Parquet output cannot be appended to; use a .csv or .jsonl output to resume")
+        self._buffer: List[Dict[str, Any]] = []
+        self._header_written = append and os.path.exists(path) and os.path.getsize(path) > 0
+        self._columns: Optional[List[str]] = None
+        if self._header_written and self.format == "csv":
+            self._columns = list(pd.read_csv(path, nrows=0).columns)
+        elif not append and os.path.exists(path):
+            os.remove(path)
+        self._parquet_writer = None
+        self.rows_written = 0
+
+    def write(self, row: Dict[str, Any]):
+        """Buffer one row, flushing when the buffer reaches chunk_size."""
+        self._buffer.append(row)
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Write buffered rows to disk."""
+        if not self._buffer:
+            return
+        chunk = pd.DataFrame(self._buffer)
+        if self._columns is None:
+            self._columns = list(chunk.columns)
+        chunk = chunk.reindex(columns=self._columns)
+        if self.format == "csv":
+            chunk.to_csv(self.path, mode="a", header=not self._header_written, index=False)
+        elif self.format == "jsonl":
+            text = chunk.to_json(orient="records", lines=True, force_ascii=False)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(text if text.endswith("\n") else text + "\n")
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self._parquet_writer.write_table(table.cast(self._parquet_writer.schema))
+        self._header_written = True
+        self.rows_written += len(self._buffer)
+        self._buffer = []
+
+    def close(self):
+        """Flush remaining rows and close the file."""
+        self.flush()
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+async def bounded_map(
+    items: Iterable[Any],
+    fn: Callable[[Any], Awaitable[Any]],
+    concurrency: int,
+    window: Optional[int] = None,
+) -> AsyncIterator[Tuple[Any, Any]]:
+    """
+    Apply an async function to a stream of items, yielding (item, result) in input order.
+
+    At most `concurrency` calls run at once and at most `window` items (default
+    4 x concurrency) are held between being read and being yielded, so memory
+    does not grow with the length of `items`. Exceptions raised by fn are
+    yielded as the result rather than stopping the stream.
+    """
+    window = max(window or 4 * concurrency, concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def guarded(item):
+        async with semaphore:
+            try:
+                return await fn(item)
+            except Exception as e:
+                return e
+
+    pending: deque = deque()
+    try:
+        for item in items:
+            if len(pending) >= window:
+                head_item, head_task = pending.popleft()
+                yield head_item, await head_task
+            pending.append((item, asyncio.ensure_future(guarded(item))))
+        while pending:
+            head_item, head_task = pending.popleft()
+            yield head_item, await head_task
+    finally:
+        for _, task in pending:
+            task.cancel()
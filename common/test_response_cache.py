@@ -0,0 +1,62 @@
+"""
+Tests for ResponseCache size limits and batched recency updates.
+
+Example Usage:
+    python -m pytest test_response_cache.py -q
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from response_cache import ResponseCache  # noqa: E402
+
+URL = "https://api.contextual.ai/v1/lmunit"
+
+
+def payload(i: int):
+    return {"query": f"query {i}", "response": "response", "unit_test": "Is it helpful?"}
+
+
+def test_max_entries_is_enforced_while_writing(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_entries=50)
+    for i in range(500):
+        cache.set(URL, payload(i), {"score": i})
+        assert len(cache) <= 50
+    # Overwriting an entry does not count as a new one
+    cache.set(URL, payload(499), {"score": -1})
+    assert len(cache) == 50
+    assert cache.stats["evictions"] == 450
+    assert cache.get(URL, payload(0)) is None
+    assert cache.get(URL, payload(499)) == {"score": -1}
+    cache.close()
+
+
+def test_recently_read_entries_survive_eviction(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_entries=20, touch_batch=8)
+    for i in range(20):
+        cache.set(URL, payload(i), {"score": i})
+    # Fewer hits than touch_batch stay buffered, and are written before anything is evicted
+    for i in range(5):
+        assert cache.get(URL, payload(i)) == {"score": i}
+    for i in range(20, 35):
+        cache.set(URL, payload(i), {"score": i})
+
+    assert all(cache.get(URL, payload(i)) is not None for i in range(5))
+    assert all(cache.get(URL, payload(i)) is None for i in range(5, 20))
+    assert len(cache) == 20
+    cache.close()
+
+
+def test_access_times_are_kept_across_reopening(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path, max_entries=None)
+    for i in range(10):
+        cache.set(URL, payload(i), {"score": i})
+    cache.get(URL, payload(0))
+    cache.close()
+
+    # Shrinking the limit on reopen keeps the entry that was read last
+    reopened = ResponseCache(path, max_entries=1)
+    assert len(reopened) == 1
+    assert reopened.get(URL, payload(0)) == {"score": 0}
+    reopened.close()